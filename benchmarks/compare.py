@@ -0,0 +1,94 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# compare two benchmark results files, eg from runs on two branches:
+#
+#   python benchmarks/compare.py before.json after.json
+#
+# prints the median of each quantity in both, and their ratio, and exits
+# with status 1 if any got slower (or bigger) by more than the threshold.
+
+import sys
+from optparse import OptionParser
+
+from results import read_results
+
+# quantities compared, and how to print them
+QUANTITIES = (
+    ('seconds', lambda value: '%.3fs' % value),
+    ('peak_kb', lambda value: '%dK' % value),
+)
+
+
+def compare(before, after, threshold):
+    """
+    return a line of text per quantity of each result in both before and
+    after, and the names of those which grew by more than threshold (a
+    fraction, eg 0.1 for 10%)
+    """
+    lines = []
+    regressions = []
+    old = dict([(result['name'], result) for result in before['results']])
+    for result in after['results']:
+        if result['name'] not in old:
+            continue
+        for key, format in QUANTITIES:
+            if key not in result or key not in old[result['name']]:
+                continue
+            was = old[result['name']][key]['median']
+            now = result[key]['median']
+            ratio = was and float(now) / was or 1.0
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = '  REGRESSION'
+                regressions.append('%s %s' % (result['name'], key))
+            lines.append('%-36s %-8s %10s %10s %7.2fx%s' % (result['name']
+                    , key, format(was), format(now), ratio, flag))
+    return lines, regressions
+
+
+def main():
+    parser = OptionParser("""usage: %prog [options] before.json after.json""")
+    parser.add_option('-t', '--threshold', type='float', default=0.1
+            , help='Fraction a median may grow by before it counts as a regression.  Defaults to 0.1.')
+    opts, args = parser.parse_args()
+    if len(args) != 2:
+        parser.error('give two results files')
+    before, after = [read_results(filename) for filename in args]
+    if before['suite'] != after['suite']:
+        parser.error('results are from different suites: %s and %s'
+                % (before['suite'], after['suite']))
+    if before['params'] != after['params']:
+        print 'WARNING: the runs had different parameters'
+
+    lines, regressions = compare(before, after, opts.threshold)
+    for line in lines:
+        print line
+    if regressions:
+        print '%d regression(s): %s' % (len(regressions)
+                , ', '.join(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
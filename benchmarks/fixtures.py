@@ -0,0 +1,200 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# local fixture repositories for the benchmarks: bare git repositories,
+# an svn repository served over file://, and a cvs repository, each
+# holding `repos' modules of `files' files with `history' commits apiece.
+# nothing is fetched from the network.
+#
+# fixtures take a while to build, so each set is kept under its own
+# directory, named for its sizes, and only built once.
+
+import os
+import pipes
+import shutil
+import subprocess
+
+# bump whenever the fixtures built below change, so old sets are rebuilt
+FIXTURE_VERSION = 1
+
+# how many files each commit after the first changes
+FILES_PER_COMMIT = 5
+
+BACKENDS = ('git', 'svn', 'cvs')
+
+# the tools each backend's fixture needs
+TOOLS = {
+    'git': ('git',),
+    'svn': ('svn', 'svnadmin'),
+    'cvs': ('cvs',),
+}
+
+
+def which(name):
+    """return the path of the program name on $PATH, or None"""
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def available(backend):
+    """True if the tools to build and check out backend's fixture exist"""
+    return all([which(tool) for tool in TOOLS[backend]])
+
+
+def run(cmd, cwd=None):
+    """run cmd in a shell, raising an Exception with its output if it fails"""
+    pipe = subprocess.Popen(cmd, cwd=cwd, shell=True, stdout=subprocess.PIPE
+            , stderr=subprocess.STDOUT)
+    out = pipe.communicate()[0]
+    if pipe.returncode:
+        raise Exception("Error while executing '%s': %s" % (cmd, out))
+    return out
+
+
+def write_files(directory, files, commit):
+    """
+    write the files of one module as they are after commit (0 for the
+    first): every file at first, then FILES_PER_COMMIT of them in turn
+    """
+    if commit == 0:
+        names = range(files)
+    else:
+        start = (commit - 1) * FILES_PER_COMMIT
+        names = [(start + i) % files
+                for i in range(min(FILES_PER_COMMIT, files))]
+    for name in names:
+        # a few subdirectories, so that there is a tree to walk
+        path = os.path.join(directory, 'dir%d' % (name % 4)
+                , 'file%d.txt' % name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fp = open(path, 'w')
+        try:
+            fp.write(('file %d, commit %d\n' % (name, commit)) * 40)
+        finally:
+            fp.close()
+
+
+class Fixtures(object):
+    """
+    one set of fixtures, under root/<sizes>.  build() makes whatever is
+    missing; the config_* methods return the config lines (and REPOS
+    lines) which check each backend's modules out.
+    """
+    def __init__(self, root, repos=5, files=100, history=10):
+        self.repos = repos
+        self.files = files
+        self.history = history
+        self.dir = os.path.abspath(os.path.join(root, 'v%d-%dx%dx%d'
+                % (FIXTURE_VERSION, repos, files, history)))
+
+    def modules(self):
+        return ['mod%d' % n for n in range(self.repos)]
+
+    def build(self, backend):
+        """build backend's fixture unless it has been built already"""
+        done = os.path.join(self.dir, backend + '.done')
+        if os.path.exists(done):
+            return
+        target = os.path.join(self.dir, backend)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.makedirs(target)
+        getattr(self, '_build_' + backend)(target)
+        open(done, 'w').close()
+
+    def _work_dir(self, name):
+        work = os.path.join(self.dir, 'work', name)
+        if os.path.exists(work):
+            shutil.rmtree(work)
+        os.makedirs(work)
+        return work
+
+    def _build_git(self, target):
+        git = 'git -c user.name=rover -c user.email=rover@example.com'
+        for module in self.modules():
+            work = self._work_dir(module)
+            run('git init -q', cwd=work)
+            for commit in range(self.history):
+                write_files(work, self.files, commit)
+                run('%s add -A && %s commit -q -m "commit %d"'
+                        % (git, git, commit), cwd=work)
+            run('git branch -M master', cwd=work)
+            run('git clone -q --bare %s %s' % (pipes.quote(work)
+                    , pipes.quote(os.path.join(target, module + '.git'))))
+            shutil.rmtree(work)
+
+    def _build_svn(self, target):
+        repo = os.path.join(target, 'repo')
+        run('svnadmin create %s' % pipes.quote(repo))
+        work = self._work_dir('svn')
+        run('svn checkout -q %s %s' % (self._svn_url(), pipes.quote(work)))
+        for commit in range(self.history):
+            for module in self.modules():
+                write_files(os.path.join(work, module), self.files, commit)
+            run('svn add -q --force .', cwd=work)
+            run('svn commit -q -m "commit %d"' % commit, cwd=work)
+        shutil.rmtree(work)
+
+    def _build_cvs(self, target):
+        root = os.path.join(target, 'cvsroot')
+        run('cvs -d %s init' % pipes.quote(root))
+        for module in self.modules():
+            work = self._work_dir(module)
+            write_files(work, self.files, 0)
+            run('cvs -Q -d %s import -m "commit 0" %s vendor start'
+                    % (pipes.quote(root), module), cwd=work)
+            shutil.rmtree(work)
+        work = self._work_dir('cvs')
+        run('cvs -Q -d %s checkout %s' % (pipes.quote(root)
+                , ' '.join(self.modules())), cwd=work)
+        # every file exists from the first commit on, so later ones only
+        #   change files
+        for commit in range(1, self.history):
+            for module in self.modules():
+                write_files(os.path.join(work, module), self.files, commit)
+            run('cvs -Q commit -m "commit %d"' % commit, cwd=work)
+        shutil.rmtree(work)
+
+    def _svn_url(self):
+        return 'file://' + os.path.join(self.dir, 'svn', 'repo')
+
+    def config(self, backend):
+        """
+        return (config lines, REPOS lines) checking out backend's modules
+        """
+        if backend == 'git':
+            return (['%s.git, master, fixtures' % module
+                    for module in self.modules()]
+                    , ['fixtures, git, file://%s/' % os.path.join(self.dir
+                    , 'git')])
+        if backend == 'svn':
+            return (['%s, HEAD, svn, %s' % (module, self._svn_url())
+                    for module in self.modules()], [])
+        root = os.path.join(self.dir, 'cvs', 'cvsroot')
+        return (['%s, HEAD, cvs, %s' % (module, root)
+                for module in self.modules()], [])
+
@@ -0,0 +1,314 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# micro-benchmarks of rover's planning pipeline, which runs before any
+# checkout: parse_config, resolve, manifest generation, apply_filters
+# and clean's decision of what to remove (_clean), over synthetic configs
+# of cvs, svn and git (REPOS) lines, at several sizes to give a scaling
+# curve.
+#
+#   python benchmarks/planning.py --sizes 1000,10000,100000 -o plan.json
+#
+# each phase runs in a forked child, so that its peak memory can be told
+# apart from what the earlier phases left behind.  nothing is run against
+# any repository: svn listings are kept offline, and the commands rover
+# runs are counted (see rover.trace) to make sure of it.
+
+import json
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from optparse import OptionParser
+from StringIO import StringIO
+
+from results import TREE, summarize, write_results
+
+sys.path.insert(0, TREE)
+
+from rover import Rover, trace
+from rover.backends import svnlist
+from rover.backends.rgitrepo import GitConnection, LATEST_GIT_VERSION
+
+PHASES = ('parse_config', 'resolve', 'manifest', 'apply_filters', 'clean')
+
+
+def config_lines(size):
+    """
+    return size config lines: half cvs, with some lines nested in or
+    clobbering earlier ones, three tenths svn and a fifth git
+    """
+    lines = []
+    n = 0
+    while len(lines) < size:
+        group = n / 100
+        kind = n % 10
+        if kind < 5:
+            path = 'acme/g%d/mod%d' % (group, n)
+            lines.append('%s, HEAD, cvs' % path)
+            if n % 50 == 0:
+                lines.append('%s/sub, BRANCH, cvs' % path)
+            elif n % 50 == 2:
+                # the same path again, clobbering the line before
+                lines.append('%s, BRANCH, cvs' % path)
+        elif kind < 8:
+            lines.append('svn/g%d/dir%d, HEAD, svn, http://svn/repo'
+                    % (group, n))
+        else:
+            lines.append('repo%d.git, master, bench' % n)
+        n += 1
+    return lines[:size]
+
+
+def filters(lines):
+    """
+    return (includes, excludes) over the paths in lines: every top level
+    directory and git repository is included, and every twentieth cvs
+    module loses its test directory
+    """
+    includes = ['acme', 'svn']
+    excludes = []
+    for index, line in enumerate(lines):
+        path, revision, vcs = [field.strip() for field in line.split(',')[:3]]
+        if vcs == 'bench':
+            includes.append(path)
+        elif vcs == 'cvs' and index % 20 == 0:
+            excludes.append(path + '/test')
+    return includes, excludes
+
+
+def make_checkout(checkout_dir, items):
+    """
+    create a directory for every item, and a stray one beside every tenth,
+    for clean to decide about
+    """
+    for index, item in enumerate(items):
+        path = os.path.join(checkout_dir, item.get_path())
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        if index % 10 == 0:
+            stray = os.path.join(os.path.dirname(path), 'stray%d' % index)
+            if not os.path.isdir(stray):
+                os.makedirs(stray)
+
+
+def _rss_kb():
+    """the current resident set size, in KiB, or None if it can't be told"""
+    try:
+        fp = open('/proc/self/statm')
+        try:
+            pages = int(fp.read().split()[1])
+        finally:
+            fp.close()
+    except (IOError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize() / 1024
+
+
+def _peak_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # reported in bytes there, KiB elsewhere
+        peak /= 1024
+    return peak
+
+
+def measure(fn):
+    """
+    call fn in a forked child and return how long it took, how much its
+    peak memory grew by (in KiB, None if it can't be told) and how many
+    commands it ran.  without fork, fn is called in this process and no
+    memory is reported.
+    """
+    if not hasattr(os, 'fork'):
+        commands = len(trace.log.records)
+        started = time.time()
+        fn()
+        return time.time() - started, None, \
+                len(trace.log.records) - commands
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read)
+            # the peak a child starts with is the parent's size at the
+            #   fork, and the kernel may not have caught up with the
+            #   current size in either
+            base = max(_rss_kb(), _peak_kb())
+            commands = len(trace.log.records)
+            started = time.time()
+            fn()
+            seconds = time.time() - started
+            peak = max(_rss_kb(), _peak_kb())
+            os.write(write, json.dumps([seconds, max(0, peak - base)
+                    , len(trace.log.records) - commands]))
+            status = 0
+        except:
+            traceback.print_exc()
+        os._exit(status)
+
+    os.close(write)
+    data = ''
+    while True:
+        chunk = os.read(read, 4096)
+        if not chunk:
+            break
+        data += chunk
+    os.close(read)
+    pid, status = os.waitpid(pid, 0)
+    if status:
+        raise Exception("benchmark child failed")
+    return json.loads(data)
+
+
+def bench_size(size, repeat, work):
+    """
+    run each phase over a config of size lines, returning a result per
+    phase
+    """
+    lines = config_lines(size)
+    includes, excludes = filters(lines)
+    checkout_dir = os.path.join(work, 'co%d' % size)
+
+    r = Rover('planning', checkout_mode='clean', checkout_dir=checkout_dir)
+    conn = GitConnection('bench', 'file:///nonexistent/')
+    conn.git_version = LATEST_GIT_VERSION
+    r.factory_map = dict(Rover.factory_map, bench=conn)
+    r.set_includes(includes)
+    r.set_excludes(excludes)
+    config = ''.join([line + '\n' for line in lines])
+
+    state = {}
+    def parse_config():
+        state['items'] = r.parse_config(StringIO(config))
+    def resolve():
+        r.config_items = list(state['items'])
+        r.resolve()
+    def manifest():
+        r.manifest()
+    def apply_filters():
+        r.apply_filters()
+    def clean():
+        r._clean()
+    phases = [('parse_config', parse_config), ('resolve', resolve)
+            , ('manifest', manifest), ('apply_filters', apply_filters)
+            , ('clean', clean)]
+
+    results = []
+    for name, fn in phases:
+        if name == 'clean':
+            make_checkout(checkout_dir, r.config_items)
+        seconds, peaks, commands = [], [], []
+        for n in range(repeat):
+            elapsed, peak, count = measure(fn)
+            seconds.append(elapsed)
+            peaks.append(peak)
+            commands.append(count)
+        # carry on from where the phase leaves things
+        fn()
+        result = {'name': '%s/%d' % (name, size), 'phase': name
+                , 'size': size, 'seconds': summarize(seconds)
+                , 'commands': summarize(commands)}
+        if None not in peaks:
+            result['peak_kb'] = summarize(peaks)
+        results.append(result)
+    shutil.rmtree(checkout_dir, True)
+    return results
+
+
+def print_curve(results, sizes):
+    """
+    print each phase's time and peak memory growth at every size, and how
+    the time scales from one size to the next, as the exponent k of
+    time ~ size ** k: about 1 is linear, about 2 quadratic
+    """
+    by_name = dict([(result['name'], result) for result in results])
+    print '%-14s %10s %12s %12s %8s' % ('PHASE', 'SIZE', 'SECONDS'
+            , 'PEAK', 'SCALING')
+    for phase in PHASES:
+        previous = None
+        for size in sizes:
+            result = by_name['%s/%d' % (phase, size)]
+            seconds = result['seconds']['min']
+            peak = '-'
+            if 'peak_kb' in result:
+                peak = '%dK' % result['peak_kb']['median']
+            scaling = ''
+            if previous and previous[1] > 0 and seconds > 0:
+                scaling = '%.2f' % (math.log(seconds / previous[1])
+                        / math.log(float(size) / previous[0]))
+            print '%-14s %10d %12.4f %12s %8s' % (phase, size, seconds, peak
+                    , scaling)
+            previous = (size, seconds)
+        if any([by_name['%s/%d' % (phase, size)]['commands']['max']
+                for size in sizes]):
+            print 'WARNING: %s ran commands' % phase
+
+
+def main():
+    parser = OptionParser("""usage: %prog [options]
+
+        Time rover's planning phases over synthetic configs of several
+        sizes.""")
+    parser.add_option('-s', '--sizes', default='1000,10000,100000'
+            , help='Comma-separated config sizes, in lines.  Defaults to 1000,10000,100000.')
+    parser.add_option('-r', '--repeat', type='int', default=1
+            , help='Times to repeat each measurement.  Defaults to 1.')
+    parser.add_option('-o', '--output', default=None
+            , help='Write the results to this file as json.')
+    opts, args = parser.parse_args()
+    try:
+        sizes = sorted([int(size) for size in opts.sizes.split(',')])
+    except ValueError:
+        parser.error('sizes must be numbers: %s' % opts.sizes)
+
+    # never list anything from an svn server
+    svnlist.cache.offline = True
+    svnlist.cache.cache_file = os.devnull
+
+    work = tempfile.mkdtemp(prefix='rover-planning-')
+    results = []
+    try:
+        for size in sizes:
+            print 'timing %d lines' % size
+            sys.stdout.flush()
+            results.extend(bench_size(size, opts.repeat, work))
+    finally:
+        shutil.rmtree(work, True)
+
+    print
+    print_curve(results, sizes)
+    if opts.output:
+        write_results(opts.output, 'planning', {'sizes': sizes
+                , 'repeat': opts.repeat}, results)
+        print 'wrote results to %s' % opts.output
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# reading and writing benchmark results: one json file per run of a
+# suite, holding the parameters it ran with, the tree and machine it ran
+# on, and one entry per measurement, so that runs on different branches
+# can be compared (see compare.py)
+
+import json
+import os
+import platform
+import subprocess
+import time
+
+# bump whenever the format below changes
+RESULTS_VERSION = 1
+
+TREE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _git(args):
+    pipe = subprocess.Popen('git ' + args, cwd=TREE, shell=True
+            , stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out = pipe.communicate()[0]
+    if pipe.returncode:
+        return None
+    return out.strip()
+
+
+def environment():
+    """describe the tree being measured and the machine measuring it"""
+    status = _git('status --porcelain --untracked-files=no')
+    return {'revision': _git('rev-parse HEAD')
+            , 'branch': _git('rev-parse --abbrev-ref HEAD')
+            , 'dirty': bool(status)
+            , 'python': platform.python_version()
+            , 'platform': platform.platform()
+            , 'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+
+
+def summarize(samples):
+    """the min, median and max of a list of numbers, and the list itself"""
+    ordered = sorted(samples)
+    return {'min': ordered[0], 'median': ordered[len(ordered) / 2]
+            , 'max': ordered[-1], 'samples': samples}
+
+
+def write_results(filename, suite, params, results):
+    """
+    write results to filename.
+
+    suite   => the name of the benchmark suite, eg 'sync'
+    params  => a dict of the parameters it ran with
+    results => one dict per measurement, each with a unique `name' and,
+               for every quantity measured (eg `seconds'), a summary as
+               summarize() returns it
+    """
+    out = {'version': RESULTS_VERSION, 'suite': suite, 'params': params
+            , 'environment': environment(), 'results': results}
+    tmp = '%s.%d' % (filename, os.getpid())
+    fp = open(tmp, 'w')
+    try:
+        json.dump(out, fp, indent=2, sort_keys=True, separators=(',', ': '))
+        fp.write('\n')
+    finally:
+        fp.close()
+    os.rename(tmp, filename)
+
+
+def read_results(filename):
+    """read a results file, raising an Exception if it isn't one"""
+    fp = open(filename)
+    try:
+        results = json.load(fp)
+    finally:
+        fp.close()
+    if not isinstance(results, dict) \
+            or results.get('version') != RESULTS_VERSION:
+        raise Exception("`%s' is not a version %d results file"
+                % (filename, RESULTS_VERSION))
+    return results
+
@@ -0,0 +1,197 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# end-to-end benchmarks: time Rover.run() against local fixture
+# repositories (see fixtures.py) for each backend and checkout mode, both
+# into an empty directory (fresh) and over the checkout a fresh run left
+# (warm), and write the timings to a results file.
+#
+#   python benchmarks/sync.py --repos 20 --files 500 --history 20 \
+#           --output before.json
+#
+# the rover being measured is the one in this tree, not an installed one.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from fixtures import BACKENDS, Fixtures, available
+from results import TREE, summarize, write_results
+
+sys.path.insert(0, TREE)
+
+MODES = ('preserve', 'clean', 'paranoid', 'paranoid-fast')
+
+
+class _Discard(object):
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+
+def write_config(directory, backend, lines, repos):
+    """write backend's config (and REPOS, if any) into directory"""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    config = os.path.join(directory, backend + '.csv')
+    fp = open(config, 'w')
+    try:
+        fp.write(''.join([line + '\n' for line in lines]))
+    finally:
+        fp.close()
+    if repos:
+        fp = open(os.path.join(directory, 'REPOS'), 'w')
+        try:
+            fp.write(''.join([line + '\n' for line in repos]))
+        finally:
+            fp.close()
+    return config
+
+
+def time_run(config, mode, checkout_dir, jobs, verbose=False):
+    """
+    run rover once, returning how long it took and how many commands it
+    ran
+    """
+    from rover import Rover, trace
+    commands = len(trace.log.records)
+    stdout = sys.stdout
+    if not verbose:
+        sys.stdout = _Discard()
+    try:
+        started = time.time()
+        r = Rover([config], checkout_mode=mode, checkout_dir=checkout_dir)
+        r.set_jobs(jobs)
+        r.run()
+        seconds = time.time() - started
+    finally:
+        sys.stdout = stdout
+    return seconds, len(trace.log.records) - commands
+
+
+def bench(fixtures, backend, modes, jobs, repeat, work, verbose=False):
+    """
+    time fresh and warm syncs of backend's fixture in each mode, returning
+    a result per mode and kind of sync
+    """
+    lines, repos = fixtures.config(backend)
+    config = write_config(os.path.join(work, 'configs', backend), backend
+            , lines, repos)
+    checkout_dir = os.path.join(work, 'checkouts', backend)
+
+    results = []
+    for mode in modes:
+        for sync in ('fresh', 'warm'):
+            seconds, commands = [], []
+            for n in range(repeat):
+                if sync == 'fresh' and os.path.exists(checkout_dir):
+                    shutil.rmtree(checkout_dir)
+                elapsed, count = time_run(config, mode, checkout_dir, jobs
+                        , verbose)
+                seconds.append(elapsed)
+                commands.append(count)
+            results.append({'name': '%s/%s/%s' % (backend, mode, sync)
+                    , 'backend': backend, 'mode': mode, 'sync': sync
+                    , 'seconds': summarize(seconds)
+                    , 'commands': summarize(commands)})
+            print '%-28s %8.3fs (min %.3fs) %5d commands' % (
+                    results[-1]['name'], results[-1]['seconds']['median']
+                    , results[-1]['seconds']['min']
+                    , results[-1]['commands']['median'])
+            sys.stdout.flush()
+    return results
+
+
+def main():
+    parser = OptionParser("""usage: %prog [options]
+
+        Time rover syncs against local fixture repositories, which are
+        built on first use and kept for later runs.""")
+    parser.add_option('', '--repos', type='int', default=5
+            , help='Modules per backend.  Defaults to 5.')
+    parser.add_option('', '--files', type='int', default=100
+            , help='Files per module.  Defaults to 100.')
+    parser.add_option('', '--history', type='int', default=10
+            , help='Commits per module.  Defaults to 10.')
+    parser.add_option('-b', '--backend', action='append', dest='backends'
+            , default=[], help='Backend to time (git, svn or cvs); may be given several times.  Defaults to every backend whose tools are installed.')
+    parser.add_option('-m', '--mode', action='append', dest='modes'
+            , default=[], help='Checkout mode to time; may be given several times.  Defaults to every mode.')
+    parser.add_option('-j', '--jobs', type='int', default=1
+            , help='Passed on to rover.  Defaults to 1.')
+    parser.add_option('-r', '--repeat', type='int', default=3
+            , help='Times to repeat each measurement.  Defaults to 3.')
+    parser.add_option('', '--fixtures', default=None
+            , help='Directory to keep fixtures in.  Defaults to rover-benchmarks in the temp directory.')
+    parser.add_option('-o', '--output', default=None
+            , help='Write the results to this file as json.')
+    parser.add_option('-v', '--verbose', action='store_true', default=False
+            , help="Show rover's output.")
+    opts, args = parser.parse_args()
+
+    root = opts.fixtures or os.path.join(tempfile.gettempdir()
+            , 'rover-benchmarks')
+    backends = opts.backends or [backend for backend in BACKENDS
+            if available(backend)]
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error("unknown backend: %s" % backend)
+        if not available(backend):
+            parser.error("can't benchmark %s: its tools aren't installed"
+                    % backend)
+    modes = opts.modes or list(MODES)
+    for mode in modes:
+        if mode not in MODES:
+            parser.error("unknown mode: %s" % mode)
+
+    # keep the caches rover shares between checkouts to the benchmark
+    os.environ['ROVER_CACHE'] = os.path.join(root, 'cache')
+
+    fixtures = Fixtures(root, opts.repos, opts.files, opts.history)
+    work = tempfile.mkdtemp(prefix='rover-sync-')
+    results = []
+    try:
+        for backend in backends:
+            print 'building %s fixture in %s' % (backend, fixtures.dir)
+            sys.stdout.flush()
+            fixtures.build(backend)
+            results.extend(bench(fixtures, backend, modes, opts.jobs
+                    , opts.repeat, work, opts.verbose))
+    finally:
+        shutil.rmtree(work, True)
+
+    if opts.output:
+        write_results(opts.output, 'sync', {'repos': opts.repos
+                , 'files': opts.files, 'history': opts.history
+                , 'jobs': opts.jobs, 'repeat': opts.repeat
+                , 'backends': backends, 'modes': modes}, results)
+        print 'wrote results to %s' % opts.output
+
+
+if __name__ == '__main__':
+    main()
@@ -23,20 +23,38 @@
 
 import os
 import re
-import shutil
 import sys
 import time
 import types
 import urllib2
+from StringIO import StringIO
 
 # module-relative import
 import config
 import rover.shell
-
-from backends.rcvs import CVSFactory
-from backends.rsvn import SVNFactory
+import rover.trace
+from rover.cleanwalk import find_removes
+from rover.lockfile import read_lockfile, write_lockfile
+from rover.pathtrie import PathTrie, overlaps
+from rover.plan import Estimator, NEW_ACTIONS, PlanStep, format_plan
+from rover.scheduler import Scheduler
+from rover.state import CheckoutState, STATE_DIR, config_line, state_path
+from rover.trash import Trash, TRASH_DIR
+
+from backends.rcvs import CVSFactory, batch_items
+from backends.rsvn import SVNFactory, coalesce
 from backends.rgit import GitFactory
 from backends.rgitrepo import GitConnection
+from backends.gitcache import GitMirrorCache
+from backends.gitoptions import GitCloneOptions
+from backends.gitrefs import list_remote_refs
+from backends import cvsmodules, svnlist
+
+# how many `git ls-remote's to run at once when checking for changes
+LS_REMOTE_JOBS = 8
+
+CHECKOUT_MODES = ['paranoid', 'paranoid-fast', 'clean', 'preserve']
+
 
 class Rover:
 
@@ -72,12 +90,28 @@ class Rover:
         self.test_mode = False
         self.verbose = False
         self.manifest_filename = None
+        self.lockfile_filename = None
+        self.locked_filename = None
+        self.locked = False
+        self.trace_filename = None
         self.includes = []
         self.excludes = []
         self.revision = None
         self.preserve_dirs = False
+        self.jobs = 1
+        self.host_limit = None
+        self.host_limits = {}
+        self.git_cache = None
+        self.git_options = GitCloneOptions()
+        self.always_fetch = False
+        self.svn_sparse = False
+        self.svn_split = 1
+        self.cvs_batch_size = 1
+        self.state = None
+        self.trash = None
 
         self.config_lines = []
+        self.repos = []
         self.config_items = []
         self.config_files = []
         self.config_errors = []
@@ -98,6 +132,27 @@ class Rover:
     def set_manifest(self, manifest):
         self.manifest_filename = manifest
 
+    def set_lockfile(self, lockfile):
+        """
+        after checking out, write a lockfile to this path which pins every
+        item to the revision that was checked out
+        """
+        self.lockfile_filename = lockfile
+
+    def set_locked(self, lockfile):
+        """
+        check out exactly what the lockfile at this path records instead
+        of what the config says, without resolving anything remotely
+        """
+        self.locked_filename = lockfile
+
+    def set_trace(self, trace):
+        """
+        when the run is over, write every command it ran to this path as a
+        Chrome trace, with when it ran, for which item and on which slot
+        """
+        self.trace_filename = trace
+
     def set_includes(self, includes):
         self.includes = includes
 
@@ -107,12 +162,107 @@ class Rover:
     def set_revision(self, revision):
         self.revision = revision
 
+    def set_jobs(self, jobs):
+        if jobs < 1:
+            raise Exception("jobs must be at least 1")
+        self.jobs = jobs
+
+    def set_host_limit(self, host_limit):
+        """
+        set the most operations to run at once against any one remote
+        host; None means no limit beyond the number of jobs
+        """
+        if host_limit is not None and host_limit < 1:
+            raise Exception("host limit must be at least 1")
+        self.host_limit = host_limit
+
+    def set_host_limits(self, host_limits):
+        """
+        set per-host limits, as a dict of host name => limit, which
+        override the limit given to set_host_limit
+        """
+        for host, limit in host_limits.items():
+            if limit < 1:
+                raise Exception("host limit for %s must be at least 1" % host)
+        self.host_limits = dict([(host.lower(), limit)
+                for host, limit in host_limits.items()])
+
+    def set_git_cache(self, cache_dir, dissociate=False):
+        """
+        seed git clones from mirrors kept under cache_dir (by default
+        <rover.config.cache_dir>/git); None turns mirroring off
+        """
+        if cache_dir is None:
+            self.git_cache = None
+        else:
+            self.git_cache = GitMirrorCache(cache_dir, dissociate)
+
+    def set_git_options(self, depth=None, single_branch=None, filter=None):
+        """
+        set the default shallow depth, single-branch and partial clone
+        filter for git items; options on a config line take precedence
+        """
+        self.git_options = GitCloneOptions(depth, single_branch, filter)
+
+    def set_always_fetch(self, always_fetch):
+        """
+        if True, fetch every git item in preserve mode even if its remote
+        has not moved since the last fetch
+        """
+        self.always_fetch = always_fetch
+
+    def set_svn_list_ttl(self, ttl):
+        """
+        trust cached svn listings of HEAD for ttl seconds across runs;
+        0 lists everything afresh each run
+        """
+        if ttl < 0:
+            raise Exception("svn list ttl must not be negative")
+        svnlist.cache.ttl = ttl
+
+    def set_cvs_modules_ttl(self, ttl):
+        """
+        trust cached cvs aliases for ttl seconds across runs before
+        checking whether CVSROOT/modules has changed; 0 checks each run
+        """
+        if ttl < 0:
+            raise Exception("cvs modules ttl must not be negative")
+        cvsmodules.cache.ttl = ttl
+
+    def set_svn_sparse(self, svn_sparse):
+        """
+        if True, check out each svn line with excludes as one sparse
+        working copy instead of one working copy per directory beside
+        the excludes
+        """
+        self.svn_sparse = svn_sparse
+
+    def set_svn_split(self, jobs):
+        """
+        check each new svn working copy out as up to jobs concurrent
+        updates of its top level directories, sharing the host limit of
+        its server with the other items checked out from it at once
+        """
+        if jobs < 1:
+            raise Exception("svn split must be at least 1")
+        self.svn_split = jobs
+
+    def set_cvs_batch_size(self, size):
+        """
+        check out or update up to size cvs items which share a CVSROOT
+        and revision with a single cvs command
+        """
+        if size < 1:
+            raise Exception("cvs batch size must be at least 1")
+        self.cvs_batch_size = size
+
     def _validate(self):
         """
         raises an Exception if constructor options are in conflict
         """
-        if self.checkout_mode not in ['paranoid', 'clean', 'preserve']:
-            raise Exception("mode must be one of {'paranoid', 'clean', 'preserve'}")
+        if self.checkout_mode not in CHECKOUT_MODES:
+            raise Exception("mode must be one of {%s}"
+                    % ', '.join(["'%s'" % mode for mode in CHECKOUT_MODES]))
 
     def load_repos(self, repofile):
         """Load factories for each repo defined in the REPOS file
@@ -120,6 +270,7 @@ class Rover:
         sh = rover.shell.Shell()
         repos = config.parse_repos(repofile)
         for rinfo in repos:
+            self.repos.append((rinfo.name, rinfo.vcs, rinfo.uri))
             conn = None
             if rinfo.vcs.lower() == 'git':
                 conn = GitConnection(rinfo.name, rinfo.uri)
@@ -175,6 +326,65 @@ class Rover:
 
         self.config_items.extend(config_items)
 
+    def load_lockfile(self, filename):
+        """
+        take the items to check out from a lockfile rather than the
+        config files.  its lines are already pinned and expanded, so
+        nothing is resolved, expanded or looked up remotely.
+        """
+        lock = read_lockfile(filename)
+        self.load_repos(StringIO('\n'.join([', '.join(repo)
+                for repo in lock['repos']])))
+        for entry in lock['items']:
+            line = entry['line']
+            if len(line) < 3 or line[2] not in self.factory_map:
+                self.config_errors.append('unknown repository: "%s"'
+                        % ', '.join(line))
+                continue
+            try:
+                items = self.factory_map[line[2]].get_rover_items(line)
+            except Exception, ex:
+                self.config_errors.append("resolve error: %s" % ex)
+                continue
+            for item in items:
+                # an svn line keeps its excludes only if it was checked
+                #   out sparsely
+                item.set_sparse(True)
+            self.config_items.extend(items)
+        self.locked = True
+
+    def save_lockfile(self):
+        """
+        write a lockfile pinning every item to what the state database
+        says was just checked out.  items which failed to check out keep
+        their own lines.
+        """
+        if self.test_mode:
+            rover.shell.echo("[TEST MODE] WRITING LOCKFILE:"
+                    , self.lockfile_filename)
+            return
+        state = CheckoutState.open(self.checkout_dir)
+        entries = []
+        try:
+            for item in self.config_items:
+                path = item.get_path()
+                known = state.get(path)
+                resolved, synced_at = None, None
+                if known is not None and known['status'] == 'ok':
+                    resolved = known['resolved']
+                    # the end of the sync, by which every change it
+                    #   picked up had been made
+                    synced_at = known['synced_at'] + (known['duration'] or 0)
+                else:
+                    rover.shell.echo("NOT PINNED:", path)
+                entries.append({'path': path, 'vcs': item.get_vcs()
+                        , 'line': item.get_locked_line(resolved, synced_at)
+                        , 'resolved': resolved})
+        finally:
+            state.close()
+        write_lockfile(self.lockfile_filename, self.config_names, self.repos
+                , entries)
+
     def save_manifest(self):
         """
         assumes self.manifest_filename is not None
@@ -247,53 +457,255 @@ class Rover:
         return path == candidate or candidate.startswith(path + '/')
         
     def resolve(self):
-        # TODO: comments
-        items = [(item, item.get_path()) for item in self.config_items]
-
-        # FIXME: Why are we reversing here?
-        items.reverse()
-        for idx, pair in enumerate(items):
-            item, path = pair
-            for candidate, cpath in items[idx+1:]:
-                if self._path_overrides(path, cpath):
-                    candidate._removeme = True
-                    if path == cpath:
-                        self.clobbers.append(candidate)
-                elif self._path_overrides(cpath, path):
-                    candidate.exclude(path)
-
-        items.reverse()
+        """
+        settle overlapping config lines: later lines win.  an item is
+        dropped if a later item checks out the same path or one of its
+        parents (and reported as clobbered if the path is the same), and
+        has any later item nested inside it excluded from it.
+
+        items are indexed in a PathTrie as they are visited, last line
+        first, so each one only looks at the later items above, at and
+        below its own path.
+        """
+        paths = [item.get_path() for item in self.config_items]
+        later = PathTrie()
+        clobbers = []
+        for idx in range(len(paths) - 1, -1, -1):
+            item, path = self.config_items[idx], paths[idx]
+            if later.first_on_path(path) is not None:
+                item._removeme = True
+                for order, cidx in later.at(path):
+                    clobbers.append((cidx, idx))
+            # the trie numbers later items last line first, which is the
+            #   order they are excluded in
+            for order, cidx in later.below(path):
+                item.exclude(paths[cidx])
+            later.add(path, idx)
+
+        # report clobbers as the clobbering lines are met, last line first
+        clobbers.sort(reverse=True)
+        self.clobbers.extend([self.config_items[idx] for cidx, idx in clobbers])
+
         new_items = []
-        for item, path in items:
+        for item in self.config_items:
             if getattr(item, '_removeme', False):
                 continue
+            if self.svn_sparse:
+                item.set_sparse(True)
             new_items.extend(item.expand())
-
+        # whatever expanding the excludes listed is kept for later runs
+        svnlist.cache.save()
 
         self.config_items = new_items
 
     def checkout(self):
         """Checkout the repos gathered from the config file
+
+        items are handed to a Scheduler, which runs up to self.jobs of
+        them at once but never starts an item before the items it is
+        nested inside of have been checked out, and which holds back
+        items whose remote host is already at its limit.  sibling svn
+        items are checked out together (see rsvn.coalesce), as are cvs
+        items from one CVSROOT if batching is on (see rcvs.batch_items).
         """
-        # Create the shell object.  Eventually inject this as a param
-        # for testability.
-        sh = rover.shell.Shell()
         # Create the checkout directory if it doesn't exist
         if not os.path.exists(self.checkout_dir):
             os.makedirs(self.checkout_dir)
-        # Checkout each item
+
+        items = coalesce(self.config_items, self.checkout_dir)
+        items = batch_items(items, self.cvs_batch_size)
+
+        # in paranoid-fast mode, an item's reset must spare the items
+        #   nested inside it
+        self._paths = PathTrie()
+        for item in items:
+            self._paths.add(item.get_working_path(), item.get_working_path())
+
+        # each worker gets its own shell, since shells carry a dir stack
+        shells = {}
+        def checkout_item(item, slot):
+            if slot not in shells:
+                shells[slot] = rover.shell.Shell()
+            self._checkout_item(shells[slot], item)
+
+        for item in items:
+            if self.git_cache:
+                item.set_mirror_cache(self.git_cache)
+            item.set_clone_defaults(self.git_options)
+
+        scheduler = Scheduler(self.jobs, self.host_limit, self.host_limits)
+        if self.svn_split > 1:
+            self._set_splits(items, scheduler)
+
+        if self.checkout_mode == 'preserve' and not self.always_fetch \
+                and not self.test_mode and not self.locked:
+            remote_refs = self._list_remote_refs(scheduler)
+            for item in items:
+                item.set_remote_refs(remote_refs)
+
+        # remember what was synced, when and how long it took, in the
+        #   checkout directory itself; test mode leaves no trace.
+        #   directories are deleted in the background while checkouts
+        #   carry on, starting with anything an earlier run left behind
+        if not self.test_mode:
+            self.state = CheckoutState.open(self.checkout_dir)
+            self.trash = Trash(self.checkout_dir)
+            self.trash.reap_leftovers()
+
+        for item in items:
+            scheduler.add(lambda slot, item=item: checkout_item(item, slot)
+                    , item.get_path(), item.get_host())
+        try:
+            scheduler.run()
+        finally:
+            if self.state is not None:
+                self.state.close()
+                self.state = None
+            if self.trash is not None:
+                self.trash.close()
+                self.trash = None
+
+    def _set_splits(self, items, scheduler):
+        """
+        give each item its share of self.svn_split: the items which may
+        run against one host at once split its host limit between them,
+        so that they never hold more connections to it than the limit
+        """
+        counts = {}
+        for item in items:
+            counts[item.get_host()] = counts.get(item.get_host(), 0) + 1
+        for item in items:
+            split = self.svn_split
+            limit = scheduler.limit_for(item.get_host())
+            if limit is not None:
+                concurrent = min(limit, self.jobs, counts[item.get_host()])
+                split = min(split, max(1, limit / concurrent))
+            item.set_split(split)
+
+    def _list_remote_refs(self, scheduler):
+        """
+        list the refs of every remote that an existing git checkout
+        fetches from, with one concurrent `git ls-remote' per remote
+        """
+        urls = []
+        seen = set()
         for item in self.config_items:
-            if self.checkout_mode == 'paranoid':
-                fullpath = os.path.join(self.checkout_dir, item.get_path())
-                if os.path.exists(fullpath):
-                    if self.test_mode:
-                        print "[TEST MODE] REMOVING:", fullpath
-                    else:
-                        print "REMOVING:", fullpath
-                        shutil.rmtree(fullpath, True)
+            url = item.get_fetch_url(self.checkout_dir)
+            if url and url not in seen:
+                seen.add(url)
+                urls.append(url)
+        if not urls:
+            return {}
+        return list_remote_refs(rover.shell.Shell(), urls
+                , max(self.jobs, LS_REMOTE_JOBS), scheduler.limit_for
+                , self.test_mode)
+
+    def _checkout_item(self, sh, item):
+        """Checkout a single item, clearing it out first in paranoid mode
+
+        paranoid-fast mode resets an existing working copy and updates it
+        instead, and only clears it out and checks it out afresh if it is
+        still not pristine afterwards
+        """
+        started = time.time()
+        status = 'failed'
+        # a group of items is recorded item by item
+        members = getattr(item, 'members', [item])
+        new = set()
+        try:
+            if self.checkout_mode == 'paranoid-fast' \
+                    and self._reset_item(sh, item):
+                status = 'ok'
+                return
+            if self.checkout_mode in ('paranoid', 'paranoid-fast'):
+                self._remove_item(item)
+            if self.state is not None:
+                new = set([member.get_path() for member in members
+                        if member.plan_action(sh, self.checkout_dir
+                        , self.checkout_mode) in NEW_ACTIONS])
             item.checkout(sh, self.checkout_dir, self.checkout_mode
                     , self.verbose, self.test_mode)
+            status = 'ok'
+        finally:
+            if self.state is not None:
+                for recorded in members:
+                    action = 'update'
+                    if recorded.get_path() in new:
+                        action = 'checkout'
+                    self._record(sh, recorded, started, status, action)
+
+    def _remove_item(self, item):
+        # items checked out together may lie outside the first one's path
+        paths = [item.get_working_path()]
+        for member in getattr(item, 'members', []):
+            if not overlaps(member.get_working_path(), paths):
+                paths.append(member.get_working_path())
+        for path in paths:
+            fullpath = os.path.join(self.checkout_dir, path)
+            if os.path.exists(fullpath):
+                if self.test_mode:
+                    rover.shell.echo("[TEST MODE] REMOVING:", fullpath)
+                else:
+                    rover.shell.echo("REMOVING:", fullpath)
+                    self.trash.discard(fullpath)
 
+    def _reset_item(self, sh, item):
+        """
+        reset and update an existing working copy in place, returning
+        False if there isn't one or it isn't pristine afterwards
+        """
+        path = item.get_working_path()
+        if not os.path.exists(os.path.join(self.checkout_dir, path)):
+            return False
+        keep = [other[len(path) + 1:] for idx, other in self._paths.below(path)]
+        if not item.reset(sh, self.checkout_dir, keep, self.verbose
+                , self.test_mode):
+            return False
+        item.checkout(sh, self.checkout_dir, self.checkout_mode
+                , self.verbose, self.test_mode)
+        if self.test_mode or item.is_pristine(sh, self.checkout_dir, keep):
+            return True
+        rover.shell.echo("NOT PRISTINE:", os.path.join(self.checkout_dir
+                , path))
+        return False
+
+    def _record(self, sh, item, started, status, action='update'):
+        """Note the outcome of checking out item in the state database
+
+        along with how much repository data its working copy holds now,
+        and how much of that came in with this sync, which is what later
+        plans estimate transfers by.  an update which left the item at the
+        revision it was already at keeps the size recorded before, since
+        measuring it can cost a command of its own.
+        """
+        finished = time.time()
+        resolved = size = received = None
+        previous = None
+        if action == 'update':
+            previous = self.state.get(item.get_path())
+        if status == 'ok':
+            try:
+                resolved = item.get_resolved_revision(sh, self.checkout_dir)
+                if resolved is not None and previous is not None \
+                        and previous['status'] == 'ok' \
+                        and previous['resolved'] == resolved \
+                        and previous['bytes'] is not None:
+                    size, received = previous['bytes'], 0
+                else:
+                    size = item.get_size(sh, self.checkout_dir)
+            except Exception, e:
+                # the state database is a cache; never fail a checkout
+                #   just because it can't be filled in
+                pass
+        if size is not None and received is None:
+            received = size
+            if action == 'update':
+                received = None
+                if previous is not None and previous['bytes'] is not None:
+                    received = max(0, size - previous['bytes'])
+        self.state.record(item.get_path(), config_line(item), item.get_vcs()
+                , resolved, started, finished - started, status, action
+                , size, received)
 
     def apply_filters(self):
         self._apply_includes()
@@ -307,26 +719,26 @@ class Rover:
         """
         if self.includes == []:
             return
+        includes = PathTrie()
+        for include in self.includes:
+            includes.add(include, include)
+
         allowed_items = []
         for item in self.config_items:
-            allowed = False
             path = item.get_path()
-            for include in self.includes:
-                if self._path_overrides(include, path):
-                    # path is contained within exclude, so
-                    # allow the item
-                    allowed = True
-                    break
-                elif self._path_overrides(path, include):
-                    # include is contained within path, so
-                    # create a cloned config item for the
-                    # include path (ie narrow the item)
-                    # and don't include the original item
-                    allowed_items.append(item.narrow(include))
-                    break
-
-            if allowed:
+            # only the first include which matches at all counts
+            above = includes.first_on_path(path)
+            below = includes.first_below(path)
+            if above is not None and (below is None or above < below):
+                # path is contained within the include, so
+                # allow the item
                 allowed_items.append(item)
+            elif below is not None:
+                # include is contained within path, so
+                # create a cloned config item for the
+                # include path (ie narrow the item)
+                # and don't include the original item
+                allowed_items.append(item.narrow(below[1]))
         
         self.config_items = allowed_items
 
@@ -339,23 +751,27 @@ class Rover:
         """
         if self.excludes == []:
             return
+        excludes = PathTrie()
+        for exclude in self.excludes:
+            excludes.add(exclude, exclude)
+
         allowed_items = []
         for item in self.config_items:
-            allowed = True
             path = item.get_path()
-            for exclude in self.excludes:
-                if self._path_overrides(exclude, path):
-                    # path is contained within exclude, so
-                    # don't allow the item at all
-                    allowed = False
+            # excludes are applied in order up to the first one which
+            #   contains path
+            above = excludes.first_on_path(path)
+            for entry in excludes.below(path):
+                if above is not None and entry > above:
                     break
-                elif self._path_overrides(path, exclude):
-                    # exclude is contained within path, so
-                    # exclude it from the item
-                    item.exclude(exclude)
+                # exclude is contained within path, so
+                # exclude it from the item
+                item.exclude(entry[1])
 
-            if allowed:
+            if above is None:
                 allowed_items.append(item)
+            # else path is contained within an exclude, so
+            #   don't allow the item at all
 
         self.config_items = allowed_items
 
@@ -363,26 +779,13 @@ class Rover:
     def _clean(self):
         """
         returns the list of directories to be removed.
-        walks the directory tree and builds a list of directories 
-        that are required by the config items, putting all others 
-        in the removes candidate list
-        """
-        removes = []
-        keeps = []
-        for root, dirnames, filenames in os.walk(self.checkout_dir):
-            for dirname in dirnames:
-                module = os.path.join(root, dirname)[len(self.checkout_dir):].strip('/')
-                keep = False
-                for item in self.config_items:
-                    if item.requires(module):
-                        keep = True
-                        break
-                if keep:
-                    keeps.append(module)
-                else:
-                    removes.append(module)
-                    dirnames.remove(dirname)
-        return removes
+        walks the directory tree and builds a list of directories
+        that are not required by the config items, only looking
+        inside directories where something could be removed
+        """
+        # rover's own bookkeeping is not a checked out directory
+        return find_removes(self.checkout_dir, self.config_items
+                , keep=[STATE_DIR, TRASH_DIR])
 
     def clean(self):
         """
@@ -391,16 +794,28 @@ class Rover:
         is only guaranteed to work with directories that are under
         version control.  it is not guaranteed to preserve or delete
         locally created content, and should only be used in clean and
-        paranoid modes.
+        paranoid modes.  directories are moved into the trash and deleted
+        in the background; this returns once they are gone.
         """
         removes = self._clean()
+        state = None
+        trash = Trash(self.checkout_dir)
+        if not self.test_mode:
+            trash.reap_leftovers()
+            if os.path.exists(state_path(self.checkout_dir)):
+                state = CheckoutState.open(self.checkout_dir)
         for remove in removes:
             fullpath = os.path.join(self.checkout_dir, remove)
             if self.test_mode:
                 print "[TEST MODE] REMOVING:", fullpath
             else:
                 print "REMOVING:", fullpath
-                shutil.rmtree(fullpath, True)
+                trash.discard(fullpath)
+                if state is not None:
+                    state.forget(remove)
+        if state is not None:
+            state.close()
+        trash.close()
 
     def force_revision(self, revision):
         """
@@ -419,9 +834,95 @@ class Rover:
         if fatal:
             sys.exit(1)
 
+    def plan_steps(self):
+        """
+        return a PlanStep for each item, saying what checking it out
+        would do and estimating what that would cost from the state
+        database's record of earlier syncs.  a sync never removes
+        anything beside the items (see clean()), and neither does a plan.
+
+        nothing is run which contacts a repository, and nothing is changed:
+        remote refs aren't listed, and svn excludes are expanded with the
+        listings earlier runs cached, however old, or not at all.
+        """
+        offline = svnlist.cache.offline
+        svnlist.cache.offline = True
+        try:
+            return self._plan_steps()
+        finally:
+            svnlist.cache.offline = offline
+
+    def _plan_steps(self):
+        if self.locked_filename:
+            self.load_lockfile(self.locked_filename)
+        else:
+            self.load_repos(config.open_repofile(self.repo_filename))
+            for config_name in self.config_names:
+                self.process_config(config_name)
+            if len(self.config_errors) == 0:
+                self.resolve()
+            self.apply_filters()
+        if len(self.config_errors) > 0:
+            self.warn(self.config_errors, fatal=True)
+
+        rows = []
+        if os.path.exists(state_path(self.checkout_dir)):
+            state = CheckoutState.open(self.checkout_dir)
+            try:
+                rows = state.items()
+            finally:
+                state.close()
+        estimator = Estimator(rows)
+
+        sh = rover.shell.Shell()
+        steps = []
+        for item in self.config_items:
+            path = item.get_path()
+            action = item.plan_action(sh, self.checkout_dir
+                    , self.checkout_mode, estimator.rows.get(path))
+            if action not in NEW_ACTIONS:
+                if self.checkout_mode == 'paranoid':
+                    action = 'reclone'
+                elif self.checkout_mode == 'paranoid-fast':
+                    action = 'reset'
+            seconds, bytes, guessed = estimator.estimate(action
+                    , item.get_vcs(), path)
+            steps.append(PlanStep(action, path, item.get_vcs(), seconds
+                    , bytes, guessed))
+        return steps
+
+    def plan(self):
+        """Print what running this instance of rover would do
+        """
+        for line in format_plan(self.plan_steps()):
+            print line
+        if len(self.clobbers) > 0:
+            self.warn(self.clobbers)
+
     def run(self):
         """Run this instance of rover
         """
+        try:
+            self._run()
+        finally:
+            if self.trace_filename:
+                self.save_trace()
+
+    def save_trace(self):
+        """write the commands run so far to the trace file"""
+        rover.trace.log.write_chrome_trace(self.trace_filename)
+        rover.shell.echo("WROTE TRACE:", self.trace_filename)
+
+    def _run(self):
+        if self.locked_filename:
+            self.load_lockfile(self.locked_filename)
+            if len(self.config_errors) > 0:
+                self.warn(self.config_errors, fatal=True)
+            self.checkout()
+            if self.lockfile_filename:
+                self.save_lockfile()
+            return
+
         self.load_repos(config.open_repofile(self.repo_filename))
 
         # open and parse each config file into a list of tuples
@@ -436,6 +937,8 @@ class Rover:
             self.warn(self.clobbers)
         self.apply_filters()
         self.checkout()
+        if self.lockfile_filename:
+            self.save_lockfile()
         if len(self.clobbers) > 0:
             self.warn(self.clobbers)
 
@@ -0,0 +1,165 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# a process-wide cache of the aliases defined in each CVS repository's
+# CVSROOT/modules file, shared by every CVSFactory.
+#
+# the parsed alias map is kept on disk per CVSROOT, along with the
+# revision of CVSROOT/modules it was parsed from.  it is trusted for ttl
+# seconds; after that one `cvs rlog -h' tells whether the file has
+# changed, and only then is it checked out and parsed again.
+
+import json
+import os
+import re
+import threading
+import time
+
+import rover.config
+from rover import shell
+
+# how long, in seconds, an alias map is trusted without asking cvs
+DEFAULT_TTL = 60 * 60
+
+COMMENT_RE = re.compile(r'#.*')
+ALIAS_RE = re.compile(r'(?P<module_name>\w+) \-a (?P<module_contents>.*?[^\\]\n)'
+        , re.DOTALL)
+SEPARATOR_RE = re.compile(r'[\s\\]+')
+HEAD_RE = re.compile(r'^head: (\S+)', re.MULTILINE)
+
+
+def parse_modules(content):
+    """
+    parse the contents of a CVSROOT/modules file into a dictionary of
+    alias name => list of the modules (and !excludes) it stands for
+    """
+    content = COMMENT_RE.sub('', content)  # kill all comments
+    content = content.replace('\r\n', '\n')
+
+    aliases = {}
+    for match in ALIAS_RE.finditer(content):
+        aliases[match.group('module_name')] = SEPARATOR_RE.sub(' '
+                , match.group('module_contents')).strip().split()
+    return aliases
+
+
+class CVSModulesCache(object):
+    def __init__(self, cache_file=None, ttl=DEFAULT_TTL):
+        """
+        cache_file => json file to keep alias maps in; defaults to
+                      cvs-modules.json in rover.config.cache_dir
+        ttl        => seconds an alias map is used without checking the
+                      revision of CVSROOT/modules; 0 checks every run
+        """
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sh = shell.Shell()
+        self._entries = None
+        # roots looked up by this process, which are good for the whole run
+        self._fresh = set()
+
+    def aliases(self, root):
+        """return the alias map of the repository at root"""
+        self._lock.acquire()
+        try:
+            entries = self._load_disk()
+            entry = entries.get(root)
+            if entry is not None and (root in self._fresh
+                    or time.time() - entry['time'] <= self.ttl):
+                return entry['aliases']
+
+            revision = self._head_revision(root)
+            if entry is None or revision is None \
+                    or entry['revision'] != revision:
+                entry = {'revision': revision
+                        , 'aliases': parse_modules(self._fetch(root))}
+            entry['time'] = time.time()
+            entries[root] = entry
+            self._fresh.add(root)
+            self._save_disk()
+            return entry['aliases']
+        finally:
+            self._lock.release()
+
+    def _head_revision(self, root):
+        """
+        return the head revision of CVSROOT/modules, or None if it can't
+        be told
+        """
+        return_code, out = self._sh.tee_silent(
+                'cvs -Q -d %s rlog -h CVSROOT/modules' % root)
+        if return_code:
+            return None
+        match = HEAD_RE.search('\n'.join(out))
+        return match and match.group(1) or None
+
+    def _fetch(self, root):
+        cmd = 'cvs -Q -d %s checkout -p -A CVSROOT/modules' % root
+        return_code, out = self._sh.tee_silent(cmd)
+        if return_code:
+            raise Exception("Error while executing '%s': %s"
+                    % (cmd, '\n'.join(out)))
+        # the alias pattern needs every line, the last one too, to end
+        #   with a newline
+        return '\n'.join(out) + '\n'
+
+    def _cache_path(self):
+        return self.cache_file or os.path.join(rover.config.cache_dir
+                , 'cvs-modules.json')
+
+    def _load_disk(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                fp = open(self._cache_path())
+                try:
+                    self._entries = json.load(fp)
+                finally:
+                    fp.close()
+            except (IOError, ValueError):
+                pass
+        return self._entries
+
+    def _save_disk(self):
+        # the cache is only an optimization; never fail a checkout over it
+        path = self._cache_path()
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tmp = '%s.%d' % (path, os.getpid())
+            fp = open(tmp, 'w')
+            try:
+                json.dump(self._entries, fp)
+            finally:
+                fp.close()
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            pass
+
+
+cache = CVSModulesCache()
+
+def aliases(root):
+    """return the alias map of root through the shared cache"""
+    return cache.aliases(root)
@@ -0,0 +1,185 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import errno
+import os
+import re
+import threading
+
+from rover import capabilities, shell
+
+
+def normalize_url(url):
+    """
+    turn a git url or connection string into a relative path which is
+    the same for every spelling of the same repository, eg
+
+        git://github.com/wgen/rover.git => github.com/wgen/rover
+        git@github.com:wgen/rover       => github.com/wgen/rover
+    """
+    url = url.strip().rstrip('/')
+    if url.endswith('.git'):
+        url = url[:-4]
+
+    match = re.match(r'^[a-zA-Z][\w+.-]*://(?:[^@/]*@)?([^/]*)(.*)$', url)
+    if match is None:
+        match = re.match(r'^(?:[^@/:]+@)?([^@/:]+):(.*)$', url)
+    if match is None:
+        host, path = 'local', os.path.abspath(url)
+    else:
+        host, path = match.groups()
+        host = host.lower().replace(':', '_') or 'local'
+
+    parts = [part for part in path.split('/') if part not in ('', '.', '..')]
+    return '/'.join([host] + parts)
+
+
+def _gc_disabled(path):
+    """True if the config of the bare repository at path sets gc.auto 0"""
+    try:
+        fp = open(os.path.join(path, 'config'))
+    except IOError:
+        return False
+    section = None
+    try:
+        for line in fp:
+            line = line.strip()
+            if line.startswith('['):
+                section = line.strip('[]').strip().lower()
+            elif section == 'gc' and '=' in line:
+                name, value = [part.strip() for part in line.split('=', 1)]
+                if name.lower() == 'auto' and value == '0':
+                    return True
+    finally:
+        fp.close()
+    return False
+
+
+class GitMirrorCache(object):
+    """
+    a directory of bare mirrors of git repositories, which clones borrow
+    objects from so that only what the mirror lacks crosses the network.
+
+    each mirror is created or fetched at most once per GitMirrorCache,
+    however many checkouts use it.
+
+    clones made without --dissociate keep borrowing objects from their
+    mirror, so a mirror never loses any: it is fetched without --prune,
+    and automatic gc is turned off in it.  remove a mirror to reclaim
+    its space, and re-clone whatever borrowed from it.
+    """
+    def __init__(self, root, dissociate=False):
+        """
+        root => directory holding the mirrors
+        dissociate => copy borrowed objects into each clone, so that it
+                      does not depend on the mirror afterwards
+        """
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.dissociate = dissociate
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._refreshed = {}
+
+    def mirror_path(self, url):
+        return os.path.join(self.root, normalize_url(url) + '.git')
+
+    def refresh(self, sh, url, verbose=False, test_mode=False):
+        """
+        bring the mirror of url up to date, creating it if needed, unless
+        that was already done. returns the mirror's path, or None if it
+        could not be brought up to date.
+        """
+        self._lock.acquire()
+        try:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        finally:
+            self._lock.release()
+
+        # other checkouts of the same url wait here for the first one
+        url_lock.acquire()
+        try:
+            if url not in self._refreshed:
+                self._refreshed[url] = self._update(sh, url, verbose
+                        , test_mode)
+            return self._refreshed[url]
+        finally:
+            url_lock.release()
+
+    def _update(self, sh, url, verbose, test_mode):
+        path = self.mirror_path(url)
+        if os.path.exists(path):
+            # mirrors made before gc was turned off in them
+            if not _gc_disabled(path):
+                self._disable_gc(sh, path, verbose, test_mode)
+            cmd = ['git', 'fetch']
+            if not verbose:
+                cmd.append('-q')
+            result = sh.execute(cmd, cwd=path, verbose=verbose
+                    , test_mode=test_mode)
+        else:
+            parent = os.path.dirname(path)
+            if not test_mode and not os.path.exists(parent):
+                try:
+                    os.makedirs(parent)
+                except OSError, e:
+                    # another mirror on the same host may have created it
+                    if e.errno != errno.EEXIST:
+                        raise
+            cmd = ['git', 'clone', '--mirror']
+            if not verbose:
+                cmd.append('-q')
+            cmd.extend([url, path])
+            result = sh.execute(cmd, verbose=verbose, test_mode=test_mode)
+            if test_mode or result == 0:
+                self._disable_gc(sh, path, verbose, test_mode)
+
+        if test_mode:
+            return path
+        if result != 0:
+            shell.echo("WARNING: could not update git mirror %s of %s"
+                    % (path, url))
+            if not os.path.exists(os.path.join(path, 'objects')):
+                return None
+        return path
+
+    def _disable_gc(self, sh, path, verbose, test_mode):
+        sh.execute(['git', 'config', 'gc.auto', '0'], cwd=path
+                , verbose=verbose, test_mode=test_mode)
+
+    def clone_args(self, sh, url, verbose=False, test_mode=False):
+        """
+        return the arguments to add to a `git clone' of url so that it is
+        seeded from the mirror; empty if the mirror is unusable
+        """
+        path = self.refresh(sh, url, verbose, test_mode)
+        if path is None:
+            return []
+        args = ['--reference', path]
+        if self.dissociate:
+            git = capabilities.get('git')
+            if git and git.supports('dissociate'):
+                args.append('--dissociate')
+            else:
+                shell.echo("WARNING: this git does not support --dissociate;"
+                        " %s will borrow objects from %s" % (url, path))
+        return args
@@ -0,0 +1,143 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import re
+
+from rover import capabilities, shell
+from rover.config import parse_options
+
+
+_filter_re = re.compile(r'^(blob:none|blob:limit=\d+[kmg]?|tree:\d+)$')
+
+
+class GitCloneOptions(object):
+    """
+    how much of a git repository to fetch: a shallow history depth, only
+    the branch being checked out, and/or a partial clone filter.
+
+    unset options (None) fall back to the defaults given to merge(), so
+    that a config line can override options given on the command line.
+    """
+    def __init__(self, depth=None, single_branch=None, filter=None):
+        if depth is not None:
+            try:
+                depth = int(depth)
+            except ValueError:
+                depth = 0
+            if depth < 1:
+                raise Exception("git depth must be a positive number")
+        if filter is not None and not _filter_re.match(filter):
+            raise Exception("unsupported git filter `%s'; use blob:none"
+                    ", blob:limit=<n> or tree:<depth>" % filter)
+        self.depth = depth
+        self.single_branch = single_branch
+        self.filter = filter
+
+    @classmethod
+    def parse(cls, field):
+        """
+        build options from the options column of a config line, eg
+        `depth=1 single-branch filter=blob:none'
+        """
+        options = parse_options(field)
+        depth = options.pop('depth', None)
+        single_branch = options.pop('single-branch', None)
+        filter = options.pop('filter', None)
+        if options:
+            raise Exception("unknown git options: %s"
+                    % ', '.join(sorted(options.keys())))
+        return cls(depth, single_branch, filter)
+
+    def merge(self, defaults):
+        """return options with defaults filling in whatever is unset here"""
+        merged = GitCloneOptions()
+        for name in ('depth', 'single_branch', 'filter'):
+            value = getattr(self, name)
+            if value is None:
+                value = getattr(defaults, name)
+            setattr(merged, name, value)
+        return merged
+
+    def for_commit(self):
+        """
+        the options to clone with when checking out a commit by its id,
+        which a shallow or single-branch clone may well not contain
+        """
+        return GitCloneOptions(filter=self.filter)
+
+    def narrows(self):
+        """True if a clone with these options needs to name its branch"""
+        return bool(self.depth or self.single_branch)
+
+    def clone_args(self, git=None):
+        """
+        arguments for `git clone'.  options which git (the Capabilities of
+        the git to run, by default the installed one) doesn't support are
+        left out with a warning, so that the clone fetches more than asked
+        rather than fails.
+        """
+        if git is None:
+            git = capabilities.get('git')
+        args = []
+        if self.depth:
+            args.extend(['--depth', str(self.depth)])
+        if self.single_branch:
+            if _supports(git, 'single-branch'):
+                args.append('--single-branch')
+            else:
+                shell.echo("WARNING: this git does not support"
+                        " --single-branch; cloning every branch")
+        if self.filter:
+            if _supports(git, 'filter'):
+                args.append('--filter=%s' % self.filter)
+            else:
+                shell.echo("WARNING: this git does not support --filter;"
+                        " cloning every object")
+        return args
+
+    def fetch_args(self):
+        """
+        arguments for later fetches and pulls.  the depth is passed again
+        so that a shallow clone stays shallow; single-branch and filter
+        settings are recorded in the clone's config and need no flags,
+        which is as well, since a git which couldn't clone with them
+        (see clone_args()) couldn't fetch with them either.
+        """
+        if self.depth:
+            return ['--depth', str(self.depth)]
+        return []
+
+    def __eq__(self, other):
+        return (self.depth, self.single_branch, self.filter) == \
+                (other.depth, other.single_branch, other.filter)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+def _supports(git, feature):
+    """
+    True if git supports feature.  a git which can't be probed is given
+    the benefit of the doubt; running it will tell.
+    """
+    return git is None or git.version is None or git.supports(feature)
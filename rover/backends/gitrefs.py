@@ -0,0 +1,270 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import pipes
+import re
+
+from rover import shell
+from rover.remote import remote_host
+
+_commit_id_re = re.compile(r'^(?:[0-9a-f]{40}|[0-9a-f]{64})$')
+
+
+def is_commit_id(name):
+    """True if name is a full commit id rather than a branch or tag"""
+    return bool(_commit_id_re.match(name or ''))
+
+
+def find_git_dir(directory):
+    """
+    return the git directory of the working tree at directory, following
+    a `gitdir:' file if .git is one, or None if there isn't one
+    """
+    git_dir = os.path.join(directory, '.git')
+    if os.path.isfile(git_dir):
+        fp = open(git_dir)
+        try:
+            line = fp.readline().strip()
+        finally:
+            fp.close()
+        if not line.startswith('gitdir:'):
+            return None
+        git_dir = os.path.join(directory, line[len('gitdir:'):].strip())
+    if not os.path.isdir(git_dir):
+        return None
+    return git_dir
+
+
+class RefSnapshot(object):
+    """
+    every ref of one repository, read in a single pass so that any number
+    of lookups cost no further processes.  a snapshot does not notice
+    later changes to the repository; load a new one after fetching.
+    """
+    def __init__(self, refs, head=None):
+        """
+        refs => dict of full ref name => object name
+        head => what HEAD points at: a full ref name for a branch, or an
+                object name if it is detached
+        """
+        self.refs = refs
+        self.head = head
+
+    @classmethod
+    def load(cls, directory, sh):
+        """
+        snapshot the refs of the repository at directory, straight from
+        packed-refs and refs/ where possible, otherwise with one call to
+        `git for-each-ref'
+        """
+        git_dir = find_git_dir(directory)
+        if git_dir is None:
+            return cls({})
+        if os.path.exists(os.path.join(git_dir, 'reftable')):
+            return cls._load_for_each_ref(directory, git_dir, sh)
+        return cls._load_files(git_dir)
+
+    @classmethod
+    def _load_files(cls, git_dir):
+        refs = {}
+        packed = os.path.join(git_dir, 'packed-refs')
+        if os.path.exists(packed):
+            fp = open(packed)
+            try:
+                last = None
+                for line in fp:
+                    # skip the header; the peeled value of a tag follows it
+                    if line.startswith('#'):
+                        continue
+                    if line.startswith('^'):
+                        if last is not None:
+                            refs[last + '^{}'] = line[1:].strip()
+                        continue
+                    parts = line.split()
+                    if len(parts) == 2:
+                        refs[parts[1]] = parts[0]
+                        last = parts[1]
+            finally:
+                fp.close()
+
+        # loose refs win over packed ones
+        symbolic = {}
+        refs_dir = os.path.join(git_dir, 'refs')
+        for root, dirnames, filenames in os.walk(refs_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                name = 'refs' + path[len(refs_dir):].replace(os.sep, '/')
+                value = _read_first_line(path)
+                if value.startswith('ref:'):
+                    symbolic[name] = value[4:].strip()
+                elif value:
+                    refs[name] = value
+        for name, target in symbolic.items():
+            if target in refs:
+                refs[name] = refs[target]
+
+        return cls(refs, _read_head(git_dir))
+
+    @classmethod
+    def _load_for_each_ref(cls, directory, git_dir, sh):
+        cmd = "git for-each-ref --format='%(objectname) %(refname)'"
+        ret, output = sh.tee_silent(cmd, cwd=directory)
+        if ret:
+            raise Exception("Error while executing '%s': %s" % (cmd, output))
+        refs = {}
+        for line in output:
+            parts = line.split()
+            if len(parts) == 2:
+                refs[parts[1]] = parts[0]
+        return cls(refs, _read_head(git_dir))
+
+    def get(self, refname):
+        """return the object name refname points at, or None"""
+        return self.refs.get(refname)
+
+    def head_commit(self):
+        """return the object name HEAD points at, or None"""
+        if self.head and self.head.startswith('refs/'):
+            return self.refs.get(self.head)
+        return self.head
+
+    def find_tag(self, name):
+        return 'refs/tags/%s' % name in self.refs
+
+    def find_local_branch(self, name):
+        return 'refs/heads/%s' % name in self.refs
+
+    def find_remote_branch(self, name, remote='origin'):
+        return 'refs/remotes/%s/%s' % (remote, name) in self.refs
+
+
+def up_to_date(local, remote, name):
+    """
+    return True if fetching would change nothing for a checkout of the
+    branch or tag `name': local (a RefSnapshot) already has HEAD on what
+    remote (a dict of ref name => object name, as listed by `git
+    ls-remote') says name points at, and last fetched that same commit.
+    """
+    if remote is None:
+        return False
+    head = local.head_commit()
+    if head is None:
+        return False
+
+    branch = remote.get('refs/heads/%s' % name)
+    if branch is not None:
+        return local.head == 'refs/heads/%s' % name and head == branch \
+                and local.get('refs/remotes/origin/%s' % name) == branch
+
+    tag = remote.get('refs/tags/%s' % name)
+    if tag is not None:
+        # annotated tags are listed twice, the second time peeled
+        commit = remote.get('refs/tags/%s^{}' % name, tag)
+        return local.get('refs/tags/%s' % name) == tag and head == commit
+
+    return False
+
+
+def checkout_action(local, name, checkout_mode):
+    """
+    return what checking out the branch, tag or commit `name' over the
+    repository local (a RefSnapshot) would do, judging by its own refs
+    alone: 'no-op' if it has the commit checked out already in preserve
+    mode, 'switch' if HEAD is on some other branch or commit, otherwise
+    'fetch', which may turn out to bring in nothing.
+    """
+    head = local.head_commit()
+    if is_commit_id(name):
+        if head != name:
+            return 'switch'
+        if checkout_mode == 'preserve':
+            return 'no-op'
+        return 'fetch'
+    if local.head == 'refs/heads/%s' % name:
+        return 'fetch'
+    tag = 'refs/tags/%s' % name
+    if head is not None and head in (local.get(tag), local.get(tag + '^{}')):
+        return 'fetch'
+    return 'switch'
+
+
+def list_remote_refs(sh, urls, jobs=8, limit_for=None, test_mode=False):
+    """
+    run `git ls-remote' through sh against every url, up to jobs at once
+    and no more than limit_for(host) at once against any one host,
+    multiplexed on the calling thread.  returns a dict of url => dict of
+    ref name => object name, with None for urls which could not be
+    listed.
+    """
+    results = {}
+    pending = list(urls)
+    running = {}
+    reactor = shell.Reactor()
+
+    def start_more():
+        index = 0
+        while index < len(pending) and sum(running.values()) < jobs:
+            url = pending[index]
+            host = remote_host(url)
+            limit = limit_for and limit_for(host)
+            if limit is not None and running.get(host, 0) >= limit:
+                index += 1
+                continue
+            pending.pop(index)
+            start(url, host)
+
+    def start(url, host):
+        lines = []
+        def on_exit(code):
+            running[host] -= 1
+            results[url] = None
+            if code == 0:
+                results[url] = dict([tuple(reversed(line.split()))
+                        for line in lines if len(line.split()) == 2])
+            start_more()
+
+        running[host] = running.get(host, 0) + 1
+        sh.spawn(reactor, ['git', 'ls-remote', pipes.quote(url)]
+                , on_line=lines.append, on_exit=on_exit, test_mode=test_mode)
+
+    start_more()
+    reactor.run()
+    return results
+
+
+def _read_first_line(path):
+    try:
+        fp = open(path)
+    except IOError:
+        return ''
+    try:
+        return fp.readline().strip()
+    finally:
+        fp.close()
+
+def _read_head(git_dir):
+    head = _read_first_line(os.path.join(git_dir, 'HEAD'))
+    if head.startswith('ref:'):
+        return head[4:].strip()
+    return head or None
@@ -0,0 +1,155 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# resetting, checking and measuring git working trees, shared by GitItem
+# and GitRepo
+
+import pipes
+
+from rover.backends.gitrefs import RefSnapshot, find_git_dir, is_commit_id
+from rover.pathtrie import overlaps
+
+
+def reset_work_tree(sh, work_tree, keep=(), verbose=True, test_mode=False):
+    """
+    throw away every local change in the working tree at work_tree:
+    modified files with `git reset --hard', then untracked and ignored
+    files and nested repositories with `git clean -ffdx', leaving alone
+    the paths (relative to work_tree) in keep.
+
+    return False if there's no working tree there, or git fails
+    """
+    if find_git_dir(work_tree) is None:
+        return False
+    cmd = ['git reset -q --hard']
+    ret, out = sh.execute(cmd, cwd=work_tree, verbose=verbose
+            , test_mode=test_mode, return_out=True)
+    if ret:
+        return False
+    cmd = ['git clean -q -ffdx']
+    cmd.extend(['-e %s' % pipes.quote('/' + path) for path in keep])
+    ret, out = sh.execute(cmd, cwd=work_tree, verbose=verbose
+            , test_mode=test_mode, return_out=True)
+    return ret == 0
+
+
+def remote_target(sh, work_tree, treeish):
+    """
+    return (ref, commit) for what a fresh clone of treeish would have at
+    HEAD, going by the refs last fetched into work_tree: origin's branch
+    treeish, or else the tag treeish, and the commit it points at.  a
+    commit id is its own target.  (None, None) if treeish isn't known.
+    """
+    if is_commit_id(treeish):
+        return treeish, treeish
+    for ref in ('refs/remotes/origin/%s' % treeish, 'refs/tags/%s' % treeish):
+        ret, out = sh.tee_silent('git rev-parse -q --verify %s'
+                % pipes.quote(ref + '^{commit}'), cwd=work_tree)
+        if ret == 0 and out:
+            return ref, out[0]
+    return None, None
+
+
+def force_checkout(sh, work_tree, treeish, fetch_args=(), verbose=True
+        , test_mode=False):
+    """
+    bring the working tree at work_tree to exactly what a fresh clone of
+    treeish would check out, local commits and changes notwithstanding:
+    fetch, then `git checkout -f -B' a branch onto origin's, or check a
+    tag or commit id out detached with `git checkout -f'
+    """
+    fetch = ['git fetch'] + list(fetch_args)
+    if not verbose:
+        fetch.insert(1, '-q')
+    sh.execute(fetch, cwd=work_tree, verbose=verbose, test_mode=test_mode)
+
+    ref, commit = remote_target(sh, work_tree, treeish)
+    if ref is None and test_mode:
+        # nothing was fetched, so assume a branch
+        ref = 'refs/remotes/origin/%s' % treeish
+    if ref is None:
+        raise Exception("branch '%s' does not exist in '%s'"
+                % (treeish, work_tree))
+    cmd = ['git checkout -f']
+    if not verbose:
+        cmd.append('-q')
+    if ref.startswith('refs/remotes/'):
+        cmd.extend(['-B', pipes.quote(treeish)
+                , pipes.quote('origin/%s' % treeish)])
+    else:
+        cmd.append(commit)
+    ret, out = sh.execute(cmd, cwd=work_tree, verbose=verbose
+            , test_mode=test_mode, return_out=True)
+    if ret:
+        raise Exception("git failure checking out '%s'" % treeish)
+
+
+def is_pristine(sh, work_tree, keep=(), treeish=None):
+    """
+    return True if `git status' finds nothing modified, untracked or
+    ignored in the working tree at work_tree, other than at, inside or
+    above the paths (relative to work_tree) in keep.  given treeish, HEAD
+    must also be where a fresh clone of it would be (see remote_target()),
+    so that local commits count as changes too.
+    """
+    if treeish is not None:
+        ref, commit = remote_target(sh, work_tree, treeish)
+        snapshot = RefSnapshot.load(work_tree, sh)
+        if commit is None or snapshot.head_commit() != commit:
+            return False
+        if ref.startswith('refs/remotes/') \
+                and snapshot.head != 'refs/heads/%s' % treeish:
+            return False
+    ret, out = sh.tee_silent('git status --porcelain --ignored'
+            ' --untracked-files=all', cwd=work_tree)
+    if ret:
+        return False
+    for line in out:
+        # output lines come stripped, so the two status letters may have
+        #   lost their leading space; the path follows them either way
+        path = line.split(None, 1)[-1]
+        if ' -> ' in path:
+            path = path.split(' -> ', 1)[1]
+        path = path.strip('"').rstrip('/')
+        if not overlaps(path, keep):
+            return False
+    return True
+
+
+def repository_size(sh, work_tree):
+    """
+    return the bytes of objects, packed and loose, in the repository of
+    the working tree at work_tree, as `git count-objects' tells, or None
+    if there's no repository there or git fails
+    """
+    if find_git_dir(work_tree) is None:
+        return None
+    ret, out = sh.tee_silent('git count-objects -v', cwd=work_tree)
+    if ret:
+        return None
+    kib = 0
+    for line in out:
+        name, sep, value = line.partition(':')
+        if name.strip() in ('size', 'size-pack') and value.strip().isdigit():
+            kib += int(value)
+    return kib * 1024
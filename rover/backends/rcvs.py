@@ -23,39 +23,60 @@
 
 import os
 import re
+import shutil
+import time
 import types
 
-from rover import shell
+from rover import shell, state
+from rover.pathtrie import PathTrie, overlaps
+from rover.remote import remote_host
+from rover.backends import cvsmodules
 from rover.backends.rover_interface import RoverItemFactory, RoverItem
 
+# how dates are passed to `cvs -D'
+CVS_DATE_FORMAT = '%Y-%m-%d %H:%M:%S +0000'
+
+
 class CVSFactory(RoverItemFactory):
     
     def __init__(self, aliases=None):
-        # TODO: doc me
+        """
+        aliases => the contents of a CVSROOT/modules file to use instead
+                   of looking each repository's up through cvsmodules
+        """
         self._aliases = aliases
 
     def get_rover_items(self, config_line):
         """
         @param config_line: tuple of strings representing the 
-            rover config line, i.e. (module, revision, vcs)
+            rover config line, i.e. (module, revision, vcs[, cvsroot[,
+            date]]) where a missing or empty cvsroot means $CVSROOT, and
+            date pins the checkout to the revision as of that date
         @return: a list of RoverItems that this rover
           config line would check out. list will usually
           be 1 item long, but may be more in the case
           of e.g. CVS aliases
         """
         module, revision = config_line[:2]
+        root = None
+        if len(config_line) > 3 and config_line[3]:
+            root = config_line[3]
+        date = None
+        if len(config_line) > 4 and config_line[4]:
+            date = config_line[4]
         out = []
-        out.append(CVSItem(module, revision))
+        out.append(CVSItem(module, revision, root, date))
 
         return out
 
-    def _is_alias(self, module):
+    def _is_alias(self, module, root=None):
         """
         determine if a module is a CVS alias
         @param module: string
+        @param root:   the CVSROOT to look in, by default $CVSROOT
         @return:       boolean
         """
-        aliases = self._get_modules_content()
+        aliases = self._get_modules_content(root)
         if module in aliases:
             return True
         return False
@@ -81,40 +102,33 @@ class CVSFactory(RoverItemFactory):
 
         return out
 
-    def _get_modules_content(self):
-        """Not sure what this does.
+    def _get_modules_content(self, root=None):
+        """
+        return the aliases defined in CVSROOT/modules of root (by default
+        $CVSROOT), as a dictionary of alias name => list of modules
         """
         if self._aliases is None:
-            cmd = 'cvs -Q -d %s checkout -p -A CVSROOT/modules' % os.environ['CVSROOT']
-            exitcode, aliases = shell.Shell().tee_silent(cmd)
-            self._aliases = '\n'.join(aliases)
+            return cvsmodules.aliases(root or os.environ['CVSROOT'])
         return self._get_aliases()
 
     def _get_aliases(self):
         if type(self._aliases) in types.StringTypes:
             # parse the CVSROOT/modules string into
             # a dictionary keyed by alias name
-            self._aliases = re.sub(r'#.*', '', self._aliases)  # kill all comments
-            self._aliases = re.sub(r'\r\n', r'\n', self._aliases)  # kill all comments
-
-            aliases = {}
-            modules_re = re.compile( r'(?P<module_name>\w+) \-a (?P<module_contents>.*?[^\\]\n)', re.DOTALL )
-            module_matches = modules_re.finditer(self._aliases)
-            for module_match in module_matches:
-                aliases[module_match.group('module_name')] = re.sub( r'[\s\\]+', ' ',  module_match.group('module_contents') ).strip().split()
-
-            self._aliases = aliases
+            self._aliases = cvsmodules.parse_modules(self._aliases)
 
         return self._aliases
 
 class CVSItem(RoverItem):
     
-    def __init__(self, module, revision):
+    def __init__(self, module, revision, root=None, date=None):
         """
         @param config_item: tuple of at least 3 elements
         """
         self.module = module
         self.revision = revision
+        self.root = root
+        self.date = date
         self.excludes = []
 
         if ' !' in module:
@@ -133,72 +147,53 @@ class CVSItem(RoverItem):
         # if self._is_alias(module):
         #    raise Exception("bad module (CVS aliases not allowed): %s" % module)
 
-        cmd = ['cvs']
-
-        if not verbose:
-            cmd.append('-Q')
-
-        update_mode = True
         # if the path exists, but it's not a cvs working copy, 
         # we need to checkout instead of updating.  
         # that's why we append 'CVS' to the path
-        module_dir = os.path.join(checkout_dir, self.get_path(), 'CVS')
-        if os.path.exists(module_dir):
-            cmd.append('update -d')
-            if checkout_mode == 'clean':
-                cmd.append('-C')
-        else:
-            cmd.append('checkout')
-            update_mode = False
-
-        cmd.append('-P')  # prune empty dirs
-
-        if self.revision.lower() == 'head':
-            cmd.append('-A')  # Reset sticky tags
-        else:
-            cmd.append('-r ' + self.revision)  # revision, if not head
-            
+        update_mode = is_working_copy(checkout_dir, self.get_path())
 
         # build the command specification
         if update_mode:
             # we can't easily exclude things from the checkout here, 
-            cmd.append(self.module)
+            modules = [self.module]
         else:
             # when checkouting, put the module path first,
             # then use !directory/path to exclude portions
-            cmd.append(self.module)
-            cmd.extend(['!%s' % exclude for exclude in self.excludes])
+            modules = [self.module]
+            modules.extend(['!%s' % exclude for exclude in self.excludes])
 
-        return_code, out = sh.execute(cmd, cwd=checkout_dir
-                , verbose=verbose, test_mode=test_mode, return_out=True)
+        cmd = cvs_command(self.root, update_mode, checkout_mode
+                , self.revision, modules, verbose, self.date)
+        run_cvs(sh, cmd, checkout_dir, verbose, test_mode)
 
-        if return_code != 0:
-            # sometimes CVS screws up when replacing old files. the known
-            # erroring case is when a file exists in the local filesystem
-            # that was not in the previously-checked-out rover config (branch,
-            # etc) but is in the currently-being-checked-out config.
-            #
-            # in this case, we try to identify those files which are in the way,
-            # move them out of the way, and issue the command again one time.
-            in_the_way = re.compile( r"move away `?([^;]+)'; it is in the way" )
-            for line in out:
-                m = in_the_way.search(line)
-                if m:
-                    dirname, filename = os.path.split(m.group(1))
-
-                    # FIXME: Do we want to append the date/time as well?
-                    #        Otherwise, only one backup is allowed
-                    # back up the file as .rover.<filename>
-                    old = os.path.abspath( os.path.join( checkout_dir, dirname, filename ) )
-                    new = os.path.abspath( os.path.join( checkout_dir, dirname, '.%s.rover' % filename ) )
-
-                    #if verbose:
-                    print "* Backing up %(old)s to %(new)s" % locals()
-
-                    sh.move(old, new)
-
-            out = sh.execute(cmd, cwd=checkout_dir, verbose=verbose
-                    , test_mode=test_mode)
+    def reset(self, sh, checkout_dir, keep=(), verbose=True
+            , test_mode=False):
+        """
+        delete every file and directory CVS/Entries doesn't list; the
+        `update -C' that checkout() runs in paranoid-fast mode takes care
+        of modified files
+        """
+        wc = os.path.join(checkout_dir, self.get_path())
+        if not os.path.isdir(os.path.join(wc, 'CVS')):
+            return False
+        prune_unlisted(wc, keep, test_mode)
+        return True
+
+    def is_pristine(self, sh, checkout_dir, keep=()):
+        # -n reports what an update would do without doing it
+        return_code, out = sh.tee_silent('cvs -n -q update %s'
+                % self.module, cwd=checkout_dir)
+        if return_code:
+            return False
+        for line in out:
+            if line[:2] not in ('M ', 'C ', 'A ', 'R ', '? '):
+                continue
+            path = line[2:].strip()
+            if path.startswith(self.module + '/'):
+                path = path[len(self.module) + 1:]
+            if not overlaps(path, keep):
+                return False
+        return True
 
     def get_path(self):
         """
@@ -206,6 +201,67 @@ class CVSItem(RoverItem):
         """
         return self.module
 
+    def get_working_path(self):
+        return self.module
+
+    def get_root(self):
+        """return this item's CVSROOT, by default $CVSROOT"""
+        return self.root or os.environ.get('CVSROOT')
+
+    def get_host(self):
+        return remote_host(self.get_root())
+
+    def get_vcs(self):
+        return 'cvs'
+
+    def get_resolved_revision(self, sh, checkout_dir):
+        """
+        the non-branch tag or date the working copy is stuck to, if any,
+        as CVS/Tag records it; a branch or the trunk doesn't pin anything
+        """
+        path = os.path.join(checkout_dir, self.module, 'CVS', 'Tag')
+        if not os.path.exists(path):
+            return None
+        fp = open(path)
+        try:
+            sticky = fp.readline().strip()
+        finally:
+            fp.close()
+        if sticky[:1] in ('N', 'D'):
+            return sticky
+        return None
+
+    def get_locked_line(self, resolved, synced_at):
+        module = ' !'.join([self.module] + self.excludes)
+        revision, date = self.revision, self.date
+        if resolved and resolved.startswith('N'):
+            revision = resolved[1:]
+        elif resolved and resolved.startswith('D'):
+            # CVS/Tag keeps dates as YYYY.MM.DD.hh.mm.ss, in UTC
+            date = time.strftime(CVS_DATE_FORMAT, time.strptime(resolved[1:]
+                    , '%Y.%m.%d.%H.%M.%S'))
+        elif synced_at is not None:
+            date = time.strftime(CVS_DATE_FORMAT, time.gmtime(synced_at))
+        line = (module, revision, 'cvs', self.root or '')
+        if date:
+            line += (date,)
+        return line
+
+    def get_size(self, sh, checkout_dir):
+        # cvs keeps no copy of the repository's files to measure
+        return None
+
+    def plan_action(self, sh, checkout_dir, checkout_mode, recorded=None):
+        if not is_working_copy(checkout_dir, self.module):
+            return 'checkout'
+        if recorded is not None \
+                and recorded['config_line'] != state.config_line(self):
+            return 'switch'
+        return 'update'
+
+    def get_excludes(self):
+        return list(self.excludes)
+
     def exclude(self, path):
         """
         do what you need to do so that expand() works right
@@ -229,7 +285,7 @@ class CVSItem(RoverItem):
         and then deleting all but path and its children from the
         checked-out directory.
         """
-        narrowed = CVSItem(path, self.revision)
+        narrowed = CVSItem(path, self.revision, self.root, self.date)
         for exclude in self.excludes:
             narrowed.exclude(exclude)
 
@@ -271,7 +327,14 @@ class CVSItem(RoverItem):
         out = []
         for item in items:
             module = [item.module] + item.excludes
-            out.append("CVSItem<%s, %s, cvs>" % (' !'.join(module), item.revision))
+            if item.date:
+                out.append("CVSItem<%s, %s, cvs, %s, %s>" % (' !'.join(module)
+                        , item.revision, item.root or '', item.date))
+            elif item.root:
+                out.append("CVSItem<%s, %s, cvs, %s>" % (' !'.join(module)
+                        , item.revision, item.root))
+            else:
+                out.append("CVSItem<%s, %s, cvs>" % (' !'.join(module), item.revision))
         return '\n'.join(out)
 
     def __eq__(self, other):
@@ -281,8 +344,256 @@ class CVSItem(RoverItem):
             return False
         if self.excludes != other.excludes:
             return False
+        if getattr(other, 'root', None) != self.root:
+            return False
+        if getattr(other, 'date', None) != self.date:
+            return False
         return True
     
     def __ne__(self, other):
         return not self.__eq__(other)
 
+
+class CVSBatch(CVSItem):
+    """
+    CVSItems with the same CVSROOT and revision, checked out or updated
+    by one cvs command naming all of their modules
+    """
+    def __init__(self, members):
+        CVSItem.__init__(self, members[0].module, members[0].revision
+                , members[0].root, members[0].date)
+        self.members = members
+
+    def checkout(self, sh, checkout_dir, checkout_mode, verbose=True
+            , test_mode=False):
+        updates = []
+        checkouts = []
+        for member in self.members:
+            if is_working_copy(checkout_dir, member.get_path()):
+                updates.append(member.module)
+            else:
+                checkouts.append(member.module)
+        for update_mode, modules in [(True, updates), (False, checkouts)]:
+            if modules:
+                cmd = cvs_command(self.root, update_mode, checkout_mode
+                        , self.revision, modules, verbose, self.date)
+                run_cvs(sh, cmd, checkout_dir, verbose, test_mode)
+
+    def reset(self, sh, checkout_dir, keep=(), verbose=True
+            , test_mode=False):
+        # members never have other items nested inside them
+        for member in self.members:
+            if not member.reset(sh, checkout_dir, (), verbose, test_mode):
+                return False
+        return True
+
+    def is_pristine(self, sh, checkout_dir, keep=()):
+        modules = [member.module for member in self.members]
+        return_code, out = sh.tee_silent('cvs -n -q update %s'
+                % ' '.join(modules), cwd=checkout_dir)
+        if return_code:
+            return False
+        for line in out:
+            if line[:2] in ('M ', 'C ', 'A ', 'R ', '? '):
+                return False
+        return True
+
+    def requires(self, path):
+        for member in self.members:
+            if member.requires(path):
+                return True
+        return False
+
+    def __repr__(self):
+        return '\n'.join([repr(member) for member in self.members])
+
+
+def batch_items(items, size):
+    """
+    return items with CVSItems that share a CVSROOT and revision gathered
+    into CVSBatches of up to size items, each in the place of its first
+    member.  only items without excludes, and with no other item at,
+    above or inside their path, are batched, so that a batch never has
+    to wait for, or be waited on by, another item.
+    """
+    if size < 2:
+        return items
+
+    paths = PathTrie()
+    for item in items:
+        paths.add(item.get_path(), item)
+
+    open_batches = {}
+    batches = {}
+    for item in items:
+        if not isinstance(item, CVSItem) or item.excludes:
+            continue
+        path = item.get_path()
+        if len(paths.on_path(path)) != 1 or paths.first_below(path):
+            continue
+        key = (item.get_root(), item.revision, item.date)
+        members = open_batches.get(key)
+        if members is None or len(members) == size:
+            members = open_batches[key] = []
+        members.append(item)
+        batches[id(item)] = members
+
+    batched = []
+    seen = set()
+    for item in items:
+        members = batches.get(id(item))
+        if members is None:
+            batched.append(item)
+        elif id(members) not in seen:
+            seen.add(id(members))
+            if len(members) == 1:
+                batched.append(item)
+            else:
+                batched.append(CVSBatch(members))
+    return batched
+
+
+def is_working_copy(checkout_dir, path):
+    """True if path under checkout_dir has been checked out with cvs"""
+    return os.path.exists(os.path.join(checkout_dir, path, 'CVS'))
+
+
+def cvs_command(root, update_mode, checkout_mode, revision, modules
+        , verbose=True, date=None):
+    """
+    return the cvs command which checks out, or with update_mode updates,
+    the given modules (which may include !excludes) at revision, as of
+    date if one is given
+    """
+    cmd = ['cvs']
+
+    if not verbose:
+        cmd.append('-Q')
+
+    if root:
+        cmd.append('-d ' + root)
+
+    if update_mode:
+        cmd.append('update -d')
+        # paranoid-fast has already pruned unversioned files, but
+        #   relies on this to overwrite modified ones
+        if checkout_mode in ('clean', 'paranoid-fast'):
+            cmd.append('-C')
+    else:
+        cmd.append('checkout')
+
+    cmd.append('-P')  # prune empty dirs
+
+    if revision.lower() == 'head':
+        cmd.append('-A')  # Reset sticky tags
+    else:
+        cmd.append('-r ' + revision)  # revision, if not head
+
+    if date:
+        cmd.append('-D "%s"' % date)
+
+    cmd.extend(modules)
+    return cmd
+
+
+def run_cvs(sh, cmd, checkout_dir, verbose=True, test_mode=False):
+    """
+    run a cvs checkout or update command, moving aside files which are in
+    the way and trying once more if it fails, and raise if that fails too
+    """
+    return_code, out = sh.execute(cmd, cwd=checkout_dir
+            , verbose=verbose, test_mode=test_mode, return_out=True)
+
+    if return_code != 0:
+        # sometimes CVS screws up when replacing old files. the known
+        # erroring case is when a file exists in the local filesystem
+        # that was not in the previously-checked-out rover config (branch,
+        # etc) but is in the currently-being-checked-out config.
+        #
+        # in this case, we try to identify those files which are in the way,
+        # move them out of the way, and issue the command again one time.
+        in_the_way = re.compile( r"move away `?([^;]+)'; it is in the way" )
+        for line in out:
+            m = in_the_way.search(line)
+            if m:
+                dirname, filename = os.path.split(m.group(1))
+
+                # FIXME: Do we want to append the date/time as well?
+                #        Otherwise, only one backup is allowed
+                # back up the file as .rover.<filename>
+                old = os.path.abspath( os.path.join( checkout_dir, dirname, filename ) )
+                new = os.path.abspath( os.path.join( checkout_dir, dirname, '.%s.rover' % filename ) )
+
+                #if verbose:
+                print "* Backing up %(old)s to %(new)s" % locals()
+
+                sh.move(old, new)
+
+        return_code, out = sh.execute(cmd, cwd=checkout_dir
+                , verbose=verbose, test_mode=test_mode, return_out=True)
+        if return_code != 0:
+            raise Exception("cvs failure running '%s'" % ' '.join(cmd))
+
+
+def read_entries(cvs_dir):
+    """
+    return the names of the files and directories that CVS/Entries, as
+    amended by CVS/Entries.Log, lists for the directory owning cvs_dir
+    """
+    names = set()
+    for filename in ['Entries', 'Entries.Log']:
+        path = os.path.join(cvs_dir, filename)
+        if not os.path.exists(path):
+            continue
+        fp = open(path)
+        try:
+            for line in fp:
+                line = line.rstrip('\n')
+                op = 'A'
+                if filename == 'Entries.Log':
+                    op, line = line[:1], line[2:]
+                # files look like /name/rev/date/options/tag, and
+                #   directories like D/name////
+                parts = line.split('/')
+                if len(parts) < 2 or not parts[1]:
+                    continue
+                if op == 'A':
+                    names.add(parts[1])
+                elif op == 'R':
+                    names.discard(parts[1])
+        finally:
+            fp.close()
+    return names
+
+
+def prune_unlisted(wc, keep=(), test_mode=False, path=''):
+    """
+    delete everything under the working copy wc that CVS doesn't know of,
+    other than the paths (relative to wc) in keep and anything inside
+    them.  directories above a kept path are left alone too.
+    """
+    fulldir = os.path.join(wc, path)
+    listed = read_entries(os.path.join(fulldir, 'CVS'))
+    for name in sorted(os.listdir(fulldir)):
+        if name == 'CVS':
+            continue
+        child = name
+        if path:
+            child = path + '/' + name
+        fullpath = os.path.join(fulldir, name)
+        is_dir = os.path.isdir(fullpath) and not os.path.islink(fullpath)
+
+        # the walk stops at kept paths, so it never gets inside one
+        if is_dir and os.path.isdir(os.path.join(fullpath, 'CVS')) \
+                and child not in keep:
+            prune_unlisted(wc, keep, test_mode, child)
+            continue
+        if overlaps(child, keep) or (not is_dir and name in listed):
+            continue
+
+        if test_mode:
+            shell.echo("[TEST MODE] REMOVING:", fullpath)
+        elif is_dir:
+            shutil.rmtree(fullpath, True)
+        else:
+            os.remove(fullpath)
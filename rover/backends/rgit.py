@@ -21,14 +21,18 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+import errno
 import os
 import re
-import rover.shell
-import subprocess
 import types
-from distutils import version
 
+from rover import capabilities, shell
+from rover.backends.gitoptions import GitCloneOptions
+from rover.backends import gitwork
+from rover.backends.gitrefs import RefSnapshot, checkout_action, \
+        is_commit_id, up_to_date
 from rover.backends.rover_interface import RoverItemFactory, RoverItem
+from rover.remote import remote_host
 
 class GitFactory(RoverItemFactory):
     def __init__(self):
@@ -36,7 +40,10 @@ class GitFactory(RoverItemFactory):
 
     def get_rover_items(self, config_line):
         module, revision = config_line[:2]
-        out = [GitItem(module, revision)]
+        options = None
+        if len(config_line) > 3:
+            options = GitCloneOptions.parse(config_line[3])
+        out = [GitItem(module, revision, options)]
         return out
 
     def _is_alias(self, module):
@@ -56,9 +63,13 @@ class GitFactory(RoverItemFactory):
         pass
 
 class GitItem(RoverItem):
-    def __init__(self, repository, refspec):
+    def __init__(self, repository, refspec, options=None):
         self.repository = repository
         self.refspec = refspec
+        self.mirror_cache = None
+        self.options = options or GitCloneOptions()
+        self._snapshots = {}
+        self.remote_refs = {}
 
         # Detect the two forms as per git's documentation
         # TODO: Add support for local repos
@@ -101,30 +112,78 @@ class GitItem(RoverItem):
         else:
             cwd = checkout_dir
 
-        git_dir = os.path.join(cwd,self.repo_name)
+        git_dir = os.path.join(cwd, self._clone_name())
 
-        if not os.path.exists( os.path.join(cwd, self.repo_name, '.git') ):
+        # refs are about to change, so forget any earlier snapshot
+        self._snapshots = {}
+
+        # a commit id is checked out as is, and never moves
+        pinned = is_commit_id(self.refspec)
+        options = self.options
+        if pinned:
+            options = options.for_commit()
+
+        # We need to get git version information because of several changes in
+        #   the CLI that began in in 1.6.6.
+        git = capabilities.require('git')
+
+        if not os.path.exists(os.path.join(git_dir, '.git')):
             cmd = ['git clone']
             cmd.append('-n')
             if not verbose:
                 cmd.append('-q')
+            if self.mirror_cache:
+                cmd.extend(self.mirror_cache.clone_args(sh, self.repository
+                        , verbose=verbose, test_mode=test_mode))
+            cmd.extend(options.clone_args(git))
+            # before 1.6, a clone can't be told its branch; it gets them
+            #   all, and the checkout below picks ours
+            if options.narrows() and git.supports('clone-branch'):
+                cmd.extend(['--branch', self.refspec])
             cmd.append(self.repository)
 
             if not test_mode and not os.path.exists(cwd):
-                os.makedirs(cwd)
+                try:
+                    os.makedirs(cwd)
+                except OSError, e:
+                    # another item may have created it in the meantime
+                    if e.errno != errno.EEXIST:
+                        raise
 
             sh.execute(cmd, cwd=cwd, verbose=verbose,test_mode=test_mode)
+        elif checkout_mode == 'paranoid-fast':
+            # the working copy has just been reset; make it what a fresh
+            #   clone would be, whatever was committed to it locally
+            gitwork.force_checkout(sh, git_dir, self.refspec
+                    , options.fetch_args(), verbose, test_mode)
+            return
         else:
+            if pinned and checkout_mode == 'preserve' and \
+                    RefSnapshot.load(git_dir, sh).head_commit() == self.refspec:
+                shell.echo("UP TO DATE: [%s] [%s]" % (git_dir, self.refspec))
+                return
+
+            # in preserve mode there's nothing to do at all if the remote
+            #   hasn't moved since we last fetched
+            remote = self.remote_refs.get(self.repository)
+            if checkout_mode == 'preserve' and remote is not None \
+                    and up_to_date(RefSnapshot.load(git_dir, sh), remote
+                    , self.refspec):
+                shell.echo("UP TO DATE: [%s] [%s]" % (git_dir, self.refspec))
+                return
+
             # under clean mode, reset local changes
             if checkout_mode == 'clean':
                 # First, reset to our latest commit; this can be VERY dangerous
                 #   if you have uncommitted changes in your tree!
-                sh.execute("git reset --hard", verbose=verbose, test_mode=test_mode)
+                sh.execute("git reset --hard", cwd=git_dir, verbose=verbose
+                        , test_mode=test_mode)
 
                 # Then get rid of any lingering local changes (i.e., untracked)
                 #   This is incredibly dangerous if you're using rover in a
                 #   development environment; make sure you've committed changes!
-                sh.execute("git clean -fd", verbose=verbose, test_mode=test_mode)
+                sh.execute("git clean -fd", cwd=git_dir, verbose=verbose
+                        , test_mode=test_mode)
 
             # Finally, fetch the changes... we'll do a checkout later, because
             #   we have to treat remote branches, local branches, and tags, in
@@ -132,20 +191,10 @@ class GitItem(RoverItem):
             cmd = ['git fetch']
             if not verbose:
                 cmd.append('-q')
+            cmd.extend(options.fetch_args())
 
             sh.execute(cmd, cwd=git_dir, verbose=verbose, test_mode=test_mode)
 
-        # We need to get git version information because of several changes in
-        #   the CLI that began in in 1.6.6.
-        proc = subprocess.Popen("git --version", shell=True, stdout=subprocess.PIPE)
-        stdoutput, stderror = proc.communicate()
-        match = re.match("^git version (\d+\.\d+\.\d+).*$", stdoutput)
-
-        if not match:
-            print stderror
-            raise Exception("`git --version' ended with return code %d." % proc.returncode)
-
-        git_version = version.LooseVersion(match.group(1))
         cmd = ['git checkout']
         if not verbose:
             cmd.append('-q')
@@ -158,7 +207,7 @@ class GitItem(RoverItem):
         #   branches AND tags! Basically, it treats it as if it were a local
         #   branch, but will automatically fetch and track it if not
         #
-        if git_version >= version.LooseVersion("1.6.6") or \
+        if pinned or git.supports('checkout-dwim') or \
            self.find_local_branch(self.refspec, git_dir, sh):
             cmd.append(self.refspec)
         # Is it remote?
@@ -173,6 +222,15 @@ class GitItem(RoverItem):
 
         sh.execute(cmd, cwd=git_dir, verbose=verbose, test_mode=test_mode)
 
+    def reset(self, sh, checkout_dir, keep=(), verbose=True
+            , test_mode=False):
+        git_dir = os.path.join(checkout_dir, self.get_working_path())
+        return gitwork.reset_work_tree(sh, git_dir, keep, verbose, test_mode)
+
+    def is_pristine(self, sh, checkout_dir, keep=()):
+        git_dir = os.path.join(checkout_dir, self.get_working_path())
+        return gitwork.is_pristine(sh, git_dir, keep, self.refspec)
+
     def get_path(self):
         """
         return the path to the "repository"; however, there is no repository here,
@@ -182,6 +240,56 @@ class GitItem(RoverItem):
         """
         return self.repo_name
 
+    def _clone_name(self):
+        """the directory git clone names the working copy, less any .git"""
+        name, dot_git = os.path.splitext(self.repo_name)
+        if dot_git.lower() != '.git':
+            name = self.repo_name
+        return name
+
+    def get_working_path(self):
+        # the clone keeps the directories of the repository's path
+        return os.path.join(self.repo_path, self._clone_name())
+
+    def get_host(self):
+        return remote_host(self.repository)
+
+    def get_vcs(self):
+        return 'git'
+
+    def get_resolved_revision(self, sh, checkout_dir):
+        git_dir = os.path.join(checkout_dir, self.get_working_path())
+        return RefSnapshot.load(git_dir, sh).head_commit()
+
+    def get_locked_line(self, resolved, synced_at):
+        return (self.repository, resolved or self.refspec, 'git')
+
+    def get_size(self, sh, checkout_dir):
+        git_dir = os.path.join(checkout_dir, self.get_working_path())
+        return gitwork.repository_size(sh, git_dir)
+
+    def plan_action(self, sh, checkout_dir, checkout_mode, recorded=None):
+        git_dir = os.path.join(checkout_dir, self.get_working_path())
+        if not os.path.exists(os.path.join(git_dir, '.git')):
+            return 'clone'
+        return checkout_action(RefSnapshot.load(git_dir, sh), self.refspec
+                , checkout_mode)
+
+    def set_mirror_cache(self, cache):
+        self.mirror_cache = cache
+
+    def set_clone_defaults(self, options):
+        self.options = self.options.merge(options)
+
+    def get_fetch_url(self, checkout_dir):
+        git_dir = os.path.join(checkout_dir, self.get_working_path())
+        if os.path.exists(os.path.join(git_dir, '.git')):
+            return self.repository
+        return None
+
+    def set_remote_refs(self, remote_refs):
+        self.remote_refs = remote_refs
+
     def exclude(self, path):
         # git does not support excludes
         raise Exception("excludes are not allowed in git: %s" % self.repository)
@@ -197,25 +305,22 @@ class GitItem(RoverItem):
         return GitItem(path, self.revision)
 
     def find_tag(self, refspec, directory, sh):
-        return self.__ref_parse('refs/tags/%s' % refspec, directory, sh)
+        return self._refs(directory, sh).find_tag(refspec)
 
     def find_local_branch(self, refspec, directory, sh):
-        return self.__ref_parse('refs/heads/%s' % refspec, directory, sh)
+        return self._refs(directory, sh).find_local_branch(refspec)
 
     def find_remote_branch(self, refspec, directory, sh):
-        return self.__ref_parse('refs/remotes/origin/%s' % refspec, directory, sh)
+        return self._refs(directory, sh).find_remote_branch(refspec)
 
-    def __ref_parse(self, refpath, directory, sh):
+    def _refs(self, directory, sh):
         """
-        will parse through the git repository, checking for the selected refpath,
-        and then return True if it exists or False otherwise
+        return a snapshot of the refs in directory, so that classifying
+        the refspec costs at most one process instead of one per lookup
         """
-        cmd = "git for-each-ref '%s'" % refpath
-        ret, output = sh.tee_silent(cmd, cwd=directory)
-
-        if ret:
-            raise Exception("Error while executing '%s': %s" % (cmd, output))
-        return len(output) != 0
+        if directory not in self._snapshots:
+            self._snapshots[directory] = RefSnapshot.load(directory, sh)
+        return self._snapshots[directory]
 
     def __repr__(self):
-        return ''
+        return "GitItem<%s, %s, git>" % (self.repository, self.refspec)
@@ -26,7 +26,13 @@ import re
 import types
 from distutils.version import LooseVersion
 
+from rover import capabilities, shell
+from rover.backends import gitwork
+from rover.backends.gitrefs import RefSnapshot, checkout_action, \
+        is_commit_id, up_to_date
+from rover.backends.gitoptions import GitCloneOptions
 from rover.backends.rover_interface import RoverItemFactory, RoverItem
+from rover.remote import remote_host
 
 
 LATEST_GIT_VERSION = LooseVersion('1.7.1')
@@ -46,19 +52,17 @@ class GitConnection(RoverItemFactory):
         # not sure if it's needed though.
 
     def load(self, sh):
-        if sh.run_silent('which git') != 0:
-            raise Exception("Git must be installed for rover to checkout from"
-                    " a git repository")
-
-        version_result, version_output = sh.tee('git --version')
-        if version_result != 0:
-            raise Exception("Failed to get git version")
-        self.git_version = _parse_git_version(version_output[0])
+        # git is probed once per process, not once per REPOS entry
+        self.git_version = capabilities.require('git').version
 
 
     def get_rover_items(self, config_line):
         repo, branch = config_line[:2]
-        out = [GitRepo(self.name, self.uri, repo, branch, self.git_version)]
+        options = None
+        if len(config_line) > 3:
+            options = GitCloneOptions.parse(config_line[3])
+        out = [GitRepo(self.name, self.uri, repo, branch, self.git_version
+                , options)]
         return out
 
     def _is_alias(self, module):
@@ -79,7 +83,8 @@ class GitConnection(RoverItemFactory):
 
 
 class GitRepo(RoverItem):
-    def __init__(self, conn, uri, repo, treeish, git_version=None):
+    def __init__(self, conn, uri, repo, treeish, git_version=None
+            , options=None):
         self.connection = conn
         self.uri = uri
         self.repository = repo
@@ -87,6 +92,9 @@ class GitRepo(RoverItem):
         if git_version is None:
             git_version = LATEST_GIT_VERSION
         self._git_version = git_version
+        self.mirror_cache = None
+        self.options = options or GitCloneOptions()
+        self.remote_refs = {}
 
         # Check for "excludes", because they're not allowed in git
         if ' !' in repo:
@@ -101,29 +109,59 @@ class GitRepo(RoverItem):
         # passing in preserve_dirs will be much more in depth;
         # for now, assume its always true!
 
-        # remove the .git extension from the checkout_dir
-        repo, dot_git = os.path.splitext(self.repository)
-        if dot_git.lower() != '.git':
-            # extension isn't .git, use the original repo
-            repo = self.repository
-
         # set checkout destination and git dir
-        dest = os.path.join(checkout_dir, repo)
+        dest = self._dest(checkout_dir)
         git_dir = os.path.join(dest, '.git')
 
         # join the repo
         full_repo = os.path.join(self.uri, self.repository)
 
-        if sh.exists(git_dir):
+        # a commit id is checked out as is, and never moves
+        pinned = is_commit_id(self.treeish)
+        exists = sh.exists(git_dir)
+
+        if exists and checkout_mode == 'paranoid-fast':
+            # the working copy has just been reset; make it what a fresh
+            #   clone would be, whatever was committed to it locally
+            gitwork.force_checkout(sh, dest, self.treeish
+                    , self.options.fetch_args(), verbose, test_mode)
+        elif exists and pinned:
+            if checkout_mode == 'preserve' and \
+                    RefSnapshot.load(dest, sh).head_commit() == self.treeish:
+                shell.echo("UP TO DATE: [%s] [%s]" % (dest, self.treeish))
+                return
+            self._fetch_commit(sh, dest, verbose=verbose, test_mode=test_mode)
+        elif exists:
+            # in preserve mode, skip repos whose remote hasn't moved
+            remote = self.remote_refs.get(full_repo)
+            if checkout_mode == 'preserve' and remote is not None \
+                    and up_to_date(RefSnapshot.load(dest, sh), remote
+                    , self.treeish):
+                shell.echo("UP TO DATE: [%s] [%s]" % (dest, self.treeish))
+                return
             self._pull(sh, full_repo, dest)
+        elif pinned:
+            self._clone_commit(sh, full_repo, dest, verbose=verbose
+                    , test_mode=test_mode)
         else:
             if self._before_version('1.6'):
-                self._clone_1_5(sh, full_repo, dest, verbose=verbose)
+                self._clone_1_5(sh, full_repo, dest, verbose=verbose
+                        , test_mode=test_mode)
             else:
-                self._clone(sh, full_repo, dest, verbose=verbose)
+                self._clone(sh, full_repo, dest, verbose=verbose
+                        , test_mode=test_mode)
+
+    def _reference_args(self, sh, full_repo, verbose, test_mode):
+        """arguments which seed a clone of full_repo from the mirror cache"""
+        if self.mirror_cache is None:
+            return []
+        return self.mirror_cache.clone_args(sh, full_repo, verbose=verbose
+                , test_mode=test_mode)
 
     def _clone(self, sh, full_repo, dest, verbose=True, test_mode=False):
         clone = ['git', 'clone', '--branch', self.treeish, full_repo, dest]
+        clone[2:2] = self._reference_args(sh, full_repo, verbose, test_mode) \
+                + self.options.clone_args()
         if sh.quiet:
             clone.insert(1, '-q')
 
@@ -132,36 +170,81 @@ class GitRepo(RoverItem):
     def _clone_1_5(self, sh, full_repo, dest, verbose=True, test_mode=False):
         '''Old version of clone for git < 1.6'''
         clone = ['git', 'clone', full_repo, dest]
+        clone[2:2] = self._reference_args(sh, full_repo, verbose, test_mode)
         if sh.quiet:
             clone.insert(1, '-q')
         result = sh.execute(clone, verbose=verbose, test_mode=test_mode)
         if result != 0:
             raise Exception("git failure cloning '%s'" % full_repo)
 
-        sh.push_dir(dest)
+        # run in dest rather than chdir'ing, so that several repos can be
+        # checked out at once from different threads
         checkout = ['git', 'checkout', self.treeish]
+        if sh.quiet:
+            checkout.insert(1, '-q')
+        result = sh.execute(checkout, cwd=dest, verbose=verbose
+                , test_mode=test_mode)
+        if result != 0:
+            raise Exception("git failure checking out '%s'" % self.treeish)
+
+    def _clone_commit(self, sh, full_repo, dest, verbose=True
+            , test_mode=False):
+        '''Clone without checking anything out, then check out the commit'''
+        clone = ['git', 'clone', '-n', full_repo, dest]
+        clone[3:3] = self._reference_args(sh, full_repo, verbose, test_mode) \
+                + self.options.for_commit().clone_args()
         if sh.quiet:
             clone.insert(1, '-q')
-        result = sh.execute(checkout, verbose=verbose, test_mode=test_mode)
+        result, out = sh.execute(clone, verbose=verbose, test_mode=test_mode
+                , return_out=True)
+        if result != 0:
+            raise Exception("git failure cloning '%s'" % full_repo)
+
+        checkout = ['git', 'checkout', self.treeish]
+        if sh.quiet:
+            checkout.insert(1, '-q')
+        result, out = sh.execute(checkout, cwd=dest, verbose=verbose
+                , test_mode=test_mode, return_out=True)
+        if result != 0:
+            raise Exception("git failure checking out '%s'" % self.treeish)
+
+    def _fetch_commit(self, sh, dest, verbose=True, test_mode=False):
+        """For an existing repo, fetch and check out the commit
+        """
+        # a detached HEAD has nothing to pull into
+        result, out = sh.execute(['git', 'fetch'], cwd=dest, verbose=verbose
+                , test_mode=test_mode, return_out=True)
+        if result != 0:
+            raise Exception("git failure fetching into '%s'" % dest)
+
+        checkout = ['git', 'checkout', self.treeish]
+        if sh.quiet:
+            checkout.insert(1, '-q')
+        result, out = sh.execute(checkout, cwd=dest, verbose=verbose
+                , test_mode=test_mode, return_out=True)
         if result != 0:
             raise Exception("git failure checking out '%s'" % self.treeish)
 
     def _pull(self, sh, full_repo, dest):
         """For an existing repo, do a git pull
         """
-        # get into the right directory first
-        sh.push_dir(dest)
-
         # checkout the right branch
         co = ['git', 'checkout', self.treeish]
-        sh.execute(co)
+        sh.execute(co, cwd=dest)
+
+        # finally, do the pull, keeping a shallow clone shallow
+        pull = ['git', 'pull'] + self.options.fetch_args()
+        sh.execute(pull, cwd=dest)
 
-        # finally, do the pull
-        pull = ['git', 'pull']
-        sh.execute(pull)
 
-        sh.pop_dir()
+    def reset(self, sh, checkout_dir, keep=(), verbose=True
+            , test_mode=False):
+        return gitwork.reset_work_tree(sh, self._dest(checkout_dir), keep
+                , verbose, test_mode)
 
+    def is_pristine(self, sh, checkout_dir, keep=()):
+        return gitwork.is_pristine(sh, self._dest(checkout_dir), keep
+                , self.treeish)
 
     def get_path(self):
         """
@@ -172,6 +255,52 @@ class GitRepo(RoverItem):
         """
         return self.repository
 
+    def get_working_path(self):
+        return self._dest('')
+
+    def get_host(self):
+        return remote_host(self.uri)
+
+    def get_vcs(self):
+        return 'git'
+
+    def get_resolved_revision(self, sh, checkout_dir):
+        return RefSnapshot.load(self._dest(checkout_dir), sh).head_commit()
+
+    def get_locked_line(self, resolved, synced_at):
+        return (self.repository, resolved or self.treeish, self.connection)
+
+    def get_size(self, sh, checkout_dir):
+        return gitwork.repository_size(sh, self._dest(checkout_dir))
+
+    def plan_action(self, sh, checkout_dir, checkout_mode, recorded=None):
+        dest = self._dest(checkout_dir)
+        if not os.path.exists(os.path.join(dest, '.git')):
+            return 'clone'
+        return checkout_action(RefSnapshot.load(dest, sh), self.treeish
+                , checkout_mode)
+
+    def set_mirror_cache(self, cache):
+        self.mirror_cache = cache
+
+    def set_clone_defaults(self, options):
+        self.options = self.options.merge(options)
+
+    def _dest(self, checkout_dir):
+        """the directory the repo is cloned into, less any .git extension"""
+        repo, dot_git = os.path.splitext(self.repository)
+        if dot_git.lower() != '.git':
+            repo = self.repository
+        return os.path.join(checkout_dir, repo)
+
+    def get_fetch_url(self, checkout_dir):
+        if os.path.exists(os.path.join(self._dest(checkout_dir), '.git')):
+            return os.path.join(self.uri, self.repository)
+        return None
+
+    def set_remote_refs(self, remote_refs):
+        self.remote_refs = remote_refs
+
     def exclude(self, path):
         # git does not support excludes
         raise Exception("excludes are not allowed in git: %s" % repository)
@@ -191,4 +320,5 @@ class GitRepo(RoverItem):
         return self._git_version < LooseVersion(version)
 
     def __repr__(self):
-        return ''
+        return "GitRepo<%s, %s, %s>" % (self.repository, self.treeish
+                , self.connection)
@@ -48,12 +48,146 @@ class RoverItem(object):
         """
         pass
 
+    def reset(self, sh, checkout_dir, keep=(), verbose=True
+            , test_mode=False):
+        """
+        throw away every local change in this item's existing working
+        copy, including files the version control system doesn't know of,
+        so that checking it out in paranoid-fast mode leaves it pristine.
+        keep lists paths (relative to get_path()) of other items nested
+        inside this one, which must be left alone.
+
+        return False if there is no working copy to reset, or it can't be
+        reset, in which case it must be checked out afresh.
+        """
+        pass
+
+    def is_pristine(self, sh, checkout_dir, keep=()):
+        """
+        return True if this item's working copy has no local changes and
+        no files the version control system doesn't know of, not counting
+        the paths in keep (as for reset())
+        """
+        pass
+
     def get_path(self):
         """
         return most specific path which contains all things relative to checkout_dir
         """
         pass
 
+    def get_working_path(self):
+        """
+        return the directory, relative to checkout_dir, which this item's
+        working copy is actually checked out into.  this is get_path() for
+        most items, but git names its working copy differently.
+        """
+        pass
+
+    def get_host(self):
+        """
+        return the name of the remote server this item is checked out
+        from, or None if it is local.  used to limit how many operations
+        are run against one server at a time.
+        """
+        pass
+
+    def get_vcs(self):
+        """
+        return the name of the version control system this item is
+        checked out with, eg 'cvs', 'svn' or 'git'
+        """
+        pass
+
+    def get_resolved_revision(self, sh, checkout_dir):
+        """
+        return the revision this item has checked out under checkout_dir,
+        if that can be told without contacting the repository, otherwise
+        None
+        """
+        pass
+
+    def get_locked_line(self, resolved, synced_at):
+        """
+        return the config line, as a tuple of strings, which checks out
+        exactly what this item has checked out, given the revision that
+        get_resolved_revision() returned (or None) and the time the item
+        was synced (or None).  with neither, return the item's own line.
+        """
+        pass
+
+    def get_size(self, sh, checkout_dir):
+        """
+        return roughly how many bytes of repository data this item's
+        working copy under checkout_dir holds, if that can be told cheaply
+        and without contacting the repository, otherwise None
+        """
+        pass
+
+    def plan_action(self, sh, checkout_dir, checkout_mode, recorded=None):
+        """
+        return what checkout() would do under checkout_dir, judging only by
+        what is on disk: 'clone' (git) or 'checkout' (cvs, svn) if there
+        is no working copy yet, 'fetch' (git) or 'update' (cvs, svn) if
+        there is one, 'switch' if it has some other branch, tag or revision
+        checked out, or 'no-op' if it already has exactly what this item
+        checks out.  recorded is what the state database says of the last
+        sync of this item's path, as a dict, or None.  must not run
+        anything through sh which contacts the repository.
+        """
+        pass
+
+    def set_mirror_cache(self, cache):
+        """
+        seed new clones from the given GitMirrorCache.  ignored by
+        backends which have no use for one.
+        """
+        pass
+
+    def set_clone_defaults(self, options):
+        """
+        use the given GitCloneOptions for whatever this item's config
+        line leaves unset.  ignored by backends other than git.
+        """
+        pass
+
+    def set_sparse(self, sparse):
+        """
+        if True, leave this item's excludes out of a single working copy
+        rather than have expand() split it around them.  ignored by
+        backends other than svn.
+        """
+        pass
+
+    def set_split(self, jobs):
+        """
+        check a new working copy out in up to jobs pieces at once, over
+        separate connections.  ignored by backends other than svn.
+        """
+        pass
+
+    def get_fetch_url(self, checkout_dir):
+        """
+        return the url whose `git ls-remote' listing tells whether this
+        item has anything to fetch, or None if it must be fetched anyway
+        (eg it isn't a git item, or it hasn't been cloned yet)
+        """
+        pass
+
+    def set_remote_refs(self, remote_refs):
+        """
+        provide the refs listed for each fetch url (a dict of url => dict
+        of ref name => object name), so that checkout() can skip items
+        whose remote has not moved.  ignored by backends other than git.
+        """
+        pass
+
+    def get_excludes(self):
+        """
+        return the paths inside get_path() which this item leaves out
+        """
+        pass
+
     def exclude(self, path):
         """
         do what you need to do so that expand() works right
@@ -22,11 +22,23 @@
 #
 
 import os
+import posixpath
 import re
+import shutil
+import sqlite3
+from xml.etree import ElementTree
 
-from rover import shell
+from rover import capabilities, shell, state
+from rover.pathtrie import PathTrie, overlaps
+from rover.remote import remote_host
+from rover.scheduler import Scheduler
+from rover.backends import svnlist
 from rover.backends.rover_interface import RoverItemFactory, RoverItem
 
+# how many directories to list at once when expanding excludes
+LIST_JOBS = 8
+
+
 class SVNFactory(RoverItemFactory):
 
     def get_rover_items(self, config_line):
@@ -38,7 +50,16 @@ class SVNFactory(RoverItemFactory):
         """
         module, revision, vcs, url = config_line
 
-        return [SVNItem(module, revision, url)]
+        # excludes may follow the module, as with cvs
+        excludes = []
+        if ' !' in module:
+            module, excludes = module.split(' !', 1)
+            excludes = [exclude.strip('!') for exclude in excludes.split()]
+
+        item = SVNItem(module, revision, url)
+        for exclude in excludes:
+            item.exclude(exclude)
+        return [item]
 
 
 class SVNItem(RoverItem):
@@ -51,6 +72,8 @@ class SVNItem(RoverItem):
         self.revision = revision
         self.url = url
         self.excludes = []
+        self.sparse = False
+        self.split = 1
 
     def checkout(self, sh, checkout_dir, checkout_mode, verbose=True
             , test_mode=False):
@@ -60,8 +83,14 @@ class SVNItem(RoverItem):
         @param sh:   A rover shell object
         """
         if self.excludes != []:
-            raise Excepion('call expand before checkout')
-        
+            if not self.sparse:
+                raise Exception('call expand before checkout')
+            return self._sparse_checkout(sh, checkout_dir, checkout_mode
+                    , verbose, test_mode)
+        if self.split > 1 and _supports_depth() and not os.path.exists(
+                os.path.join(checkout_dir, self.get_path())):
+            return self._split_checkout(sh, checkout_dir, verbose, test_mode)
+
         cmd = ['svn']
 
         if not verbose:
@@ -81,38 +110,304 @@ class SVNItem(RoverItem):
             update_mode = False
             cmd.append(self.url + '/' + self.get_path())
 
-        #cmd.append('-r ' + self.revision)  # revision, if not head
+        if svnlist._is_fixed(self.revision):
+            cmd.append('-r ' + self.revision)  # revision, if not head
 
 
         cmd = ' '.join(cmd)
         return_code, out = sh.execute(cmd, cwd=checkout_dir
                 , return_out=True, test_mode=test_mode)
 
+    def _sparse_checkout(self, sh, checkout_dir, checkout_mode, verbose
+            , test_mode):
+        """
+        check the module out as one sparse working copy: the directories
+        leading to an exclude are checked out at depth immediates, the
+        excludes are set to depth exclude and everything beside them to
+        depth infinity.  an existing working copy is updated in place
+        (see _sparse_refresh), picking up excludes added or dropped since.
+        """
+        flags = _flags(self.revision, verbose)
+        wc = os.path.join(checkout_dir, self.module)
+        tree, excluded = self._exclusion_tree()
+        if not os.path.isdir(os.path.join(wc, '.svn')):
+            sh.execute('svn checkout%s --depth empty %s/%s %s'
+                    % (flags, self.url, self.module, self.module)
+                    , cwd=checkout_dir, return_out=True, test_mode=test_mode)
+            self._sparse_update(sh, checkout_dir, self.module, tree, excluded
+                    , flags, test_mode)
+            return
+        if checkout_mode == 'clean':
+            sh.execute('svn revert -R %s' % self.module, cwd=checkout_dir
+                    , return_out=True, test_mode=test_mode)
+        self._sparse_refresh(sh, checkout_dir, excluded, flags, test_mode)
+
+    def _sparse_refresh(self, sh, checkout_dir, excluded, flags, test_mode):
+        """
+        update an existing sparse working copy with a plain `svn update',
+        which keeps the depths it was given, then set the excludes which
+        are new since to depth exclude.  where wc.db (svn 1.7 and later)
+        tells, what is no longer excluded is brought back at depth
+        infinity, as are directories which the update brought in empty
+        beside an exclude.
+        """
+        sh.execute('svn update%s %s' % (flags, self.module), cwd=checkout_dir
+                , return_out=True, test_mode=test_mode)
+
+        nodes = _sparse_nodes(os.path.join(checkout_dir, self.module)
+                , self.module)
+        current, empty = nodes or (set(), set())
+        exclude = []
+        for path in sorted(excluded - current):
+            fullpath = os.path.join(checkout_dir, path)
+            # what another item checked out there is not ours to drop,
+            #   and what isn't there has nothing to drop
+            if path != self.module and os.path.exists(fullpath) \
+                    and not _is_working_copy(fullpath):
+                exclude.append(path)
+        infinity = sorted((current | empty) - excluded)
+
+        if infinity:
+            sh.execute('svn update%s --set-depth infinity %s'
+                    % (flags, ' '.join(infinity)), cwd=checkout_dir
+                    , return_out=True, test_mode=test_mode)
+        if exclude:
+            sh.execute('svn update%s --set-depth exclude %s'
+                    % (flags, ' '.join(exclude)), cwd=checkout_dir
+                    , return_out=True, test_mode=test_mode)
+
+    def _sparse_update(self, sh, checkout_dir, path, node, excluded, flags
+            , test_mode):
+        sh.execute('svn update%s --set-depth immediates %s' % (flags, path)
+                , cwd=checkout_dir, return_out=True, test_mode=test_mode)
+        dirpath = os.path.join(checkout_dir, path)
+        entries = os.path.isdir(dirpath) and sorted(os.listdir(dirpath)) or []
+
+        infinity, exclude, descend = [], [], []
+        for name in entries:
+            child = path + '/' + name
+            fullpath = os.path.join(dirpath, name)
+            if name == '.svn':
+                continue
+            if child in excluded:
+                # what another item checked out there is not ours to drop
+                if not _is_working_copy(fullpath):
+                    exclude.append(child)
+            elif node.get(name):
+                descend.append((child, node[name]))
+            elif os.path.isdir(fullpath):
+                infinity.append(child)
+
+        if infinity:
+            sh.execute('svn update%s --set-depth infinity %s'
+                    % (flags, ' '.join(infinity)), cwd=checkout_dir
+                    , return_out=True, test_mode=test_mode)
+        if exclude:
+            sh.execute('svn update%s --set-depth exclude %s'
+                    % (flags, ' '.join(exclude)), cwd=checkout_dir
+                    , return_out=True, test_mode=test_mode)
+        for child, child_node in descend:
+            self._sparse_update(sh, checkout_dir, child, child_node, excluded
+                    , flags, test_mode)
+
+    def _split_checkout(self, sh, checkout_dir, verbose, test_mode):
+        """
+        check a new working copy out in pieces: the module at depth
+        immediates, then each directory in it brought to depth infinity
+        by its own `svn update', up to self.split of them at once.  each
+        update locks and fills only its own directory, over its own
+        connection.  the module is finally set to depth infinity too,
+        which fetches nothing more but leaves an ordinary working copy
+        for later updates.
+        """
+        flags = _flags(self.revision, verbose)
+        sh.execute('svn checkout%s --depth immediates %s/%s %s'
+                % (flags, self.url, self.module, self.module)
+                , cwd=checkout_dir, return_out=True, test_mode=test_mode)
+
+        wc = os.path.join(checkout_dir, self.module)
+        scheduler = Scheduler(self.split)
+        for name in os.path.isdir(wc) and sorted(os.listdir(wc)) or []:
+            if name == '.svn' or not os.path.isdir(os.path.join(wc, name)):
+                continue
+            child = self.module + '/' + name
+            def update(slot, child=child):
+                sh.execute('svn update%s --set-depth infinity %s'
+                        % (flags, child), cwd=checkout_dir, return_out=True
+                        , test_mode=test_mode)
+            scheduler.add(update, child)
+        scheduler.run()
+
+        sh.execute('svn update%s --set-depth infinity %s'
+                % (flags, self.module), cwd=checkout_dir, return_out=True
+                , test_mode=test_mode)
+
+    def reset(self, sh, checkout_dir, keep=(), verbose=True
+            , test_mode=False):
+        """
+        `svn revert -R', then delete every unversioned and ignored file
+        """
+        wc = os.path.join(checkout_dir, self.get_path())
+        if not os.path.isdir(os.path.join(wc, '.svn')):
+            return False
+        return_code, out = sh.execute('svn revert -R -q .', cwd=wc
+                , verbose=verbose, test_mode=test_mode, return_out=True)
+        if return_code:
+            return False
+        changes = svn_status(sh, wc)
+        if changes is None:
+            return False
+        for path, item, props in changes:
+            if item not in ('unversioned', 'ignored') or overlaps(path, keep):
+                continue
+            fullpath = os.path.join(wc, path)
+            if test_mode:
+                shell.echo("[TEST MODE] REMOVING:", fullpath)
+            elif os.path.isdir(fullpath) and not os.path.islink(fullpath):
+                shutil.rmtree(fullpath, True)
+            else:
+                os.remove(fullpath)
+        return True
+
+    def is_pristine(self, sh, checkout_dir, keep=()):
+        changes = svn_status(sh, os.path.join(checkout_dir, self.get_path()))
+        if changes is None:
+            return False
+        for path, item, props in changes:
+            if overlaps(path, keep):
+                continue
+            if item not in ('normal', 'external', 'none') \
+                    or props not in ('normal', 'none'):
+                return False
+        return True
+
     def get_path(self):
         """
         return most specific path which contains all things relative to checkout_dir
         """
         return self.module
 
+    def get_working_path(self):
+        return self.module
+
+    def get_host(self):
+        return remote_host(self.url)
+
+    def get_vcs(self):
+        return 'svn'
+
+    def get_resolved_revision(self, sh, checkout_dir):
+        return_code, out = sh.tee_silent('svn info --xml %s' % self.module
+                , cwd=checkout_dir)
+        if return_code:
+            return None
+        entry = ElementTree.fromstring('\n'.join(out)).find('entry')
+        if entry is None:
+            return None
+        return entry.get('revision')
+
+    def get_locked_line(self, resolved, synced_at):
+        module = ' !'.join([self.module] + self.excludes)
+        return (module, resolved or self.revision, 'svn', self.url)
+
+    def get_size(self, sh, checkout_dir):
+        """
+        the size of the pristine copies which wc.db (svn 1.7 and later)
+        lists, if the module is a working copy of its own
+        """
+        wc_db = os.path.join(checkout_dir, self.module, '.svn', 'wc.db')
+        if not os.path.exists(wc_db):
+            return None
+        try:
+            db = sqlite3.connect(wc_db)
+            try:
+                return db.execute('SELECT SUM(size) FROM pristine'
+                        ).fetchone()[0]
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return None
+
+    def plan_action(self, sh, checkout_dir, checkout_mode, recorded=None):
+        if not os.path.exists(os.path.join(checkout_dir, self.get_path())):
+            return 'checkout'
+        if recorded is not None \
+                and recorded['config_line'] != state.config_line(self):
+            return 'switch'
+        # a numbered revision never changes once it has been checked out
+        if checkout_mode == 'preserve' and recorded is not None \
+                and recorded['status'] == 'ok' \
+                and svnlist._is_fixed(self.revision) \
+                and recorded['resolved'] == self.revision:
+            return 'no-op'
+        return 'update'
+
+    def get_excludes(self):
+        return list(self.excludes)
+
     def exclude(self, path):
         """
         do what you need to do so that expand() works right
         """
         self.excludes.append(path)
 
+    def set_sparse(self, sparse):
+        self.sparse = sparse
+
+    def set_split(self, jobs):
+        self.split = jobs
+
+    def _exclusion_tree(self):
+        """
+        return the excludes inside the module as a tree of dicts keyed by
+        path component, and as a set of paths
+        """
+        tree = {}
+        excluded = set()
+        for exclude in self.excludes:
+            if exclude == self.module:
+                excluded.add(exclude)
+            elif exclude.startswith(self.module + '/'):
+                excluded.add(exclude)
+                node = tree
+                for part in exclude[len(self.module) + 1:].split('/'):
+                    node = node.setdefault(part, {})
+        return tree, excluded
+
     def expand(self):
         """
         return list of rover items
+
+        all excludes are expanded together: the directories on the way
+        down to each exclude are listed (each once, and those at the same
+        depth concurrently), and everything beside them becomes its own
+        item.  the result is the fewest items which check out all of
+        the module but the excludes, and no two of them overlap.
+
+        in sparse mode the item is kept whole, and checkout() leaves the
+        excludes out of its one working copy instead.  so it is if the
+        listings are offline (see svnlist) and one of them isn't cached.
         """
         if self.excludes == []:
             return [self]
-        modules = []
-        for exclude in self.excludes:
-            module = self.module.split('/')
-            modules.extend(self._expand(module, exclude.split('/'), len(module)-1))
+        tree, excluded = self._exclusion_tree()
+        if self.module in excluded:
+            self.excludes = []
+            return []
+        if self.sparse and _supports_sparse():
+            self.excludes = sorted(excluded)
+            return [self]
         self.excludes = []
-        modules = [SVNItem(os.path.join(*module), self.revision, self.url) for module in modules]
-        return modules
+
+        if not tree:
+            return [SVNItem(self.module, self.revision, self.url)]
+        try:
+            listings = self._list_exclusion_tree(tree, excluded)
+        except svnlist.NotCached:
+            self.excludes = sorted(excluded)
+            return [self]
+        modules = self._cover(self.module, tree, excluded, listings)
+        return [SVNItem(module, self.revision, self.url) for module in modules]
 
     def narrow(self, path):
         """
@@ -141,34 +436,74 @@ class SVNItem(RoverItem):
         if tail == '.svn':
             # a '.svn' directory is required only if its parent is also required
             return self.requires(head)
-        if path.startswith(self.module):
-            # children are required unless explicitly excluded
+        if path == self.module or path.startswith(self.module + '/'):
+            # children are required unless explicitly excluded; in a
+            #   sparse working copy that leaves the directories leading
+            #   to an exclude, which hold the rest of the module
             for exclude in self.excludes:
-                if path.startswith(exclude):
+                if path == exclude or path.startswith(exclude + '/'):
                     return False
             return True
-        if self.module.startswith(path):
+        if self.module.startswith(path + '/'):
             # parents are always required
             return True
         return False
 
-    def _expand(self, module, exclude, depth):
-        if module[depth] == exclude[depth]:
-            if len(exclude)-1 == depth:
-                return []
-            elif len(module)-1 == depth:
-                dirs = list_contents('/'.join(module), self.url)
-                ret = []
-                for dir in dirs:
-                    dir = dir.strip('/')
-                    new_module = module[:]
-                    new_module.append(dir)
-                    ret.extend(self._expand(new_module, exclude, depth+1))
-                return ret
+    def _list_exclusion_tree(self, tree, excluded):
+        """
+        list every directory that leads to an exclude, a level at a time,
+        running the listings of each level concurrently.  returns a dict
+        of path => listing
+        """
+        # a directory leading to excludes two or more levels below it is
+        #   listed whole in one go, rather than a level at a time
+        scheduler = Scheduler(LIST_JOBS)
+        for name, node in sorted(tree.items()):
+            path = self.module + '/' + name
+            if path not in excluded and any(node.values()):
+                def prefetch(slot, path=path):
+                    prefetch_contents(path, self.url, self.revision)
+                scheduler.add(prefetch, path)
+        scheduler.run()
+
+        listings = {}
+        level = [(self.module, tree)]
+        while level:
+            scheduler = Scheduler(LIST_JOBS)
+            for path, node in level:
+                def list_dir(slot, path=path):
+                    listings[path] = list_contents(path, self.url
+                            , self.revision)
+                scheduler.add(list_dir, path)
+            scheduler.run()
+
+            next_level = []
+            for path, node in level:
+                for entry in listings[path]:
+                    name = entry.strip('/')
+                    child = path + '/' + name
+                    if node.get(name) and child not in excluded:
+                        next_level.append((child, node[name]))
+            level = next_level
+        return listings
+
+    def _cover(self, path, node, excluded, listings):
+        """
+        return the paths which together check out everything in path
+        but the excludes, given the listings of the exclusion tree
+        """
+        modules = []
+        for entry in listings[path]:
+            name = entry.strip('/')
+            child = path + '/' + name
+            if child in excluded:
+                continue
+            if node.get(name):
+                modules.extend(self._cover(child, node[name], excluded
+                        , listings))
             else:
-                return self._expand(module, exclude, depth+1)
-        else:
-            return [module]
+                modules.append(child)
+        return modules
 
     def force_revision(self, revision):
         self.revision = revision
@@ -179,13 +514,13 @@ class SVNItem(RoverItem):
 
         use newlines ('\n') if this RoverItem represents multiple
         checkout operations
+
+        the item is described as it stands, with any excludes it still
+        has after expand() (as in sparse mode), rather than expanded
+        here, which could list the repository
         """
-        items = self.expand()
-        out = []
-        for item in items:
-            out.append("SVNItem<%s, %s, svn, %s>"
-                    % (item.module, item.revision, item.url))
-        return '\n'.join(out)
+        module = ' !'.join([self.module] + self.excludes)
+        return "SVNItem<%s, %s, svn, %s>" % (module, self.revision, self.url)
 
     def __eq__(self, other):
         if self.module != other.module:
@@ -203,13 +538,202 @@ class SVNItem(RoverItem):
 
 
 
-def list_contents(path, root):
+class SVNGroup(SVNItem):
+    """
+    sibling SVNItems with the same url and revision, checked out as one
+    working copy of their parent directory at depth empty, holding each
+    of them at depth infinity.  that is one svn session and one .svn
+    database for all of them, rather than one each.
+    """
+    def __init__(self, parent, members):
+        SVNItem.__init__(self, parent, members[0].revision, members[0].url)
+        self.members = members
+
+    def checkout(self, sh, checkout_dir, checkout_mode, verbose=True
+            , test_mode=False):
+        flags = _flags(self.revision, verbose)
+        wc = os.path.join(checkout_dir, self.module)
+        fresh = not os.path.isdir(os.path.join(wc, '.svn'))
+        if fresh:
+            sh.execute('svn checkout%s --depth empty %s/%s %s'
+                    % (flags, self.url, self.module, self.module)
+                    , cwd=checkout_dir, return_out=True, test_mode=test_mode)
+        elif checkout_mode == 'clean':
+            sh.execute('svn revert -R %s' % self.module, cwd=checkout_dir
+                    , return_out=True, test_mode=test_mode)
+
+        modules = [member.module for member in self.members]
+        sh.execute('svn update%s --set-depth infinity %s'
+                % (flags, ' '.join(modules)), cwd=checkout_dir
+                , return_out=True, test_mode=test_mode)
+        if fresh or test_mode:
+            return
+
+        # members dropped from the config since, and deleted by clean
+        #   mode, are left out of the working copy for good
+        names = set([posixpath.basename(module) for module in modules])
+        dropped = [self.module + '/' + path
+                for path, item, props in svn_status(sh, wc) or []
+                if item == 'missing' and '/' not in path
+                and path not in names]
+        if dropped:
+            sh.execute('svn update%s --set-depth exclude %s'
+                    % (flags, ' '.join(dropped)), cwd=checkout_dir
+                    , return_out=True, test_mode=test_mode)
+
+    def requires(self, path):
+        for member in self.members:
+            if member.requires(path):
+                return True
+        return False
+
+    def expand(self):
+        return [self]
+
+    def __repr__(self):
+        return '\n'.join([repr(member) for member in self.members])
+
+
+def coalesce(items, checkout_dir):
+    """
+    return items with each set of sibling SVNItems that share a url,
+    revision and parent directory replaced by an SVNGroup, in the place
+    of the first of them.
+
+    siblings are only grouped if no other item is checked out at, above
+    or inside their parent, none of them has excludes, and either the
+    parent is already a group's working copy or none of them has been
+    checked out yet, so that existing checkouts are not disturbed.
+    """
+    if not _supports_depth():
+        return items
+
+    paths = PathTrie()
+    siblings = {}
+    for item in items:
+        paths.add(item.get_path(), item)
+        if isinstance(item, SVNItem) and not item.excludes:
+            parent = posixpath.dirname(item.module)
+            if parent:
+                siblings.setdefault((item.url, item.revision, parent)
+                        , []).append(item)
+
+    groups = {}
+    for (url, revision, parent), members in siblings.items():
+        if len(members) < 2 or paths.first_on_path(parent) is not None \
+                or len(paths.below(parent)) != len(members):
+            continue
+        if not os.path.isdir(os.path.join(checkout_dir, parent, '.svn')):
+            if [member for member in members if os.path.exists(
+                    os.path.join(checkout_dir, member.module))]:
+                continue
+        group = SVNGroup(parent, members)
+        for member in members:
+            groups[id(member)] = group
+
+    coalesced = []
+    seen = set()
+    for item in items:
+        group = groups.get(id(item), item)
+        if id(group) not in seen:
+            seen.add(id(group))
+            coalesced.append(group)
+    return coalesced
+
+
+def _flags(revision, verbose):
+    """the quiet and revision flags of an svn checkout or update"""
+    flags = ''
+    if not verbose:
+        flags += ' -q'
+    if svnlist._is_fixed(revision):
+        flags += ' -r %s' % revision
+    return flags
+
+
+def _supports_depth():
+    """True if the installed svn can check out and update to a depth"""
+    svn = capabilities.get('svn')
+    return svn is not None and svn.supports('depth')
+
+
+def _supports_sparse():
+    """True if the installed svn can set a directory to depth exclude"""
+    svn = capabilities.get('svn')
+    return svn is not None and svn.supports('set-depth-exclude')
+
+
+def _sparse_nodes(wc, module):
+    """
+    return (excluded, empty): the paths in the working copy at wc (module
+    relative to the checkout directory) which are set to depth exclude,
+    and the directories at depth empty, as wc.db tells without contacting
+    the repository.  None if there is no wc.db or it can't be read.
+    """
+    wc_db = os.path.join(wc, '.svn', 'wc.db')
+    if not os.path.exists(wc_db):
+        return None
+    excluded, empty = set(), set()
+    try:
+        db = sqlite3.connect(wc_db)
+        try:
+            rows = db.execute('SELECT local_relpath, presence, kind, depth'
+                    ' FROM nodes WHERE op_depth = 0').fetchall()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        return None
+    for relpath, presence, kind, depth in rows:
+        if not relpath:
+            continue
+        path = module + '/' + relpath
+        if presence == 'excluded':
+            excluded.add(path)
+        elif presence == 'normal' and kind == 'dir' and depth == 'empty':
+            empty.add(path)
+    return excluded, empty
+
+
+def _is_working_copy(path):
+    """True if path was checked out by some item of its own"""
+    for name in ('.svn', 'CVS', '.git'):
+        if os.path.isdir(os.path.join(path, name)):
+            return True
+    return False
+
+
+def svn_status(sh, wc):
+    """
+    return (path, item status, property status) for everything `svn
+    status --no-ignore' reports in the working copy at wc, with paths
+    relative to wc, or None if svn fails
+    """
+    return_code, out = sh.tee_silent('svn status --no-ignore --xml', cwd=wc)
+    if return_code:
+        return None
+    changes = []
+    for entry in ElementTree.fromstring('\n'.join(out)).iter('entry'):
+        status = entry.find('wc-status')
+        item = status.get('item')
+        if status.get('tree-conflicted') == 'true':
+            item = 'conflicted'
+        changes.append((entry.get('path').replace(os.sep, '/'), item
+                , status.get('props', 'none')))
+    return changes
+
+
+def list_contents(path, root, revision=None):
     """
     @return list of relative paths rooted at "root"
     """
-    cmd = "svn ls %s/%s" % (root, path)
-    sh = shell.Shell()
-    code, out = sh.execute(cmd, return_out=True)
-    dirs = out.strip().split('\n')
-    return dirs
+    # every SVNItem shares one cache, so each directory is listed once
+    return svnlist.list_dir(root, path, revision)
+
+
+def prefetch_contents(path, root, revision=None):
+    """
+    list everything below path into the cache list_contents() reads, with
+    one `svn ls --depth infinity' if svn has --depth
+    """
+    svnlist.prefetch_dir(root, path, revision)
 
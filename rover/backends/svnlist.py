@@ -0,0 +1,239 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# a process-wide cache of `svn ls' listings, shared by every SVNItem, so
+# that expanding excludes lists each remote directory at most once.
+#
+# listings are kept on disk between runs: those of a numbered revision
+# never change and are kept for good, while those of HEAD are trusted for
+# ttl seconds.  an offline cache trusts whatever it has on disk, and never
+# lists anything itself.
+
+import json
+import os
+import threading
+import time
+
+import rover.config
+from rover import capabilities, shell
+
+# how long, in seconds, a listing of HEAD is trusted by default
+DEFAULT_TTL = 15 * 60
+
+
+def _is_fixed(revision):
+    """True if revision names one unchanging revision"""
+    return bool(revision) and str(revision).isdigit()
+
+
+def _supports_depth():
+    """True if the installed svn takes `svn ls --depth'"""
+    svn = capabilities.get('svn')
+    return svn is not None and svn.supports('depth')
+
+
+class NotCached(Exception):
+    """an offline cache has no listing of a directory"""
+    pass
+
+
+class SVNListingCache(object):
+    def __init__(self, cache_file=None, ttl=DEFAULT_TTL):
+        """
+        cache_file => json file to keep listings in; defaults to
+                      svn-listings.json in rover.config.cache_dir
+        ttl        => seconds a listing of HEAD stays good for; 0 means
+                      listings are only shared within one run
+        """
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sh = shell.Shell()
+        self.offline = False
+        self._listings = None
+        # whether there are listings which save() has yet to write
+        self._dirty = False
+        # keys listed by this process, which are good for the whole run
+        self._fresh = set()
+
+    def _key(self, url, path, revision):
+        if not _is_fixed(revision):
+            revision = 'HEAD'
+        return '%s|%s|%s' % (url.rstrip('/'), path.strip('/'), revision)
+
+    def list(self, url, path, revision=None):
+        """
+        return the entries directly inside url/path at revision (HEAD if
+        None or not a revision number), as `svn ls' prints them:
+        directories end with a '/'
+        """
+        key = self._key(url, path, revision)
+        self._lock.acquire()
+        try:
+            entries = self._lookup(key, revision)
+        finally:
+            self._lock.release()
+        if entries is not None:
+            return entries
+        if self.offline:
+            raise NotCached("no cached listing of %s" % key)
+        # before 1.5, a plain `svn ls' is the immediates listing
+        depth = None
+        if _supports_depth():
+            depth = 'immediates'
+        self.prefetch(url, path, revision, depth=depth)
+        return self._listings[key]['entries']
+
+    def prefetch(self, url, path, revision=None, depth='infinity'):
+        """
+        list url/path down to depth (an `svn ls --depth' value, or None
+        for a plain `svn ls') with one call to svn, remembering the
+        listing of every directory seen
+        """
+        cmd = ['svn ls']
+        if depth is not None:
+            cmd.append('--depth %s' % depth)
+        if _is_fixed(revision):
+            cmd.append('-r %s' % revision)
+        cmd.append('%s/%s' % (url.rstrip('/'), path.strip('/')))
+        cmd = ' '.join(cmd)
+        return_code, out = self._sh.tee_silent(cmd)
+        if return_code:
+            raise Exception("Error while executing '%s': %s"
+                    % (cmd, '\n'.join(out)))
+
+        root = path.strip('/')
+        def join(parent, name):
+            return '/'.join([part for part in [parent, name] if part])
+
+        listings = {root: []}
+        for line in out:
+            parent, slash, name = line.rstrip('/').rpartition('/')
+            if line.endswith('/'):
+                # directories below depth are listed without their contents
+                if depth == 'infinity':
+                    listings.setdefault(join(root, line.rstrip('/')), [])
+                name += '/'
+            listings.setdefault(join(root, parent), []).append(name)
+
+        now = time.time()
+        self._lock.acquire()
+        try:
+            self._load_disk()
+            for dir, entries in listings.items():
+                key = self._key(url, dir, revision)
+                self._listings[key] = {'time': now, 'entries': entries}
+                self._fresh.add(key)
+            self._dirty = True
+        finally:
+            self._lock.release()
+
+    def has(self, url, path, revision=None):
+        """True if list() would answer for url/path without listing it"""
+        key = self._key(url, path, revision)
+        self._lock.acquire()
+        try:
+            return self._lookup(key, revision) is not None
+        finally:
+            self._lock.release()
+
+    def save(self):
+        """
+        write the listings made since the last save to disk.  done once a
+        run rather than after every listing, since the file holds them all.
+        """
+        self._lock.acquire()
+        try:
+            if self._dirty:
+                self._save_disk()
+                self._dirty = False
+        finally:
+            self._lock.release()
+
+    def _lookup(self, key, revision):
+        entry = self._load_disk().get(key)
+        if entry is None:
+            return None
+        if not _is_fixed(revision) and key not in self._fresh \
+                and not self.offline \
+                and time.time() - entry['time'] > self.ttl:
+            return None
+        return entry['entries']
+
+    def _cache_path(self):
+        return self.cache_file or os.path.join(rover.config.cache_dir
+                , 'svn-listings.json')
+
+    def _load_disk(self):
+        if self._listings is None:
+            self._listings = {}
+            if self.ttl or self.offline:
+                try:
+                    fp = open(self._cache_path())
+                    try:
+                        self._listings = json.load(fp)
+                    finally:
+                        fp.close()
+                except (IOError, ValueError):
+                    pass
+        return self._listings
+
+    def _save_disk(self):
+        # the cache is only an optimization; never fail a checkout over it
+        if not self.ttl:
+            return
+        path = self._cache_path()
+        now = time.time()
+        keep = dict([(key, entry) for key, entry in self._listings.items()
+                if not key.endswith('|HEAD')
+                or now - entry['time'] <= self.ttl])
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tmp = '%s.%d' % (path, os.getpid())
+            fp = open(tmp, 'w')
+            try:
+                json.dump(keep, fp)
+            finally:
+                fp.close()
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            pass
+
+
+cache = SVNListingCache()
+
+def list_dir(url, path, revision=None):
+    """list url/path at revision through the shared cache"""
+    return cache.list(url, path, revision)
+
+def prefetch_dir(url, path, revision=None):
+    """
+    list all of url/path at revision into the shared cache with one call,
+    unless it is cached already or the cache is offline.  an svn without
+    --depth lists it a directory at a time as list_dir() asks instead.
+    """
+    if cache.offline or not _supports_depth() \
+            or cache.has(url, path, revision):
+        return
+    cache.prefetch(url, path, revision)
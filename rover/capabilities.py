@@ -0,0 +1,198 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# a process-wide registry of the version control tools installed on this
+# machine: where they are, which version they are, and what they support.
+#
+# each tool is probed at most once per process, and the result is cached
+# on disk keyed by the binary's real path and mtime, so that a run with
+# hundreds of git lines doesn't spawn hundreds of `git --version's.
+
+import json
+import os
+import re
+import subprocess
+import threading
+from distutils.version import LooseVersion
+
+import rover.config
+
+
+# tool => (arguments which print its version, regex to pull the version out)
+PROBES = {
+    'git': ('--version', r'git version (\d+\.\d+(?:\.\d+)?)'),
+    'svn': ('--version --quiet', r'^(\d+(?:\.\d+)+)'),
+    'cvs': ('--version', r'\(CVS\) (\d+(?:\.\d+)+)'),
+}
+
+# tool => [(feature, first version supporting it)]
+FEATURES = {
+    'git': [
+        ('clone-branch', '1.6'),
+        ('checkout-dwim', '1.6.6'),
+        ('single-branch', '1.7.10'),
+        ('dissociate', '2.3'),
+        ('filter', '2.19'),
+    ],
+    'svn': [
+        ('depth', '1.5'),
+        ('set-depth-exclude', '1.6'),
+    ],
+    'cvs': [],
+}
+
+
+def _which(name):
+    """find name on the PATH without spawning `which'"""
+    for dir in os.environ.get('PATH', '').split(os.pathsep):
+        path = os.path.join(dir, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+class Capabilities(object):
+    """what one installed version control binary is and can do"""
+    def __init__(self, name, path, version):
+        self.name = name
+        self.path = path
+        self.version = version and LooseVersion(version) or None
+        self.features = set()
+        if self.version:
+            for feature, since in FEATURES.get(name, []):
+                if self.version >= LooseVersion(since):
+                    self.features.add(feature)
+
+    def supports(self, feature):
+        return feature in self.features
+
+    def __repr__(self):
+        return "Capabilities<%s, %s, %s>" % (self.name, self.path
+                , self.version)
+
+
+class CapabilityRegistry(object):
+    def __init__(self, cache_file=None):
+        """
+        cache_file => json file to keep probe results in; defaults to
+                      capabilities.json in rover.config.cache_dir
+        """
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._tools = {}
+        self._disk = None
+
+    def get(self, name):
+        """
+        return the Capabilities of the named tool, or None if it is not
+        installed
+        """
+        self._lock.acquire()
+        try:
+            if name not in self._tools:
+                self._tools[name] = self._probe(name)
+            return self._tools[name]
+        finally:
+            self._lock.release()
+
+    def require(self, name):
+        """like get(), but raises an Exception if the tool is missing"""
+        caps = self.get(name)
+        if caps is None or caps.version is None:
+            raise Exception("%s must be installed for rover to checkout from"
+                    " a %s repository" % (name.capitalize(), name))
+        return caps
+
+    def _probe(self, name):
+        path = _which(name)
+        if path is None:
+            return None
+        real = os.path.realpath(path)
+        mtime = os.stat(real).st_mtime
+
+        cache = self._load_disk()
+        entry = cache.get(real)
+        # a failed probe is tried again by the next process, rather than
+        #   remembered until the binary changes
+        if entry is None or entry.get('mtime') != mtime \
+                or entry.get('version') is None:
+            entry = {'name': name, 'mtime': mtime
+                    , 'version': self._run_probe(name, path)}
+            if entry['version'] is not None:
+                cache[real] = entry
+                self._save_disk()
+
+        return Capabilities(name, path, entry['version'])
+
+    def _run_probe(self, name, path):
+        args, pattern = PROBES[name]
+        proc = subprocess.Popen('"%s" %s' % (path, args), shell=True
+                , stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output, _ = proc.communicate()
+        match = re.search(pattern, output, re.MULTILINE)
+        if match is None:
+            return None
+        return match.group(1)
+
+    def _cache_path(self):
+        return self.cache_file or os.path.join(rover.config.cache_dir
+                , 'capabilities.json')
+
+    def _load_disk(self):
+        if self._disk is None:
+            try:
+                fp = open(self._cache_path())
+                try:
+                    self._disk = json.load(fp)
+                finally:
+                    fp.close()
+            except (IOError, ValueError):
+                self._disk = {}
+        return self._disk
+
+    def _save_disk(self):
+        # the cache is only an optimization; never fail a checkout over it
+        path = self._cache_path()
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            tmp = '%s.%d' % (path, os.getpid())
+            fp = open(tmp, 'w')
+            try:
+                json.dump(self._disk, fp)
+            finally:
+                fp.close()
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            pass
+
+
+registry = CapabilityRegistry()
+
+def get(name):
+    """return the Capabilities of the named tool from the shared registry"""
+    return registry.get(name)
+
+def require(name):
+    """like get(), but raises an Exception if the tool is missing"""
+    return registry.require(name)
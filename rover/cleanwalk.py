@@ -0,0 +1,173 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# works out which directories of a checkout clean mode should remove,
+# guided by a trie of the paths the config items check out so that it
+# only lists the directories where something could actually be removed
+
+import os
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# version control metadata; never removed and never entered
+METADATA_DIRS = frozenset(['CVS', '.svn', '.git'])
+
+
+class _KeepNode(object):
+    __slots__ = ('children', 'owners', 'excluded', 'required')
+
+    def __init__(self):
+        self.children = {}
+        # items which check out exactly this path
+        self.owners = []
+        # items which leave out exactly this path
+        self.excluded = []
+        # True if an item checks out this path or something inside it
+        self.required = False
+
+
+class KeepTrie(object):
+    """
+    the paths a set of config items check out, the parents of those paths
+    (which are always kept), and the paths the items leave out again
+    """
+    def __init__(self, items=()):
+        self.root = _KeepNode()
+        for item in items:
+            self.add(item)
+
+    def _node(self, path):
+        node = self.root
+        for part in path.split('/'):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _KeepNode()
+            node = child
+        return node
+
+    def add(self, item):
+        node = self.root
+        for part in item.get_working_path().split('/'):
+            node.required = True
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _KeepNode()
+            node = child
+        node.required = True
+        node.owners.append(item)
+        for exclude in item.get_excludes() or []:
+            self._node(exclude).excluded.append(item)
+
+
+def list_dirs(path):
+    """
+    return the names of the directories in path, not counting symlinks,
+    using scandir where it is available so no extra stat is needed
+    """
+    if scandir is not None:
+        names = []
+        it = scandir(path)
+        try:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    names.append(entry.name)
+        finally:
+            # python 3.6+ iterators hold the directory open until closed
+            close = getattr(it, 'close', None)
+            if close is not None:
+                close()
+        return names
+    return [name for name in os.listdir(path)
+            if os.path.isdir(os.path.join(path, name))
+            and not os.path.islink(os.path.join(path, name))]
+
+
+def find_removes(checkout_dir, items, keep=()):
+    """
+    return the checkout-relative paths of the directories under
+    checkout_dir which none of items checks out, outermost first in
+    sorted order.  a directory is kept if an item checks it out (less
+    that item's excludes) or if it contains something an item checks
+    out.  nothing inside a removed directory is listed.
+
+    directories wholly inside an item's path are never listed at all,
+    only the excluded paths within them are looked at, and version
+    control metadata directories are never entered.  the top level
+    directories named in keep are left alone as well.
+    """
+    trie = KeepTrie(items)
+    owners = []
+    if '' in trie.root.children:
+        # an item checks out the checkout directory itself
+        owners = trie.root.children[''].owners
+    return _walk(checkout_dir, '', trie.root, owners, [], keep)
+
+
+def _walk(fullpath, path, node, owners, removes, keep=()):
+    """
+    look through the kept directory at fullpath, whose checkout-relative
+    path is path and whose trie node is node (or None), and which is
+    checked out by owners
+    """
+    if owners:
+        # everything here is kept unless the trie says otherwise, so only
+        #   the paths the trie knows of need looking at
+        if node is None or not node.children:
+            return removes
+        names = [name for name in node.children
+                if os.path.isdir(os.path.join(fullpath, name))]
+    else:
+        names = list_dirs(fullpath)
+    names.sort()
+
+    for name in names:
+        if name in METADATA_DIRS or (not path and name in keep):
+            continue
+        child_path = name
+        if path:
+            child_path = path + '/' + name
+        child = None
+        if node is not None:
+            child = node.children.get(name)
+
+        child_owners = owners
+        if child is not None:
+            if child.excluded:
+                excluded = set([id(item) for item in child.excluded])
+                child_owners = [owner for owner in owners
+                        if id(owner) not in excluded]
+            if child.owners:
+                child_owners = child_owners + child.owners
+
+        if not child_owners and (child is None or not child.required):
+            removes.append(child_path)
+            continue
+        _walk(os.path.join(fullpath, name), child_path, child, child_owners
+                , removes)
+    return removes
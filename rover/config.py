@@ -29,6 +29,11 @@ from StringIO import StringIO
 
 config_dir = os.path.abspath('.rover')
 
+# where rover keeps data that is shared between checkouts, such as git
+# mirrors; may be overridden with the ROVER_CACHE environment variable
+cache_dir = os.environ.get('ROVER_CACHE'
+        , os.path.join(os.path.expanduser('~'), '.rover', 'cache'))
+
 REPO_FILE_NAME = "REPOS"
 
 
@@ -83,6 +88,22 @@ def find_repos(config_filepath):
     return repo_filename
 
 
+def parse_options(field):
+    """
+    parse the options column of a config line, a space-separated list of
+    `name=value' pairs and bare flags such as `depth=1 single-branch',
+    into a dict.  flags map to True.
+    """
+    options = {}
+    for option in (field or '').split():
+        if '=' in option:
+            name, value = option.split('=', 1)
+            options[name] = value
+        else:
+            options[option] = True
+    return options
+
+
 class RepoInfo(object):
     """Structured data for a configured repo."""
     def __init__(self, repoline):
@@ -32,13 +32,33 @@ from rover import Rover
 import rover.config
 from rover.version import version
 
+def parse_host_limits(values):
+    """turn a list of 'HOST=N' strings into a dict of host => N
+    """
+    limits = {}
+    for value in values:
+        if '=' not in value:
+            raise Exception("host limit must look like HOST=N: %s" % value)
+        host, limit = value.rsplit('=', 1)
+        try:
+            limits[host.strip()] = int(limit)
+        except ValueError:
+            raise Exception("host limit must look like HOST=N: %s" % value)
+    return limits
+
 def main():
-    parser = OptionParser("""usage: %prog [options] config[@revision]
+    parser = OptionParser("""usage: %prog [options] [plan] config[@revision]
 
         Rover accepts one 'config' argument, which is a file name
         or path to a given rover configuration file. A revison
         can be added optionally after the '@', and that revision will be
-        forced for all modules in that config file.""")
+        forced for all modules in that config file.
+
+        Given 'plan' first, rover checks nothing out, but prints what it
+        would do to each item (clone, checkout, reclone, fetch, update,
+        switch, reset or no-op), with the time and bytes each is likely
+        to take going by earlier runs.  It works from the checkout directory
+        and rover's caches alone, without contacting any repository.""")
     parser.add_option('', '--version',
                       action="store_true",
                       dest='version',
@@ -65,7 +85,7 @@ def main():
                       action='store',
                       dest='checkout_mode',
                       default='preserve',
-                      help="Must be one of {'paranoid', 'clean', 'preserve'}.  Paranoid wipes out the entire source directory before doing a fresh checkout, clean performs an update but reverts all modified files to the repository version, and preserve performs an update while attempting to preserve local modifications.  Preserve is the default.")
+                      help="Must be one of {'paranoid', 'paranoid-fast', 'clean', 'preserve'}.  Paranoid wipes out the entire source directory before doing a fresh checkout, paranoid-fast gets the same pristine tree by resetting existing working copies (removing every local change and unversioned file) and only checks them out afresh if that fails, clean performs an update but reverts all modified files to the repository version, and preserve performs an update while attempting to preserve local modifications.  Preserve is the default.")
     parser.add_option('-d','--checkout-dir',
                       action='store',
                       dest='checkout_dir',
@@ -76,6 +96,21 @@ def main():
                       dest='manifest_filename',
                       default=None,
                       help='File in which to store list of all directories & branches checked out')
+    parser.add_option('', '--trace',
+                      action='store',
+                      dest='trace_filename',
+                      default=None,
+                      help='Write every command run to this file as a Chrome trace (JSON, viewable at ui.perfetto.dev or chrome://tracing), with its start and end, exit code, bytes of output, item and worker slot.')
+    parser.add_option('', '--lockfile',
+                      action='store',
+                      dest='lockfile_filename',
+                      default=None,
+                      help='After checking out, write a lockfile here pinning every item to what was checked out: git commits, svn revision numbers, and cvs tags or dates.')
+    parser.add_option('', '--locked',
+                      action='store',
+                      dest='locked_filename',
+                      default=None,
+                      help='Check out exactly what this lockfile records instead of what the config says.  Nothing is resolved or looked up remotely first; the config name still names the checkout directory.')
     parser.add_option('-x', '--exclude',
                       action='append',
                       dest='excludes',
@@ -86,12 +121,98 @@ def main():
                       dest='includes',
                       default=[],
                       help='Files or directories to check out. Specify full path, eg, `src/test.java`. May specify multiple paths. If specified, only files or directories matched will be checked out.')
+    parser.add_option('-j', '--jobs',
+                      action='store',
+                      type='int',
+                      dest='jobs',
+                      default=1,
+                      help='Number of items to check out at once.  Items checked out inside of another item always wait for it to finish.  Defaults to 1.')
+    parser.add_option('', '--max-per-host',
+                      action='store',
+                      type='int',
+                      dest='host_limit',
+                      default=None,
+                      help='Most items to check out at once from any one server (CVSROOT, svn url or git host).  Items from other servers keep running in parallel.  Defaults to no limit beyond --jobs.')
+    parser.add_option('', '--host-limit',
+                      action='append',
+                      dest='host_limits',
+                      default=[],
+                      help='Limit for one server, given as HOST=N; overrides --max-per-host for that host.  May be given multiple times.')
+    parser.add_option('', '--git-cache',
+                      action='store_true',
+                      dest='git_cache',
+                      default=False,
+                      help='Seed git clones from local mirrors kept under ~/.rover/cache/git (or $ROVER_CACHE/git), which are fetched once per run.  Mirrors are never pruned or garbage collected, since clones made without --dissociate borrow objects from them.')
+    parser.add_option('', '--git-cache-dir',
+                      action='store',
+                      dest='git_cache_dir',
+                      default=None,
+                      help='Keep git mirrors in this directory instead; implies --git-cache.')
+    parser.add_option('', '--dissociate',
+                      action='store_true',
+                      dest='dissociate',
+                      default=False,
+                      help='Copy objects borrowed from a git mirror into each new clone, so that clones keep working if the mirror is removed.')
+    parser.add_option('', '--depth',
+                      action='store',
+                      type='int',
+                      dest='depth',
+                      default=None,
+                      help='(git only) Clone with a history truncated to this many commits, and keep it that shallow on later fetches.  Can be set per line with `depth=N\' in the options column.')
+    parser.add_option('', '--single-branch',
+                      action='store_true',
+                      dest='single_branch',
+                      default=None,
+                      help='(git only) Clone and fetch only the branch or tag being checked out.  Can be set per line with `single-branch\' in the options column.')
+    parser.add_option('', '--filter',
+                      action='store',
+                      dest='filter',
+                      default=None,
+                      help='(git only) Make partial clones with this filter, eg blob:none or tree:0.  Can be set per line with `filter=SPEC\' in the options column.')
+    parser.add_option('', '--always-fetch',
+                      action='store_true',
+                      dest='always_fetch',
+                      default=False,
+                      help="(git only) In preserve mode, fetch every repository.  By default repositories whose remote branch or tag hasn't moved since the last fetch are left alone.")
+    parser.add_option('', '--svn-list-ttl',
+                      action='store',
+                      type='int',
+                      dest='svn_list_ttl',
+                      default=None,
+                      help='(svn only) Seconds to trust a cached `svn ls\' of HEAD, used to expand excludes, across runs.  Listings of numbered revisions are kept for good.  0 lists everything afresh each run.  Defaults to 900.')
+    parser.add_option('', '--svn-sparse',
+                      action='store_true',
+                      dest='svn_sparse',
+                      default=False,
+                      help='(svn only) Check out a line with excludes as one sparse working copy, leaving the excludes out with `svn update --set-depth exclude\', instead of checking out each directory beside them separately.  Needs svn 1.6 or later; older clients split the line as before.')
+    parser.add_option('', '--svn-split',
+                      action='store',
+                      type='int',
+                      dest='svn_split',
+                      default=None,
+                      help='(svn only) Check out each new working copy as up to this many concurrent updates of its top level directories, over separate connections, for very large modules.  Items checked out against one host at once share its host limit between them.  Needs svn 1.5 or later.  Existing working copies are updated as usual.')
+    parser.add_option('', '--cvs-batch-size',
+                      action='store',
+                      type='int',
+                      dest='cvs_batch_size',
+                      default=None,
+                      help='(cvs only) Check out or update up to this many modules from the same CVSROOT and branch or tag with one cvs command.  Modules with excludes, or with other lines nested inside or around them, are always run alone.  Defaults to 1, no batching.')
+    parser.add_option('', '--cvs-modules-ttl',
+                      action='store',
+                      type='int',
+                      dest='cvs_modules_ttl',
+                      default=None,
+                      help='(cvs only) Seconds to trust the cached aliases of a CVSROOT/modules file across runs.  After that `cvs rlog -h\' tells whether it has changed before it is fetched again.  0 checks every run.  Defaults to 3600.')
     opts, args = parser.parse_args()
 
     if opts.version:
         print 'rover version '+ version()[1:]
         sys.exit(0)
 
+    plan = len(args) == 2 and args[0] == 'plan'
+    if plan:
+        args = args[1:]
+
     if len(args) < 1:
         parser.print_help()
         sys.exit(-1)
@@ -113,16 +234,41 @@ def main():
         r.set_verbose(opts.verbose)
         r.set_test_mode(opts.test_mode)
         r.set_manifest(opts.manifest_filename)
+        r.set_trace(opts.trace_filename)
+        r.set_lockfile(opts.lockfile_filename)
+        r.set_locked(opts.locked_filename)
         r.set_excludes(opts.excludes)
         r.set_includes(opts.includes)
         r.set_preserve_dirs(opts.preserve_dirs)
+        r.set_jobs(opts.jobs)
+        r.set_host_limit(opts.host_limit)
+        r.set_host_limits(parse_host_limits(opts.host_limits))
+        r.set_git_options(opts.depth, opts.single_branch, opts.filter)
+        r.set_always_fetch(opts.always_fetch)
+        r.set_svn_sparse(opts.svn_sparse)
+        if opts.svn_split is not None:
+            r.set_svn_split(opts.svn_split)
+        if opts.cvs_batch_size is not None:
+            r.set_cvs_batch_size(opts.cvs_batch_size)
+        if opts.cvs_modules_ttl is not None:
+            r.set_cvs_modules_ttl(opts.cvs_modules_ttl)
+        if opts.svn_list_ttl is not None:
+            r.set_svn_list_ttl(opts.svn_list_ttl)
+        if opts.git_cache_dir:
+            r.set_git_cache(opts.git_cache_dir, opts.dissociate)
+        elif opts.git_cache:
+            r.set_git_cache(os.path.join(rover.config.cache_dir, 'git')
+                    , opts.dissociate)
     except Exception, e:
         parser.print_help()
         print
         parser.set_usage('')
         parser.error(e)
 
-    r.run()
+    if plan:
+        r.plan()
+    else:
+        r.run()
 
 
 if __name__ == '__main__':
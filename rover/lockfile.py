@@ -0,0 +1,87 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# lockfiles: manifests written after a checkout which pin every item to
+# the exact revision that was checked out (a git commit, an svn revision
+# number, a cvs tag or date), so that the checkout can be reproduced
+# later without resolving anything against the repositories.
+
+import json
+import os
+import time
+
+# bump whenever the format below changes
+LOCKFILE_VERSION = 1
+
+
+def write_lockfile(filename, config_names, repos, entries):
+    """
+    write a lockfile.
+
+    config_names => the configs the checkout was made from
+    repos        => the REPOS lines in use, as (name, vcs, uri) tuples
+    entries      => one dict per item, holding its checkout-relative
+                    `path', `vcs', pinned config `line' (a tuple of
+                    strings) and `resolved' revision
+    """
+    lock = {'version': LOCKFILE_VERSION
+            , 'config': list(config_names)
+            , 'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            , 'repos': [list(repo) for repo in repos]
+            , 'items': [dict(entry, line=list(entry['line']))
+                for entry in entries]}
+    directory = os.path.dirname(os.path.abspath(filename))
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp = '%s.%d' % (filename, os.getpid())
+    fp = open(tmp, 'w')
+    try:
+        json.dump(lock, fp, indent=2, sort_keys=True, separators=(',', ': '))
+        fp.write('\n')
+    finally:
+        fp.close()
+    os.rename(tmp, filename)
+
+
+def read_lockfile(filename):
+    """
+    read a lockfile, returning a dict with its `config', `repos' and
+    `items' as write_lockfile() was given them.  raises an Exception if
+    the file is not a lockfile this version of rover understands.
+    """
+    try:
+        fp = open(filename)
+        try:
+            lock = json.load(fp)
+        finally:
+            fp.close()
+    except (IOError, ValueError), e:
+        raise Exception("can't read lockfile `%s': %s" % (filename, e))
+    if not isinstance(lock, dict) or lock.get('version') != LOCKFILE_VERSION:
+        raise Exception("`%s' is not a version %d rover lockfile"
+                % (filename, LOCKFILE_VERSION))
+    for entry in lock['items']:
+        entry['line'] = tuple([str(field) for field in entry['line']])
+    lock['repos'] = [tuple([str(field) for field in repo])
+            for repo in lock['repos']]
+    return lock
@@ -0,0 +1,138 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+def overlaps(path, paths):
+    """
+    return True if path is one of paths, is inside one of them, or
+    contains one of them
+    """
+    for other in paths:
+        if path == other or path.startswith(other + '/') \
+                or other.startswith(path + '/'):
+            return True
+    return False
+
+
+class _Node(object):
+    __slots__ = ('children', 'entries', 'first_below')
+
+    def __init__(self):
+        self.children = {}
+        # (index, value) pairs added at exactly this path
+        self.entries = []
+        # the first (index, value) pair added anywhere below this path
+        self.first_below = None
+
+
+class PathTrie(object):
+    """
+    an index of values by slash-separated path, for answering "what was
+    added at, above or below this path" in time proportional to the depth
+    of the path rather than to the number of values.
+
+    paths are compared component by component, so `a' is a parent of
+    `a/b' but not of `ab', exactly as Rover._path_overrides compares them.
+    every value is numbered in the order it was added, and results come
+    back as (index, value) pairs in that order.
+    """
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, path, value):
+        """add value at path, returning the index it was given"""
+        entry = (self._count, value)
+        self._count += 1
+        node = self._root
+        for part in path.split('/'):
+            if node.first_below is None:
+                node.first_below = entry
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _Node()
+            node = child
+        node.entries.append(entry)
+        return entry[0]
+
+    def _find(self, path):
+        node = self._root
+        for part in path.split('/'):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def at(self, path):
+        """return the entries added at exactly path"""
+        node = self._find(path)
+        if node is None:
+            return []
+        return list(node.entries)
+
+    def on_path(self, path):
+        """return the entries added at path or at any of its parents"""
+        found = []
+        node = self._root
+        for part in path.split('/'):
+            node = node.children.get(part)
+            if node is None:
+                break
+            found.extend(node.entries)
+        found.sort()
+        return found
+
+    def first_on_path(self, path):
+        """return the first entry added at path or at any of its parents"""
+        first = None
+        node = self._root
+        for part in path.split('/'):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.entries and (first is None or node.entries[0] < first):
+                first = node.entries[0]
+        return first
+
+    def first_below(self, path):
+        """return the first entry added anywhere below (not at) path"""
+        node = self._find(path)
+        if node is None:
+            return None
+        return node.first_below
+
+    def below(self, path):
+        """return the entries added anywhere below (not at) path"""
+        node = self._find(path)
+        if node is None or node.first_below is None:
+            return []
+        found = []
+        stack = node.children.values()
+        while stack:
+            node = stack.pop()
+            found.extend(node.entries)
+            stack.extend(node.children.values())
+        found.sort()
+        return found
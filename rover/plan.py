@@ -0,0 +1,159 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# `rover plan': what a run would do to each item of a checkout, and what
+# that is likely to cost, worked out from what is on disk alone
+
+# actions which make a new working copy
+NEW_ACTIONS = ('clone', 'checkout', 'reclone')
+
+# the order steps are summed up in
+ACTIONS = ('clone', 'checkout', 'reclone', 'switch', 'fetch', 'update'
+        , 'reset', 'no-op')
+
+
+class PlanStep(object):
+    """one step of a plan: what is done to path, and its estimated cost"""
+    def __init__(self, action, path, vcs=None, seconds=None, bytes=None
+            , guessed=False):
+        """
+        seconds, bytes => the estimated time and transfer, or None if
+                          there is nothing to go by
+        guessed        => True if the estimates come from other items
+        """
+        self.action = action
+        self.path = path
+        self.vcs = vcs
+        self.seconds = seconds
+        self.bytes = bytes
+        self.guessed = guessed
+
+    def __repr__(self):
+        return "PlanStep<%s, %s>" % (self.action, self.path)
+
+
+def _median(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[len(values) / 2]
+
+
+class Estimator(object):
+    """
+    estimates what a step costs from the state database's record of the
+    last sync of each item: the step's own item's, if that sync was of the
+    same kind ('checkout' of a new working copy, or 'update'), otherwise
+    the median of the other items of the same version control system
+    whose last sync was.
+    """
+    def __init__(self, rows):
+        """rows => the state database's rows, as CheckoutState.items()"""
+        self.rows = dict([(row['path'], row) for row in rows])
+        samples = {}
+        for row in rows:
+            if row['status'] != 'ok' or row['action'] is None:
+                continue
+            durations, received = samples.setdefault(
+                    (row['vcs'], row['action']), ([], []))
+            if row['duration'] is not None:
+                durations.append(row['duration'])
+            if row['received'] is not None:
+                received.append(row['received'])
+        self.medians = dict([(key, (_median(durations), _median(received)))
+                for key, (durations, received) in samples.items()])
+
+    def estimate(self, action, vcs, path):
+        """
+        return (seconds, bytes, guessed) for doing action to the item of
+        the given version control system at path
+        """
+        if action == 'no-op':
+            return 0.0, 0, False
+        kind = 'update'
+        if action in NEW_ACTIONS:
+            kind = 'checkout'
+        row = self.rows.get(path)
+        if row is not None and row['status'] == 'ok' \
+                and row['action'] == kind:
+            return row['duration'], row['received'], False
+        seconds, bytes = self.medians.get((vcs, kind), (None, None))
+        if kind == 'checkout' and row is not None \
+                and row['bytes'] is not None:
+            # a new working copy brings in about what the old one held
+            bytes = row['bytes']
+        return seconds, bytes, True
+
+
+def format_seconds(seconds):
+    if seconds < 60:
+        return '%.1fs' % seconds
+    return '%dm%02ds' % divmod(int(round(seconds)), 60)
+
+
+def format_bytes(bytes):
+    for unit in ('', 'K', 'M', 'G'):
+        if bytes < 1024 or unit == 'G':
+            break
+        bytes /= 1024.0
+    if not unit:
+        return '%dB' % bytes
+    return '%.1f%s' % (bytes, unit)
+
+
+def _format_estimate(step, value, format):
+    if value is None:
+        return '?'
+    if step.guessed:
+        return '~' + format(value)
+    return format(value)
+
+
+def format_plan(steps):
+    """
+    return the plan as lines of text: one per step, giving its action,
+    estimated time and transfer ('~' if guessed from other items, '?' if
+    unknown) and path, then a summary.  the total time is that of running
+    every step one after the other.
+    """
+    lines = ['%-8s %8s %8s  %s' % ('ACTION', 'TIME', 'BYTES', 'PATH')]
+    counts = {}
+    seconds, bytes, unknown = 0.0, 0, False
+    for step in steps:
+        lines.append('%-8s %8s %8s  %s' % (step.action
+                , _format_estimate(step, step.seconds, format_seconds)
+                , _format_estimate(step, step.bytes, format_bytes)
+                , step.path))
+        counts[step.action] = counts.get(step.action, 0) + 1
+        if step.seconds is None or step.bytes is None:
+            unknown = True
+        seconds += step.seconds or 0.0
+        bytes += step.bytes or 0
+
+    summary = ', '.join(['%d %s' % (counts[action], action)
+            for action in ACTIONS if action in counts]) or 'nothing to do'
+    lines.append('PLAN: %s' % summary)
+    at_least = unknown and 'at least ' or ''
+    lines.append('ESTIMATED: %s%s, %s%s' % (at_least, format_seconds(seconds)
+            , at_least, format_bytes(bytes)))
+    return lines
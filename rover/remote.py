@@ -0,0 +1,59 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# helpers for working out which remote server a rover item talks to
+
+import re
+import urlparse
+
+
+# [:method[;options]:]  as used at the start of a CVSROOT
+_cvs_method_re = re.compile(r'^:[^:]*:')
+
+# [user@]host:path  as accepted by ssh, scp, git and cvs
+_scp_re = re.compile(r'^(?:[^@/:]+@)?([^@/:]+):')
+
+
+def remote_host(location):
+    """
+    return the lowercased host name of the server behind location, which
+    may be a URL, a CVSROOT, or an scp-style connection string.  returns
+    None for local paths and file:// URLs.
+    """
+    if not location:
+        return None
+    location = location.strip()
+
+    if '://' in location:
+        host = urlparse.urlsplit(location).hostname
+        return host and host.lower() or None
+
+    location = _cvs_method_re.sub('', location)
+    if location.startswith('/'):
+        return None
+    # a CVSROOT may give a port between the host and the path
+    location = re.sub(r':\d*/', ':/', location, 1)
+    match = _scp_re.match(location)
+    if match:
+        return match.group(1).lower()
+    return None
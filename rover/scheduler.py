@@ -0,0 +1,201 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import heapq
+import sys
+import threading
+
+from rover import trace
+
+
+class Task(object):
+    """A unit of work for the Scheduler: one call to fn(slot)"""
+    def __init__(self, index, fn, path, host=None):
+        self.index = index
+        self.fn = fn
+        self.path = path
+        self.host = host
+        self.waiting = 0
+        self.dependents = []
+
+    def __cmp__(self, other):
+        return cmp(self.index, other.index)
+
+
+class Scheduler(object):
+    """
+    runs tasks on a pool of worker threads while preserving the nesting
+    of the checkout tree: a task never starts before every earlier task
+    whose path is the same as, or a parent of, its own path has finished.
+
+    tasks which do not nest run concurrently, in the order they were added.
+    with jobs=1 tasks are simply run in order in the calling thread.
+
+    tasks may name the remote host they talk to.  no more than host_limit
+    tasks for any one host run at once (unlimited if None), and
+    host_limits maps host names to limits which override host_limit.
+    tasks for a host at its limit are held back without holding up tasks
+    for other hosts.
+
+    the commands a task runs are traced (see rover.trace) as run for its
+    path and slot.
+    """
+    def __init__(self, jobs=1, host_limit=None, host_limits=None):
+        self.jobs = max(1, int(jobs))
+        self.host_limit = host_limit
+        self.host_limits = host_limits or {}
+        self.tasks = []
+
+        # maps path -> last task added at exactly that path
+        self._last_at = {}
+
+    def add(self, fn, path, host=None):
+        """
+        queue fn to be called as fn(slot) where slot is the number of the
+        worker running it.  path is the checkout-relative path the task
+        writes to, and decides which earlier tasks it must wait for.
+        host is the remote host the task talks to, if any.
+        """
+        task = Task(len(self.tasks), fn, path, host)
+
+        # only the most recent task at each enclosing path is needed; any
+        # earlier ones are reached transitively through it
+        parts = path.split('/')
+        for depth in range(1, len(parts) + 1):
+            parent = self._last_at.get('/'.join(parts[:depth]))
+            if parent is not None:
+                parent.dependents.append(task)
+                task.waiting += 1
+
+        self._last_at[path] = task
+        self.tasks.append(task)
+        return task
+
+    def run(self):
+        """
+        run every queued task. if any task raises, no further tasks are
+        started, running tasks are allowed to finish, and the first
+        exception is re-raised in the calling thread.
+        """
+        if self.jobs == 1:
+            for task in self.tasks:
+                self._call(task, 0)
+            return
+
+        self._cond = threading.Condition()
+        # ready tasks are kept in one heap per host, so that a host at
+        # its limit doesn't block tasks for other hosts
+        self._ready = {}
+        self._running = {}
+        for task in self.tasks:
+            if task.waiting == 0:
+                self._push_ready(task)
+        self._remaining = len(self.tasks)
+        self._error = None
+
+        workers = []
+        for slot in range(min(self.jobs, len(self.tasks))):
+            worker = threading.Thread(target=self._work, args=(slot,))
+            worker.setDaemon(True)
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+
+        if self._error:
+            raise self._error[0], self._error[1], self._error[2]
+
+    def limit_for(self, host):
+        """
+        return the maximum number of tasks to run at once against host,
+        or None if there is no limit
+        """
+        if host is None:
+            return None
+        return self.host_limits.get(host, self.host_limit)
+
+    def _call(self, task, slot):
+        previous = trace.set_context(task.path, slot)
+        try:
+            task.fn(slot)
+        finally:
+            trace.set_context(*previous)
+
+    def _push_ready(self, task):
+        heapq.heappush(self._ready.setdefault(task.host, []), task)
+
+    def _next(self):
+        """
+        block until a task can be started and return it, or return None
+        once there is nothing left to do. must hold self._cond.
+        """
+        while True:
+            if self._error or self._remaining == 0:
+                return None
+
+            # start the earliest ready task whose host has room
+            best = None
+            for host, heap in self._ready.iteritems():
+                if not heap:
+                    continue
+                limit = self.limit_for(host)
+                if limit is not None and self._running.get(host, 0) >= limit:
+                    continue
+                if best is None or heap[0] < best:
+                    best = heap[0]
+            if best is not None:
+                heapq.heappop(self._ready[best.host])
+                self._running[best.host] = self._running.get(best.host, 0) + 1
+                return best
+
+            self._cond.wait()
+
+    def _work(self, slot):
+        while True:
+            self._cond.acquire()
+            try:
+                task = self._next()
+            finally:
+                self._cond.release()
+            if task is None:
+                return
+
+            error = None
+            try:
+                self._call(task, slot)
+            except:
+                error = sys.exc_info()
+
+            self._cond.acquire()
+            try:
+                self._remaining -= 1
+                self._running[task.host] -= 1
+                if error and not self._error:
+                    self._error = error
+                for dependent in task.dependents:
+                    dependent.waiting -= 1
+                    if dependent.waiting == 0:
+                        self._push_ready(dependent)
+                self._cond.notifyAll()
+            finally:
+                self._cond.release()
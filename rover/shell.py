@@ -21,11 +21,132 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+import errno
 import os
+import select
 import subprocess
+import sys
+import threading
+import time
 import types
 import shutil
 
+from rover import trace
+
+
+# serializes output from commands running on different threads
+_echo_lock = threading.Lock()
+
+def echo(*args):
+    """
+    print args as a single line, without interleaving with lines
+    printed from other threads
+    """
+    line = ' '.join([str(arg) for arg in args]) + '\n'
+    _echo_lock.acquire()
+    try:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+    finally:
+        _echo_lock.release()
+
+
+class Process(object):
+    """
+    a child process started by a Reactor.  stdout and stderr are read
+    together, a line at a time, and passed to on_line as they arrive.
+    on_exit is called with the exit code once the output is exhausted
+    and the process has been reaped.  the process is added to trace.log
+    then, on behalf of the item and slot of the thread which started it.
+    """
+    def __init__(self, cmd, cwd=None, on_line=None, on_exit=None):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.on_line = on_line
+        self.on_exit = on_exit
+        self.returncode = None
+        self.bytes = 0
+        self._partial = ''
+        self._context = trace.get_context()
+        self._thread = threading.currentThread().getName()
+        self.started = time.time()
+
+        self.pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE
+                , stderr=subprocess.STDOUT, cwd=cwd, shell=True
+                , close_fds=(os.name == 'posix'))
+        self.fd = self.pipe.stdout.fileno()
+
+    def _feed(self, data):
+        """split data into lines and hand complete ones to on_line"""
+        self.bytes += len(data)
+        lines = (self._partial + data).split('\n')
+        self._partial = lines.pop()
+        if self.on_line:
+            for line in lines:
+                self.on_line(line)
+
+    def _finish(self):
+        """flush any unterminated last line and reap the child"""
+        if self._partial and self.on_line:
+            self.on_line(self._partial)
+        self._partial = ''
+        self.pipe.stdout.close()
+        self.returncode = self.pipe.wait()
+        trace.log.add(self.cmd, self.cwd, self.started, time.time()
+                , self.returncode, self.bytes, self._context, self._thread)
+        if self.on_exit:
+            self.on_exit(self.returncode)
+
+
+class Reactor(object):
+    """
+    runs any number of child processes from a single thread, sleeping in
+    poll()/select() until one of them has output instead of spinning on
+    each one in turn.
+    """
+    def __init__(self):
+        self.processes = {}
+
+    def spawn(self, cmd, cwd=None, on_line=None, on_exit=None):
+        """start cmd in a shell and return its Process"""
+        proc = Process(cmd, cwd, on_line, on_exit)
+        self.processes[proc.fd] = proc
+        return proc
+
+    def run(self):
+        """
+        deliver output and exit codes for every spawned process, returning
+        once all of them have exited.  processes may be spawned from
+        inside the callbacks.
+        """
+        while self.processes:
+            for fd in self._wait():
+                proc = self.processes[fd]
+                data = os.read(fd, 65536)
+                if data:
+                    proc._feed(data)
+                else:
+                    del self.processes[fd]
+                    proc._finish()
+
+    def _wait(self):
+        """block until at least one pipe is readable; return their fds"""
+        while True:
+            try:
+                if hasattr(select, 'poll'):
+                    poller = select.poll()
+                    for fd in self.processes:
+                        poller.register(fd, select.POLLIN | select.POLLPRI
+                                | select.POLLHUP | select.POLLERR)
+                    return [fd for fd, event in poller.poll()]
+                else:
+                    readable, _, _ = select.select(self.processes.keys()
+                            , [], [])
+                    return readable
+            except (select.error, OSError), e:
+                if e.args[0] != errno.EINTR:
+                    raise
+
 
 class Shell(object):
     "Shell class for executing commands on the system"
@@ -40,73 +161,56 @@ class Shell(object):
         executes a command, echoing output and buffering it
         for later use by the program. returns (exit_code, output)
         """
-        pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE
-                , stderr=subprocess.STDOUT, cwd=cwd, shell=True)
-
-        output = []
-        while True:
-            if pipe.poll() is not None:
-                break
-
-            x = pipe.stdout.readline().strip()
-            if x:
-                print x
-                output.append(x)
-
-        # get any remaining output
-        output += [line.strip() for line in pipe.stdout.readlines()]
-
-        # if the command ends with a newline, don't
-        # include that blank line in the output
-        if output and output[-1] == '\n':
-            output = output[:-1]
-
-        # return (exitcode, list of output+error lines)
-        return pipe.poll(), output
+        return self._capture(cmd, cwd, echo_output=True)
 
     def tee_silent(self, cmd, cwd=None):
         """
         executes a command, buffering it for later use by
         the program. returns (exit_code, output)
         """
-        pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE
-                , stderr=subprocess.STDOUT, cwd=cwd, shell=True)
-
-        output = []
-        while True:
-            if pipe.poll() is not None:
-                break
-
-            x = pipe.stdout.readline()
-            x = x.strip()
-            if x:
-                output.append(x)
-
-        # get any remaining output
-        output += [line.strip() for line in pipe.stdout.readlines()]
-
-        # if the command ends with a newline, don't
-        # include that blank line in the output
-        if output and output[-1] == '\n':
-            output = output[:-1]
-
-        # return (exitcode, list of output+error lines)
-        return pipe.poll(), output
+        return self._capture(cmd, cwd, echo_output=False)
 
     def run_silent(self, cmd, cwd=None):
         """
         executes a command. returns exit_code
         """
-        pipe = subprocess.Popen(cmd, stdout=subprocess.PIPE
-                , stderr=subprocess.STDOUT, cwd=cwd, shell=True)
-        return pipe.wait()
+        # the output still has to be drained, or a chatty command
+        # would block once the pipe fills up
+        reactor = Reactor()
+        proc = reactor.spawn(cmd, cwd)
+        reactor.run()
+        return proc.returncode
+
+    def _capture(self, cmd, cwd, echo_output):
+        """
+        run cmd, collecting its stripped, non-blank output lines and
+        optionally echoing them. returns (exit_code, output)
+        """
+        output = []
+        def on_line(line):
+            line = line.strip()
+            if line:
+                if echo_output:
+                    echo(line)
+                output.append(line)
+
+        reactor = Reactor()
+        proc = reactor.spawn(cmd, cwd, on_line=on_line)
+        reactor.run()
+
+        # return (exitcode, list of output+error lines)
+        return proc.returncode, output
 
     def run(self, cmd, cwd=None):
         """
         executes a command, echoing output. returns exit_code
         """
+        started = time.time()
         pipe = subprocess.Popen(cmd, cwd=cwd, shell=True)
-        return pipe.wait()
+        returncode = pipe.wait()
+        # the output goes straight to the terminal, uncounted
+        trace.log.add(cmd, cwd, started, time.time(), returncode)
+        return returncode
 
     def execute(self, cmd, cwd=None, verbose=False, test_mode=False
             , return_out=False):
@@ -117,11 +221,9 @@ class Shell(object):
             cmd = ' '.join(cmd)
 
         if test_mode:
-            print "TEST MODE:",
+            echo("TEST MODE: [%s] [%s]" % (cwd, cmd))
         else:
-            print "EXECUTING:",
-
-        print "[%s] [%s]" % (cwd, cmd)
+            echo("EXECUTING: [%s] [%s]" % (cwd, cmd))
 
         # map by [verbose][return_out]
         methods = {
@@ -142,6 +244,24 @@ class Shell(object):
         else:
             return 0
 
+    def spawn(self, reactor, cmd, cwd=None, on_line=None, on_exit=None
+            , test_mode=False):
+        """
+        like execute(), but start cmd on reactor rather than wait for it,
+        so that one thread can run many commands at once.  in test mode
+        nothing is started, and on_exit is called with 0 straight away.
+        """
+        if type(cmd) in (types.ListType, types.TupleType):
+            cmd = ' '.join(cmd)
+
+        if test_mode:
+            echo("TEST MODE: [%s] [%s]" % (cwd, cmd))
+            if on_exit:
+                on_exit(0)
+            return None
+        echo("EXECUTING: [%s] [%s]" % (cwd, cmd))
+        return reactor.spawn(cmd, cwd, on_line=on_line, on_exit=on_exit)
+
     def exists(self, path):
         """Check if a file exists
         """
@@ -0,0 +1,182 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# a record, kept inside each checkout directory, of what rover has checked
+# out there and when, so that later runs can tell what changed without
+# going back to the repositories
+
+import os
+import sqlite3
+import threading
+import time
+
+STATE_DIR = '.rover'
+STATE_FILE = 'state.db'
+
+# bump whenever the tables below change; older databases are rebuilt,
+#   but for those which only lack columns added since
+SCHEMA_VERSION = 2
+
+COLUMNS = ('path', 'config_line', 'vcs', 'resolved', 'synced_at'
+        , 'duration', 'status', 'action', 'bytes', 'received')
+
+# columns added by each version, over the one before it
+ADDED_COLUMNS = {
+    2: ('action TEXT', 'bytes INTEGER', 'received INTEGER'),
+}
+
+
+def config_line(item):
+    """
+    return the line an item is recorded by: its own config line, which
+    unlike its manifest line never takes a repository to work out
+    """
+    fields = list(item.get_locked_line(None, None))
+    while fields and not fields[-1]:
+        fields.pop()
+    return ', '.join(fields)
+
+
+def state_path(checkout_dir):
+    """return the path of the state database for checkout_dir"""
+    return os.path.join(checkout_dir, STATE_DIR, STATE_FILE)
+
+
+class CheckoutState(object):
+    """
+    the state database of one checkout directory: one row per resolved
+    item, keyed by its checkout-relative path, holding its config line
+    (see config_line()), its version control system, the revision
+    actually checked out (if known), and the time, duration, outcome and
+    kind ('checkout' of a new working copy, or 'update') of its last sync,
+    with the bytes of repository data its working copy held afterwards and
+    how many of those the sync brought in (if known).
+
+    safe to share between the threads of a parallel checkout.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30
+                , check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.text_factory = str
+        self._create()
+
+    @classmethod
+    def open(cls, checkout_dir):
+        """open (creating if needed) the state database of checkout_dir"""
+        state_dir = os.path.join(checkout_dir, STATE_DIR)
+        if not os.path.isdir(state_dir):
+            os.makedirs(state_dir)
+        return cls(state_path(checkout_dir))
+
+    def _create(self):
+        self._lock.acquire()
+        try:
+            version = self._db.execute('PRAGMA user_version').fetchone()[0]
+            upgrades = range(version + 1, SCHEMA_VERSION + 1)
+            if version and all([added in ADDED_COLUMNS for added in upgrades]):
+                # keep the history, which later runs' estimates draw on
+                for added in upgrades:
+                    for column in ADDED_COLUMNS[added]:
+                        self._db.execute('ALTER TABLE items ADD COLUMN %s'
+                                % column)
+            else:
+                self._db.execute('DROP TABLE IF EXISTS items')
+            self._db.execute('CREATE TABLE IF NOT EXISTS items ('
+                    ' path TEXT PRIMARY KEY,'
+                    ' config_line TEXT,'
+                    ' vcs TEXT,'
+                    ' resolved TEXT,'
+                    ' synced_at REAL,'
+                    ' duration REAL,'
+                    ' status TEXT,'
+                    ' action TEXT,'
+                    ' bytes INTEGER,'
+                    ' received INTEGER)')
+            self._db.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def record(self, path, config_line, vcs, resolved=None
+            , synced_at=None, duration=None, status='ok', action=None
+            , bytes=None, received=None):
+        """
+        remember the outcome of syncing the item at path, replacing
+        whatever was known about it before
+        """
+        if synced_at is None:
+            synced_at = time.time()
+        self._lock.acquire()
+        try:
+            self._db.execute('INSERT OR REPLACE INTO items (%s)'
+                    ' VALUES (%s)' % (', '.join(COLUMNS)
+                    , ', '.join(['?'] * len(COLUMNS)))
+                    , (path, config_line, vcs, resolved
+                    , synced_at, duration, status, action, bytes, received))
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def get(self, path):
+        """return what is known about the item at path as a dict, or None"""
+        self._lock.acquire()
+        try:
+            row = self._db.execute('SELECT * FROM items WHERE path = ?'
+                    , (path,)).fetchone()
+        finally:
+            self._lock.release()
+        if row is None:
+            return None
+        return dict(zip(row.keys(), row))
+
+    def items(self):
+        """return what is known about every item, as dicts sorted by path"""
+        self._lock.acquire()
+        try:
+            rows = self._db.execute('SELECT * FROM items ORDER BY path'
+                    ).fetchall()
+        finally:
+            self._lock.release()
+        return [dict(zip(row.keys(), row)) for row in rows]
+
+    def forget(self, path):
+        """drop the record of the item at path and of anything inside it"""
+        self._lock.acquire()
+        try:
+            self._db.execute("DELETE FROM items WHERE path = ?"
+                    " OR path LIKE ? ESCAPE '\\'"
+                    , (path, path.replace('%', r'\%').replace('_', r'\_')
+                    + '/%'))
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def close(self):
+        self._lock.acquire()
+        try:
+            self._db.close()
+        finally:
+            self._lock.release()
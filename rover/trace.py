@@ -0,0 +1,180 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+# a record of every command rover runs: when it started and ended, its
+# exit code, how much output it wrote, and which item and worker slot it
+# ran for, which can be written out as a Chrome trace (see
+# https://ui.perfetto.dev or about:tracing) to show where a slow sync
+# spent its time.
+#
+# the item and slot come from a per-thread context, which the Scheduler
+# sets around each task it runs.
+
+import json
+import os
+import threading
+
+_context = threading.local()
+
+
+def set_context(item=None, slot=None):
+    """
+    make item (a checkout-relative path) and slot (a worker number) the
+    owners of the commands the calling thread runs from now on.  returns
+    the context this replaces, as an (item, slot) tuple, for restoring.
+    """
+    previous = get_context()
+    _context.item = item
+    _context.slot = slot
+    return previous
+
+
+def get_context():
+    """return the calling thread's (item, slot)"""
+    return getattr(_context, 'item', None), getattr(_context, 'slot', None)
+
+
+class CommandRecord(object):
+    """one command run: its times are seconds since the epoch"""
+    __slots__ = ('cmd', 'cwd', 'start', 'end', 'returncode', 'bytes'
+            , 'item', 'slot', 'thread')
+
+    def __init__(self, cmd, cwd, start, end, returncode, bytes=None
+            , item=None, slot=None, thread=None):
+        """
+        bytes  => bytes of output, or None if it went to the terminal
+        thread => the name of the thread which ran it
+        """
+        self.cmd = cmd
+        self.cwd = cwd
+        self.start = start
+        self.end = end
+        self.returncode = returncode
+        self.bytes = bytes
+        self.item = item
+        self.slot = slot
+        self.thread = thread
+
+    def __repr__(self):
+        return "CommandRecord<%s, %s, %.3fs>" % (self.cmd, self.returncode
+                , self.end - self.start)
+
+
+class CommandLog(object):
+    """the commands run by this process; safe to add to from any thread"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def add(self, cmd, cwd, start, end, returncode, bytes=None
+            , context=None, thread=None):
+        """
+        record a command which has finished.  context is the (item, slot)
+        it ran for, by default the calling thread's.
+        """
+        if context is None:
+            context = get_context()
+        if thread is None:
+            thread = threading.currentThread().getName()
+        record = CommandRecord(cmd, cwd, start, end, returncode, bytes
+                , context[0], context[1], thread)
+        self._lock.acquire()
+        try:
+            self.records.append(record)
+        finally:
+            self._lock.release()
+        return record
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self.records = []
+        finally:
+            self._lock.release()
+
+    def chrome_trace(self):
+        """
+        return the commands as a Chrome trace: a dict holding a list of
+        complete ('X') events, one per command, on one track per worker.
+        commands which overlap on one thread (eg the concurrent `git
+        ls-remote's) are spread over extra tracks, since events on a track
+        must nest.
+        """
+        self._lock.acquire()
+        try:
+            records = sorted(self.records, key=lambda record: record.start)
+        finally:
+            self._lock.release()
+
+        pid = os.getpid()
+        origin = records and records[0].start or 0
+        events = []
+        # maps thread name -> list of [track id, end of its last command]
+        tracks = {}
+        track_count = 0
+        for record in records:
+            lanes = tracks.setdefault(record.thread, [])
+            for lane in lanes:
+                if lane[1] <= record.start:
+                    break
+            else:
+                track_count += 1
+                lane = [track_count, None]
+                name = record.thread
+                if record.slot is not None:
+                    name = 'slot %d' % record.slot
+                if lanes:
+                    name = '%s (%d)' % (name, len(lanes) + 1)
+                lanes.append(lane)
+                events.append({'ph': 'M', 'name': 'thread_name', 'pid': pid
+                        , 'tid': lane[0], 'args': {'name': name}})
+            lane[1] = record.end
+
+            name = ' '.join(record.cmd.split()[:2])
+            if record.item:
+                name = '%s: %s' % (record.item, name)
+            events.append({'ph': 'X', 'cat': 'command', 'name': name
+                    , 'pid': pid, 'tid': lane[0]
+                    , 'ts': int((record.start - origin) * 1e6)
+                    , 'dur': int((record.end - record.start) * 1e6)
+                    , 'args': {'cmd': record.cmd, 'cwd': record.cwd
+                        , 'exit': record.returncode, 'bytes': record.bytes
+                        , 'item': record.item, 'slot': record.slot}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, filename):
+        """write the commands to filename as a Chrome trace"""
+        directory = os.path.dirname(os.path.abspath(filename))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp = '%s.%d' % (filename, os.getpid())
+        fp = open(tmp, 'w')
+        try:
+            json.dump(self.chrome_trace(), fp)
+        finally:
+            fp.close()
+        os.rename(tmp, filename)
+
+
+# every command run through a Shell or Reactor is added here
+log = CommandLog()
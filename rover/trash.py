@@ -0,0 +1,123 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import errno
+import os
+import Queue
+import shutil
+import tempfile
+import threading
+
+TRASH_DIR = '.rover-trash'
+
+# how many threads unlink trashed directories at once
+REAPERS = 4
+
+
+class Trash(object):
+    """
+    removes directories from a checkout without waiting for them to be
+    unlinked.  discard() renames a directory into the checkout's
+    .rover-trash area, which takes no longer than any other rename, and
+    a small pool of background threads deletes whatever lands there.
+
+    anything left in the trash by a run that died is reaped by the next
+    one.  call close() to wait for the reapers to finish.
+    """
+    def __init__(self, checkout_dir, reapers=REAPERS):
+        self.checkout_dir = checkout_dir
+        self.path = os.path.join(checkout_dir, TRASH_DIR)
+        self.reapers = reapers
+        self._queue = Queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self._lock.acquire()
+        try:
+            while len(self._threads) < self.reapers:
+                thread = threading.Thread(target=self._reap)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads.append(thread)
+        finally:
+            self._lock.release()
+
+    def _reap(self):
+        while True:
+            path = self._queue.get()
+            try:
+                if path is None:
+                    return
+                shutil.rmtree(path, True)
+            finally:
+                self._queue.task_done()
+
+    def _put(self, path):
+        if not self._threads:
+            self._start()
+        self._queue.put(path)
+
+    def reap_leftovers(self):
+        """queue everything already in the trash for deletion"""
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            self._put(os.path.join(self.path, name))
+
+    def discard(self, path):
+        """
+        take the directory at path out of the checkout at once, and
+        delete it in the background.  if it can't be moved into the trash
+        (eg it is on another file system) it is deleted on the spot.
+        """
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError, e:
+                # another thread may have created it in the meantime
+                if e.errno != errno.EEXIST:
+                    raise
+        # every discard gets its own holder, so that names never collide
+        holder = tempfile.mkdtemp(dir=self.path
+                , prefix=os.path.basename(path.rstrip(os.sep)) + '.')
+        try:
+            os.rename(path, os.path.join(holder, 'trash'))
+        except OSError, e:
+            shutil.rmtree(path, True)
+        self._put(holder)
+
+    def close(self):
+        """wait until everything discarded so far has been deleted"""
+        if not self._threads:
+            return
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        try:
+            os.rmdir(self.path)
+        except OSError, e:
+            # not empty (another rover is using it) or already gone
+            pass
@@ -0,0 +1,110 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+from distutils.version import LooseVersion
+
+from rover.capabilities import CapabilityRegistry
+
+
+class CapabilityRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.dir, 'cache', 'caps.json')
+        self.calls = os.path.join(self.dir, 'calls')
+        self.old_path = os.environ['PATH']
+        os.environ['PATH'] = self.dir
+        self._fake_tool('git', 'git version 1.7.1.231.gd0b16')
+
+    def tearDown(self):
+        os.environ['PATH'] = self.old_path
+        shutil.rmtree(self.dir, True)
+
+    def _fake_tool(self, name, output):
+        path = os.path.join(self.dir, name)
+        fp = open(path, 'w')
+        fp.write('#!/bin/sh\necho x >> %s\necho "%s"\n' % (self.calls, output))
+        fp.close()
+        os.chmod(path, 0755)
+        return path
+
+    def _probe_count(self):
+        if not os.path.exists(self.calls):
+            return 0
+        return len(open(self.calls).readlines())
+
+    def test_version_and_features(self):
+        git = CapabilityRegistry(self.cache_file).get('git')
+        self.assertEquals(LooseVersion('1.7.1'), git.version)
+        self.assertTrue(git.supports('checkout-dwim'))
+        self.assertFalse(git.supports('single-branch'))
+
+    def test_probed_once_per_process(self):
+        registry = CapabilityRegistry(self.cache_file)
+        for i in range(5):
+            registry.get('git')
+        self.assertEquals(1, self._probe_count())
+
+    def test_probe_is_cached_on_disk(self):
+        CapabilityRegistry(self.cache_file).get('git')
+        git = CapabilityRegistry(self.cache_file).get('git')
+        self.assertEquals(1, self._probe_count())
+        self.assertEquals(LooseVersion('1.7.1'), git.version)
+
+    def test_changed_binary_is_probed_again(self):
+        CapabilityRegistry(self.cache_file).get('git')
+        path = self._fake_tool('git', 'git version 2.39.5')
+        os.utime(path, (0, 0))
+        git = CapabilityRegistry(self.cache_file).get('git')
+        self.assertEquals(LooseVersion('2.39.5'), git.version)
+        self.assertTrue(git.supports('filter'))
+
+    def test_failed_probe_is_not_cached(self):
+        # the same mtime both times, so only the failure can tell them apart
+        os.utime(self._fake_tool('git', 'not a version'), (0, 0))
+        self.assertRaises(Exception, CapabilityRegistry(self.cache_file
+                ).require, 'git')
+        os.utime(self._fake_tool('git', 'git version 2.39.5'), (0, 0))
+        git = CapabilityRegistry(self.cache_file).require('git')
+        self.assertEquals(LooseVersion('2.39.5'), git.version)
+
+    def test_missing_tool(self):
+        registry = CapabilityRegistry(self.cache_file)
+        self.assertEquals(None, registry.get('svn'))
+        self.assertRaises(Exception, registry.require, 'svn')
+
+    def test_svn_and_cvs_versions(self):
+        self._fake_tool('svn', '1.6.17')
+        self._fake_tool('cvs'
+                , 'Concurrent Versions System (CVS) 1.12.13 (client/server)')
+        registry = CapabilityRegistry(self.cache_file)
+        self.assertTrue(registry.get('svn').supports('set-depth-exclude'))
+        self.assertTrue(registry.get('svn').supports('depth'))
+        self.assertEquals(LooseVersion('1.12.13'), registry.get('cvs').version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rover import cleanwalk
+from rover.backends.rcvs import CVSItem
+from rover.backends.rgit import GitItem
+from rover.backends.rgitrepo import GitRepo
+
+
+class FindRemovesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.listed = []
+        self._list_dirs = cleanwalk.list_dirs
+        def list_dirs(path):
+            self.listed.append(path[len(self.dir):].strip('/'))
+            return self._list_dirs(path)
+        cleanwalk.list_dirs = list_dirs
+
+    def tearDown(self):
+        cleanwalk.list_dirs = self._list_dirs
+        shutil.rmtree(self.dir, True)
+
+    def mkdirs(self, *paths):
+        for path in paths:
+            os.makedirs(os.path.join(self.dir, path))
+
+    def test_sibling_with_common_prefix_is_removed(self):
+        self.mkdirs('acme/app/CVS', 'acme/apple/CVS', 'acme/CVS')
+        items = [CVSItem('acme/app', 'HEAD')]
+        self.assertEquals(['acme/apple']
+                , cleanwalk.find_removes(self.dir, items))
+
+    def test_owned_subtrees_are_not_listed(self):
+        self.mkdirs('acme/app/src/deep/er', 'acme/app/CVS', 'junk/x')
+        items = [CVSItem('acme/app', 'HEAD')]
+        self.assertEquals(['junk'], cleanwalk.find_removes(self.dir, items))
+        self.assertEquals(['', 'acme'], self.listed)
+
+    def test_only_excluded_paths_are_looked_at(self):
+        self.mkdirs('acme/app/src', 'acme/app/test/data', 'acme/app/docs')
+        items = [CVSItem('acme/app !acme/app/test !acme/app/missing', 'HEAD')]
+        self.assertEquals(['acme/app/test']
+                , cleanwalk.find_removes(self.dir, items))
+        self.assertEquals(['', 'acme'], self.listed)
+
+    def test_excluded_path_holding_another_item(self):
+        self.mkdirs('acme/app/test/data', 'acme/app/test/junk')
+        items = [CVSItem('acme/app !acme/app/test', 'HEAD')
+                , CVSItem('acme/app/test/data', 'HEAD')]
+        self.assertEquals(['acme/app/test/junk']
+                , cleanwalk.find_removes(self.dir, items))
+
+    def test_excluded_by_one_item_kept_by_another(self):
+        self.mkdirs('acme/app/test')
+        items = [CVSItem('acme/app !acme/app/test', 'HEAD')
+                , CVSItem('acme/app', 'BRANCH')]
+        self.assertEquals([], cleanwalk.find_removes(self.dir, items))
+
+    def test_metadata_and_kept_dirs_are_skipped(self):
+        self.mkdirs('CVS/x', '.git/objects', '.rover', 'other/.rover')
+        self.assertEquals(['other']
+                , cleanwalk.find_removes(self.dir, [], keep=['.rover']))
+        self.assertEquals([''], self.listed)
+
+    def test_symlinks_are_not_directories(self):
+        self.mkdirs('acme/app', 'elsewhere')
+        os.symlink(os.path.join(self.dir, 'elsewhere')
+                , os.path.join(self.dir, 'acme', 'link'))
+        items = [CVSItem('acme/app', 'HEAD'), CVSItem('elsewhere', 'HEAD')]
+        self.assertEquals([], cleanwalk.find_removes(self.dir, items))
+
+    def test_git_items(self):
+        self.mkdirs('rover/.git', 'old/.git')
+        items = [GitRepo('github', 'git://github.com/wgen/', 'rover', 'master')]
+        self.assertEquals(['old'], cleanwalk.find_removes(self.dir, items))
+
+    def test_git_working_copies_are_kept(self):
+        # neither kind of git item checks out into its get_path()
+        self.mkdirs('wgen/foss/rover/.git', 'rover/.git')
+        items = [GitItem('git://github.com/wgen/foss/rover.git', 'master')
+                , GitRepo('github', 'git://github.com/wgen/', 'rover.git'
+                , 'master')]
+        self.assertEquals([], cleanwalk.find_removes(self.dir, items))
+
+    def test_listdir_fallback(self):
+        self.mkdirs('acme/app', 'acme/old', 'acme/file_parent')
+        open(os.path.join(self.dir, 'acme', 'afile'), 'w').close()
+        scandir = cleanwalk.scandir
+        cleanwalk.scandir = None
+        try:
+            self.assertEquals(['acme/file_parent', 'acme/old']
+                    , cleanwalk.find_removes(self.dir
+                    , [CVSItem('acme/app', 'HEAD')]))
+        finally:
+            cleanwalk.scandir = scandir
+
+
+if __name__ == '__main__':
+    unittest.main()
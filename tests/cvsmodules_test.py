@@ -0,0 +1,119 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from rover.backends import cvsmodules
+
+ROOT = ':pserver:anon@cvs.example.com:/cvs'
+
+MODULES = ['# aliases', 'acme_app -a \\', 'acme/app \\', '!acme/app/test'
+        , 'other -a acme/lib']
+
+
+class FakeShell(object):
+    """answers `cvs rlog -h' and `cvs checkout -p' of CVSROOT/modules"""
+    def __init__(self, head='1.7', modules=MODULES):
+        self.head = head
+        self.modules = modules
+        self.history = []
+
+    def tee_silent(self, cmd, cwd=None):
+        self.history.append(cmd)
+        if ' rlog ' in cmd:
+            if self.head is None:
+                return 1, ['cvs rlog: cannot find module']
+            return 0, ['RCS file: /cvs/CVSROOT/modules,v'
+                    , 'head: %s' % self.head, 'branch:']
+        return 0, self.modules
+
+
+class ParseModulesTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEquals({'acme_app': ['acme/app', '!acme/app/test']
+                , 'other': ['acme/lib']}
+                , cvsmodules.parse_modules('\n'.join(MODULES) + '\n'))
+
+
+class CVSModulesCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, 'cvs-modules.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def new_cache(self, ttl=60, sh=None):
+        cache = cvsmodules.CVSModulesCache(self.file, ttl)
+        cache._sh = sh or FakeShell()
+        return cache
+
+    def test_fetched_once_per_run(self):
+        cache = self.new_cache()
+        for i in range(3):
+            self.assertEquals(['acme/lib'], cache.aliases(ROOT)['other'])
+        self.assertEquals(['cvs -Q -d %s rlog -h CVSROOT/modules' % ROOT
+                , 'cvs -Q -d %s checkout -p -A CVSROOT/modules' % ROOT]
+                , cache._sh.history)
+
+    def test_trusted_across_runs_within_ttl(self):
+        self.new_cache().aliases(ROOT)
+        cache = self.new_cache()
+        self.assertTrue('acme_app' in cache.aliases(ROOT))
+        self.assertEquals([], cache._sh.history)
+
+    def test_unchanged_file_is_not_fetched_again(self):
+        self.new_cache(0).aliases(ROOT)
+        cache = self.new_cache(0)
+        self.assertTrue('acme_app' in cache.aliases(ROOT))
+        self.assertEquals(['cvs -Q -d %s rlog -h CVSROOT/modules' % ROOT]
+                , cache._sh.history)
+
+    def test_changed_file_is_fetched_again(self):
+        self.new_cache(0).aliases(ROOT)
+        cache = self.new_cache(0, FakeShell('1.8', ['new -a acme/new']))
+        self.assertEquals({'new': ['acme/new']}, cache.aliases(ROOT))
+        self.assertEquals('1.8', json.load(open(self.file))[ROOT]['revision'])
+
+    def test_unknown_revision_is_fetched_again(self):
+        self.new_cache(0, FakeShell(None)).aliases(ROOT)
+        cache = self.new_cache(0, FakeShell(None))
+        cache.aliases(ROOT)
+        self.assertEquals(2, len(cache._sh.history))
+
+    def test_roots_are_kept_apart(self):
+        cache = self.new_cache()
+        cache.aliases(ROOT)
+        cache._sh.modules = ['elsewhere -a acme/x']
+        self.assertEquals({'elsewhere': ['acme/x']}
+                , cache.aliases(':ext:other:/cvs'))
+        self.assertTrue('acme_app' in cache.aliases(ROOT))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rover.backends import gitcache, rgitrepo
+from mock_shell import MockShell
+
+
+class NormalizeUrlTest(unittest.TestCase):
+    def test_spellings_of_one_repo_match(self):
+        expected = 'github.com/wgen/rover'
+        self.assertEquals(expected
+                , gitcache.normalize_url('git://github.com/wgen/rover.git'))
+        self.assertEquals(expected
+                , gitcache.normalize_url('git@github.com:wgen/rover.git'))
+        self.assertEquals(expected
+                , gitcache.normalize_url('https://me@GitHub.com/wgen/rover/'))
+
+    def test_port_is_kept(self):
+        self.assertEquals('git.example.com_8443/rover'
+                , gitcache.normalize_url('https://git.example.com:8443/rover'))
+
+    def test_parent_references_are_dropped(self):
+        self.assertEquals('example.com/rover'
+                , gitcache.normalize_url('ssh://example.com/../rover.git'))
+
+
+class GitMirrorCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = gitcache.GitMirrorCache(self.root)
+        self.sh = MockShell()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, True)
+
+    def test_new_mirror_is_cloned_once(self):
+        url = 'git://github.com/wgen/rover.git'
+        path = os.path.join(self.root, 'github.com/wgen/rover.git')
+
+        self.assertEquals(['--reference', path]
+                , self.cache.clone_args(self.sh, url, test_mode=True))
+        self.assertEquals(['--reference', path]
+                , self.cache.clone_args(self.sh, url, test_mode=True))
+
+        self.assertEquals([['git', 'clone', '--mirror', '-q', url, path]
+                , ['git', 'config', 'gc.auto', '0']], self.sh.history)
+
+    def test_existing_mirror_is_fetched(self):
+        url = 'git://github.com/wgen/rover.git'
+        os.makedirs(os.path.join(self.root, 'github.com/wgen/rover.git'))
+
+        # never pruned, and gc is turned off in mirrors made without it
+        self.cache.refresh(self.sh, url)
+        self.assertEquals([['git', 'config', 'gc.auto', '0']
+                , ['git', 'fetch', '-q']], self.sh.history)
+
+    def test_gc_is_only_turned_off_once(self):
+        url = 'git://github.com/wgen/rover.git'
+        path = os.path.join(self.root, 'github.com/wgen/rover.git')
+        os.makedirs(path)
+        open(os.path.join(path, 'config'), 'w').write(
+                '[core]\n\tbare = true\n[gc]\n\tauto = 0\n')
+
+        self.cache.refresh(self.sh, url)
+        self.assertEquals([['git', 'fetch', '-q']], self.sh.history)
+
+    def test_dissociate(self):
+        cache = gitcache.GitMirrorCache(self.root, dissociate=True)
+        args = cache.clone_args(self.sh, 'git://github.com/wgen/rover.git'
+                , test_mode=True)
+        self.assertEquals('--dissociate', args[-1])
+
+    def test_failed_mirror_is_not_used(self):
+        self.sh.seed_result(1, [])
+        self.assertEquals([], self.cache.clone_args(self.sh
+                , 'git://github.com/wgen/rover.git'))
+
+    def test_git_repo_clone_uses_mirror(self):
+        item = rgitrepo.GitRepo('wgen-github', 'git://github.com/wgen/'
+                , 'rover.git', 'master')
+        item.set_mirror_cache(self.cache)
+        item.checkout(self.sh, 'dest', '', test_mode=True)
+
+        path = os.path.join(self.root, 'github.com/wgen/rover.git')
+        self.assertEquals(['git', 'clone', '--reference', path
+                , '--branch', 'master', 'git://github.com/wgen/rover.git'
+                , 'dest/rover'], self.sh.history[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
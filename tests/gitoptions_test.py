@@ -0,0 +1,112 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import unittest
+
+from rover.capabilities import Capabilities
+from rover.backends.gitoptions import GitCloneOptions
+from rover.backends import rgit, rgitrepo
+from mock_shell import MockShell
+
+
+class GitCloneOptionsTest(unittest.TestCase):
+    def test_parse(self):
+        options = GitCloneOptions.parse('depth=1 single-branch filter=tree:0')
+        self.assertEquals(1, options.depth)
+        self.assertEquals(True, options.single_branch)
+        self.assertEquals('tree:0', options.filter)
+        self.assertEquals(['--depth', '1', '--single-branch'
+                , '--filter=tree:0'], options.clone_args())
+        self.assertEquals(['--depth', '1'], options.fetch_args())
+
+    def test_unsupported_options_left_out(self):
+        options = GitCloneOptions.parse('depth=1 single-branch filter=tree:0')
+        git = Capabilities('git', '/usr/bin/git', '1.7.1')
+        self.assertEquals(['--depth', '1'], options.clone_args(git))
+        git = Capabilities('git', '/usr/bin/git', '2.0')
+        self.assertEquals(['--depth', '1', '--single-branch']
+                , options.clone_args(git))
+
+    def test_parse_empty(self):
+        options = GitCloneOptions.parse('')
+        self.assertEquals([], options.clone_args())
+        self.assertEquals([], options.fetch_args())
+
+    def test_rejects_bad_options(self):
+        self.assertRaises(Exception, GitCloneOptions.parse, 'depth=0')
+        self.assertRaises(Exception, GitCloneOptions.parse, 'filter=all')
+        self.assertRaises(Exception, GitCloneOptions.parse, 'recursive')
+
+    def test_line_overrides_defaults(self):
+        defaults = GitCloneOptions(depth=50, filter='blob:none')
+        options = GitCloneOptions.parse('depth=1').merge(defaults)
+        self.assertEquals(1, options.depth)
+        self.assertEquals('blob:none', options.filter)
+        self.assertEquals(None, options.single_branch)
+
+
+class GitItemOptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.sh = MockShell()
+
+    def test_shallow_clone(self):
+        item = rgit.GitFactory().get_rover_items(
+                ['git://github.com/wgen/rover.git', 'master', 'git'
+                , 'depth=1 single-branch'])[0]
+        item.checkout(self.sh, 'dest', '', verbose=True, test_mode=True)
+
+        self.assertEquals(['git clone', '-n', '--depth', '1'
+                , '--single-branch', '--branch', 'master'
+                , 'git://github.com/wgen/rover.git'], self.sh.history[0])
+
+    def test_defaults_apply_to_items(self):
+        item = rgit.GitItem('git://github.com/wgen/rover.git', 'master')
+        item.set_clone_defaults(GitCloneOptions(filter='blob:none'))
+        item.checkout(self.sh, 'dest', '', verbose=True, test_mode=True)
+
+        self.assertEquals(['git clone', '-n', '--filter=blob:none'
+                , 'git://github.com/wgen/rover.git'], self.sh.history[0])
+
+
+class GitRepoOptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.sh = MockShell()
+        conn = rgitrepo.GitConnection('wgen-github', 'git://github.com/wgen/')
+        self.item = conn.get_rover_items(['rover.git', 'master'
+                , 'wgen-github', 'depth=5'])[0]
+
+    def test_shallow_clone(self):
+        self.item.checkout(self.sh, 'dest', '')
+        self.assertEquals(['git', 'clone', '--depth', '5'
+                , '--branch', 'master', 'git://github.com/wgen/rover.git'
+                , 'dest/rover'], self.sh.history[-1])
+
+    def test_pull_stays_shallow(self):
+        self.sh.seed_result(1)
+        self.item.checkout(self.sh, 'dest', '')
+        self.assertEquals(['git', 'pull', '--depth', '5']
+                , self.sh.history[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
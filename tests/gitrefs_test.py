@@ -0,0 +1,198 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import rover.shell
+from rover.backends.gitrefs import RefSnapshot, checkout_action, \
+        up_to_date, list_remote_refs
+from rover.backends import rgit
+from mock_shell import MockShell
+
+
+GIT = 'git -c user.name=rover -c user.email=rover@example.com'
+
+
+class RefSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.sh = rover.shell.Shell()
+        self.dir = tempfile.mkdtemp()
+        self.repo = os.path.join(self.dir, 'repo')
+        self._git('init -q repo', cwd=self.dir)
+        self._git('commit -q --allow-empty -m one')
+        self._git('branch -M master')
+        self._git('tag v1')
+        self._git('branch topic')
+        self._git('update-ref refs/remotes/origin/master HEAD')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def _git(self, args, cwd=None):
+        code = self.sh.run_silent('%s %s' % (GIT, args), cwd=cwd or self.repo)
+        self.assertEquals(0, code)
+
+    def _for_each_ref(self):
+        code, out = self.sh.tee_silent(
+                "git for-each-ref --format='%(objectname) %(refname)'"
+                , cwd=self.repo)
+        return dict([tuple(reversed(line.split())) for line in out])
+
+    def test_loose_refs(self):
+        refs = RefSnapshot.load(self.repo, MockShell())
+        self.assertEquals(self._for_each_ref(), refs.refs)
+        self.assertTrue(refs.find_tag('v1'))
+        self.assertTrue(refs.find_local_branch('topic'))
+        self.assertTrue(refs.find_remote_branch('master'))
+        self.assertFalse(refs.find_remote_branch('topic'))
+
+    def test_packed_refs_are_overridden_by_loose_ones(self):
+        self._git('pack-refs --all')
+        self._git('commit -q --allow-empty -m two')
+        refs = RefSnapshot.load(self.repo, MockShell())
+        self.assertEquals(self._for_each_ref(), refs.refs)
+
+    def test_packed_annotated_tags_are_peeled(self):
+        self._git('tag -a -m two v2')
+        self._git('pack-refs --all')
+        refs = RefSnapshot.load(self.repo, MockShell())
+        self.assertEquals(refs.get('refs/heads/master')
+                , refs.get('refs/tags/v2^{}'))
+        self.assertNotEquals(refs.get('refs/heads/master')
+                , refs.get('refs/tags/v2'))
+
+    def test_head(self):
+        refs = RefSnapshot.load(self.repo, MockShell())
+        self.assertEquals('refs/heads/master', refs.head)
+        self.assertEquals(refs.get('refs/heads/master'), refs.head_commit())
+
+        self._git('checkout -q v1')
+        refs = RefSnapshot.load(self.repo, MockShell())
+        self.assertEquals(refs.get('refs/tags/v1'), refs.head)
+
+    def test_missing_repository(self):
+        refs = RefSnapshot.load(os.path.join(self.dir, 'nothing'), MockShell())
+        self.assertEquals({}, refs.refs)
+
+    def test_git_item_lookups_spawn_nothing(self):
+        sh = MockShell()
+        item = rgit.GitItem('git://github.com/wgen/rover.git', 'master')
+        self.assertTrue(item.find_local_branch('master', self.repo, sh))
+        self.assertTrue(item.find_remote_branch('master', self.repo, sh))
+        self.assertFalse(item.find_tag('master', self.repo, sh))
+        self.assertEquals([], sh.history)
+
+
+class UpToDateTest(unittest.TestCase):
+    def setUp(self):
+        self.local = RefSnapshot({'refs/heads/master': 'aaa'
+                , 'refs/remotes/origin/master': 'aaa'
+                , 'refs/tags/v1': 'ttt'}, 'refs/heads/master')
+
+    def test_branch_unchanged(self):
+        self.assertTrue(up_to_date(self.local
+                , {'refs/heads/master': 'aaa'}, 'master'))
+
+    def test_branch_moved(self):
+        self.assertFalse(up_to_date(self.local
+                , {'refs/heads/master': 'bbb'}, 'master'))
+
+    def test_other_branch_checked_out(self):
+        self.local.head = 'refs/heads/topic'
+        self.local.refs['refs/heads/topic'] = 'aaa'
+        self.assertFalse(up_to_date(self.local
+                , {'refs/heads/master': 'aaa'}, 'master'))
+
+    def test_annotated_tag(self):
+        self.local.head = 'ccc'
+        remote = {'refs/tags/v1': 'ttt', 'refs/tags/v1^{}': 'ccc'}
+        self.assertTrue(up_to_date(self.local, remote, 'v1'))
+        remote['refs/tags/v1^{}'] = 'ddd'
+        self.assertFalse(up_to_date(self.local, remote, 'v1'))
+
+    def test_unknown_or_unlisted(self):
+        self.assertFalse(up_to_date(self.local, None, 'master'))
+        self.assertFalse(up_to_date(self.local, {}, 'master'))
+
+
+class CheckoutActionTest(unittest.TestCase):
+    def setUp(self):
+        self.local = RefSnapshot({'refs/heads/master': 'a' * 40
+                , 'refs/tags/v1': 't' * 40, 'refs/tags/v1^{}': 'c' * 40}
+                , 'refs/heads/master')
+
+    def test_branch(self):
+        self.assertEquals('fetch'
+                , checkout_action(self.local, 'master', 'preserve'))
+        self.assertEquals('switch'
+                , checkout_action(self.local, 'topic', 'preserve'))
+
+    def test_annotated_tag(self):
+        self.local.head = 'c' * 40
+        self.assertEquals('fetch'
+                , checkout_action(self.local, 'v1', 'preserve'))
+
+    def test_commit(self):
+        self.assertEquals('no-op'
+                , checkout_action(self.local, 'a' * 40, 'preserve'))
+        self.assertEquals('fetch'
+                , checkout_action(self.local, 'a' * 40, 'clean'))
+        self.assertEquals('switch'
+                , checkout_action(self.local, 'b' * 40, 'preserve'))
+
+
+class ListRemoteRefsTest(unittest.TestCase):
+    def setUp(self):
+        self.sh = rover.shell.Shell()
+        self.dir = tempfile.mkdtemp()
+        self.sh.run_silent('%s init -q src && cd src && %s commit -q '
+                '--allow-empty -m one && %s tag v1' % (GIT, GIT, GIT)
+                , cwd=self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_lists_each_remote(self):
+        good = os.path.join(self.dir, 'src')
+        bad = os.path.join(self.dir, 'missing')
+        results = list_remote_refs(self.sh, [good, bad], jobs=1)
+
+        self.assertEquals(None, results[bad])
+        refs = RefSnapshot.load(good, MockShell())
+        self.assertEquals(refs.head_commit(), results[good]['HEAD'])
+        self.assertEquals(refs.get('refs/tags/v1'), results[good]['refs/tags/v1'])
+
+    def test_runs_through_the_shell(self):
+        sh = MockShell()
+        sh.seed_result(0, ['%s\tHEAD' % ('a' * 40)])
+        results = list_remote_refs(sh, ['git://host/repo.git'])
+
+        self.assertEquals([['git', 'ls-remote', 'git://host/repo.git']], sh.history)
+        self.assertEquals({'HEAD': 'a' * 40}, results['git://host/repo.git'])
+
+
+if __name__ == '__main__':
+    unittest.main()
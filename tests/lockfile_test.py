@@ -0,0 +1,162 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import calendar
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from rover import Rover
+from rover.backends.rcvs import CVSItem
+from rover.backends.rsvn import SVNItem
+from rover.lockfile import read_lockfile, write_lockfile
+from rover.state import CheckoutState
+
+SHA = '18e8a9c95f00b986c7c47c5c1e91417105c817e1'
+
+# 2026-10-18 12:00:00 UTC
+SYNCED = calendar.timegm((2026, 10, 18, 12, 0, 0))
+
+
+class LockfileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, 'locks', 'rover.lock')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_round_trip(self):
+        entries = [{'path': 'rover', 'vcs': 'git', 'resolved': SHA
+                , 'line': ('rover.git', SHA, 'github')}]
+        write_lockfile(self.file, ['acme'], [('github', 'git', 'git://h/')]
+                , entries)
+        lock = read_lockfile(self.file)
+        self.assertEquals(['acme'], lock['config'])
+        self.assertEquals([('github', 'git', 'git://h/')], lock['repos'])
+        self.assertEquals(entries, lock['items'])
+
+    def test_other_versions_are_refused(self):
+        fp = open(os.path.join(self.dir, 'old.lock'), 'w')
+        json.dump({'version': 99, 'items': []}, fp)
+        fp.close()
+        self.assertRaises(Exception, read_lockfile
+                , os.path.join(self.dir, 'old.lock'))
+        self.assertRaises(Exception, read_lockfile
+                , os.path.join(self.dir, 'missing.lock'))
+
+
+class LockedLineTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def _sticky(self, module, tag):
+        os.makedirs(os.path.join(self.dir, module, 'CVS'))
+        fp = open(os.path.join(self.dir, module, 'CVS', 'Tag'), 'w')
+        fp.write(tag + '\n')
+        fp.close()
+
+    def test_svn(self):
+        item = SVNItem('acme/app', 'HEAD', 'http://svn/repo')
+        item.exclude('acme/app/test')
+        self.assertEquals(('acme/app !acme/app/test', '1234', 'svn'
+                , 'http://svn/repo'), item.get_locked_line('1234', SYNCED))
+        self.assertEquals(('acme/app !acme/app/test', 'HEAD', 'svn'
+                , 'http://svn/repo'), item.get_locked_line(None, None))
+
+    def test_cvs_branch_is_pinned_to_sync_date(self):
+        item = CVSItem('acme/app !acme/app/test', 'BRANCH')
+        self._sticky('acme/app', 'TBRANCH')
+        resolved = item.get_resolved_revision(None, self.dir)
+        self.assertEquals(None, resolved)
+        self.assertEquals(('acme/app !acme/app/test', 'BRANCH', 'cvs', ''
+                , '2026-10-18 12:00:00 +0000')
+                , item.get_locked_line(resolved, SYNCED))
+
+    def test_cvs_tag_is_kept(self):
+        item = CVSItem('acme/app', 'REL_1_0', ':ext:cvs:/cvs')
+        self._sticky('acme/app', 'NREL_1_0')
+        self.assertEquals(('acme/app', 'REL_1_0', 'cvs', ':ext:cvs:/cvs')
+                , item.get_locked_line(item.get_resolved_revision(None
+                , self.dir), SYNCED))
+
+    def test_cvs_sticky_date(self):
+        item = CVSItem('acme/app', 'HEAD')
+        self._sticky('acme/app', 'D2026.01.02.03.04.05')
+        self.assertEquals(('acme/app', 'HEAD', 'cvs', ''
+                , '2026-01-02 03:04:05 +0000'), item.get_locked_line(
+                item.get_resolved_revision(None, self.dir), SYNCED))
+
+    def test_cvs_date_is_checked_out(self):
+        item = CVSItem('acme/app', 'HEAD', '', '2026-01-02 03:04:05 +0000')
+        self.assertEquals('CVSItem<acme/app, HEAD, cvs, ,'
+                ' 2026-01-02 03:04:05 +0000>', repr(item))
+
+
+class RoverLockfileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, 'rover.lock')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_save_lockfile(self):
+        r = Rover('', checkout_dir=os.path.join(self.dir, 'co'))
+        r.set_lockfile(self.file)
+        r.config_items = [SVNItem('acme/app', 'HEAD', 'http://svn/repo')
+                , CVSItem('acme/lib', 'HEAD')]
+        state = CheckoutState.open(r.checkout_dir)
+        state.record('acme/app', '', 'svn', '1234', SYNCED, 1.0)
+        state.record('acme/lib', '', 'cvs', None, SYNCED, 2.0, 'failed')
+        state.close()
+
+        r.save_lockfile()
+        self.assertEquals([('acme/app', '1234', 'svn', 'http://svn/repo')
+                , ('acme/lib', 'HEAD', 'cvs', '')]
+                , [entry['line'] for entry in read_lockfile(self.file)['items']])
+
+    def test_load_lockfile(self):
+        write_lockfile(self.file, ['acme'], [], [
+                {'path': 'acme/app', 'vcs': 'svn', 'resolved': '1234'
+                    , 'line': ('acme/app !acme/app/test', '1234', 'svn'
+                    , 'http://svn/repo')}
+                , {'path': 'acme/lib', 'vcs': 'cvs', 'resolved': None
+                    , 'line': ('acme/lib', 'HEAD', 'cvs', ''
+                    , '2026-10-18 12:00:00 +0000')}])
+        r = Rover('', checkout_dir=os.path.join(self.dir, 'co'))
+        r.load_lockfile(self.file)
+        svn, cvs = r.config_items
+        self.assertEquals(('acme/app', '1234', ['acme/app/test'], True)
+                , (svn.module, svn.revision, svn.excludes, svn.sparse))
+        self.assertEquals('2026-10-18 12:00:00 +0000', cvs.date)
+        self.assertTrue(r.locked)
+
+
+if __name__ == '__main__':
+    unittest.main()
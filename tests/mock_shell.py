@@ -56,10 +56,12 @@ class MockShell(object):
     def tee(self, cmd, cwd=None):
         """Mock version from rover.shell"""
         self.history.append(cmd)
+        return self._pop_result()
 
     def tee_silent(self, cmd, cwd=None):
         """Mock version from rover.shell"""
         self.history.append(cmd)
+        return self._pop_result()
 
     def run_silent(self, cmd, cwd=None):
         """Mock version from rover.shell"""
@@ -75,6 +77,16 @@ class MockShell(object):
         self.history.append(cmd)
         return self._pop_result()
 
+    def spawn(self, reactor, cmd, cwd=None, on_line=None, on_exit=None
+            , test_mode=False):
+        """Mock version from rover.shell; runs nothing, but calls back"""
+        self.history.append(cmd)
+        return_code, output = self._pop_result()
+        if on_line:
+            for line in output or []:
+                on_line(line)
+        if on_exit:
+            on_exit(return_code)
 
     def exists(self, path):
         result = self._pop_result()[0]
@@ -0,0 +1,184 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import random
+import unittest
+
+from rover import Rover
+from rover.pathtrie import PathTrie
+
+
+class PathTrieTest(unittest.TestCase):
+    def setUp(self):
+        self.trie = PathTrie()
+        for path in ['a', 'a/b', 'ab', 'a/b/c', 'a', 'd/e']:
+            self.trie.add(path, path)
+
+    def test_at(self):
+        self.assertEquals([(0, 'a'), (4, 'a')], self.trie.at('a'))
+        self.assertEquals([], self.trie.at('d'))
+        self.assertEquals([], self.trie.at('x/y'))
+
+    def test_on_path(self):
+        self.assertEquals([(0, 'a'), (1, 'a/b'), (4, 'a')]
+                , self.trie.on_path('a/b/x'))
+        self.assertEquals([], self.trie.on_path('abc'))
+        self.assertEquals((0, 'a'), self.trie.first_on_path('a/b/c'))
+        self.assertEquals(None, self.trie.first_on_path('d'))
+
+    def test_below(self):
+        self.assertEquals([(1, 'a/b'), (3, 'a/b/c')], self.trie.below('a'))
+        self.assertEquals([(5, 'd/e')], self.trie.below('d'))
+        self.assertEquals([], self.trie.below('ab'))
+        self.assertEquals((1, 'a/b'), self.trie.first_below('a'))
+        self.assertEquals(None, self.trie.first_below('a/b/c'))
+
+    def test_components_not_prefixes(self):
+        trie = PathTrie()
+        trie.add('acme/app', 1)
+        self.assertEquals([], trie.on_path('acme/apple'))
+        self.assertEquals([], trie.below('acme/ap'))
+
+
+class FakeItem(object):
+    def __init__(self, path, narrowed_from=None):
+        self.path = path
+        self.narrowed_from = narrowed_from
+        self.excludes = []
+
+    def get_path(self):
+        return self.path
+
+    def exclude(self, path):
+        self.excludes.append(path)
+
+    def expand(self):
+        return [self]
+
+    def narrow(self, path):
+        return FakeItem(path, self)
+
+    def state(self):
+        parent = None
+        if self.narrowed_from is not None:
+            parent = self.narrowed_from.path
+        return (self.path, parent, tuple(self.excludes)
+                , getattr(self, '_removeme', False))
+
+
+def quadratic_resolve(rover):
+    """Rover.resolve as it was written before the PathTrie"""
+    items = [(item, item.get_path()) for item in rover.config_items]
+    items.reverse()
+    for idx, pair in enumerate(items):
+        item, path = pair
+        for candidate, cpath in items[idx+1:]:
+            if rover._path_overrides(path, cpath):
+                candidate._removeme = True
+                if path == cpath:
+                    rover.clobbers.append(candidate)
+            elif rover._path_overrides(cpath, path):
+                candidate.exclude(path)
+    items.reverse()
+    new_items = []
+    for item, path in items:
+        if getattr(item, '_removeme', False):
+            continue
+        new_items.extend(item.expand())
+    rover.config_items = new_items
+
+
+def quadratic_filters(rover):
+    """Rover.apply_filters as it was written before the PathTrie"""
+    if rover.includes:
+        allowed_items = []
+        for item in rover.config_items:
+            allowed = False
+            path = item.get_path()
+            for include in rover.includes:
+                if rover._path_overrides(include, path):
+                    allowed = True
+                    break
+                elif rover._path_overrides(path, include):
+                    allowed_items.append(item.narrow(include))
+                    break
+            if allowed:
+                allowed_items.append(item)
+        rover.config_items = allowed_items
+    if rover.excludes:
+        allowed_items = []
+        for item in rover.config_items:
+            allowed = True
+            path = item.get_path()
+            for exclude in rover.excludes:
+                if rover._path_overrides(exclude, path):
+                    allowed = False
+                    break
+                elif rover._path_overrides(path, exclude):
+                    item.exclude(exclude)
+            if allowed:
+                allowed_items.append(item)
+        rover.config_items = allowed_items
+
+
+class RoverTrieEquivalenceTest(unittest.TestCase):
+    """
+    resolve() and apply_filters() must give exactly what the quadratic
+    versions they replaced gave
+    """
+    def random_path(self, rand):
+        parts = [rand.choice(['a', 'b', 'ab']) for i in range(rand.randint(1, 4))]
+        return '/'.join(parts)
+
+    def run_both(self, paths, includes, excludes, resolve, filters):
+        outcomes = []
+        for resolve, filters in [(resolve, filters)
+                , (quadratic_resolve, quadratic_filters)]:
+            rover = Rover('')
+            items = [FakeItem(path) for path in paths]
+            rover.config_items = list(items)
+            rover.includes = list(includes)
+            rover.excludes = list(excludes)
+            resolve(rover)
+            clobbers = [item.state() for item in rover.clobbers]
+            filters(rover)
+            outcomes.append(([item.state() for item in items]
+                    , [item.state() for item in rover.config_items]
+                    , clobbers))
+        self.assertEquals(outcomes[1], outcomes[0])
+
+    def test_random_configs(self):
+        rand = random.Random(1234)
+        for n in range(300):
+            paths = [self.random_path(rand)
+                    for i in range(rand.randint(0, 12))]
+            includes = [self.random_path(rand)
+                    for i in range(rand.choice([0, 0, 1, 2, 3]))]
+            excludes = [self.random_path(rand)
+                    for i in range(rand.choice([0, 0, 1, 2, 3]))]
+            self.run_both(paths, includes, excludes
+                    , Rover.resolve, Rover.apply_filters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rover import Rover
+from rover.backends import svnlist
+from rover.plan import Estimator, PlanStep, format_plan
+from rover.state import CheckoutState
+
+
+def row(path, vcs, action, duration, bytes=None, received=None
+        , status='ok', config_line='line', resolved=None):
+    return {'path': path, 'vcs': vcs, 'action': action, 'duration': duration
+            , 'bytes': bytes, 'received': received, 'status': status
+            , 'config_line': config_line, 'resolved': resolved}
+
+
+class EstimatorTest(unittest.TestCase):
+    def setUp(self):
+        self.estimator = Estimator([
+                row('a', 'git', 'update', 1.0, 5000, 100)
+                , row('b', 'git', 'checkout', 20.0, 8000, 8000)
+                , row('c', 'git', 'checkout', 40.0, 9000, 9000)
+                , row('d', 'git', 'checkout', 30.0, 7000, 7000)
+                , row('e', 'git', 'update', 9.0, status='failed')])
+
+    def test_own_history(self):
+        self.assertEquals((1.0, 100, False)
+                , self.estimator.estimate('fetch', 'git', 'a'))
+        self.assertEquals((20.0, 8000, False)
+                , self.estimator.estimate('clone', 'git', 'b'))
+
+    def test_other_items_history(self):
+        self.assertEquals((30.0, 8000, True)
+                , self.estimator.estimate('clone', 'git', 'new'))
+        # a new working copy brings in about what the old one held
+        self.assertEquals((30.0, 5000, True)
+                , self.estimator.estimate('reclone', 'git', 'a'))
+        self.assertEquals((1.0, 100, True)
+                , self.estimator.estimate('switch', 'git', 'b'))
+
+    def test_nothing_to_go_by(self):
+        self.assertEquals((None, None, True)
+                , self.estimator.estimate('update', 'svn', 'x'))
+        self.assertEquals((0.0, 0, False)
+                , self.estimator.estimate('no-op', 'svn', 'x'))
+
+
+class FormatPlanTest(unittest.TestCase):
+    def test_format(self):
+        lines = format_plan([PlanStep('clone', 'acme', 'git', 90.0
+                    , 3 * 1024 * 1024, True)
+                , PlanStep('fetch', 'rover', 'git', 1.25, 512)
+                , PlanStep('update', 'lib', 'svn')])
+        self.assertEquals([
+                'ACTION       TIME    BYTES  PATH'
+                , 'clone      ~1m30s    ~3.0M  acme'
+                , 'fetch        1.2s     512B  rover'
+                , 'update          ?        ?  lib'
+                , 'PLAN: 1 clone, 1 fetch, 1 update'
+                , 'ESTIMATED: at least 1m31s, at least 3.0M'], lines)
+
+    def test_nothing_to_do(self):
+        self.assertEquals('PLAN: nothing to do', format_plan([])[1])
+
+
+class RoverPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.checkout_dir = os.path.join(self.dir, 'co')
+        self.config = os.path.join(self.dir, 'acme.csv')
+        fp = open(self.config, 'w')
+        fp.write('acme/app, HEAD, svn, http://svn/repo\n'
+                'acme/new, HEAD, svn, http://svn/repo\n'
+                'acme/pinned, 1234, svn, http://svn/repo\n'
+                'acme/sparse !acme/sparse/test, HEAD, svn, http://svn/repo\n'
+                'acme/lib, BRANCH, cvs\n')
+        fp.close()
+        for path in ['acme/app', 'acme/pinned', 'acme/lib/CVS', 'junk']:
+            os.makedirs(os.path.join(self.checkout_dir, path))
+
+        state = CheckoutState.open(self.checkout_dir)
+        state.record('acme/app', 'acme/app, HEAD, svn, http://svn/repo'
+                , 'svn', '99', 100.0, 2.0, 'ok', 'update', 4096, 1024)
+        state.record('acme/pinned', 'acme/pinned, 1234, svn, http://svn/repo'
+                , 'svn', '1234', 100.0, 3.0, 'ok', 'checkout', 9000, 9000)
+        state.record('acme/lib', 'acme/lib, HEAD, cvs', 'cvs'
+                , None, 100.0, 5.0, 'ok', 'update')
+        state.close()
+
+        self.cache_file = svnlist.cache.cache_file
+        svnlist.cache.cache_file = os.path.join(self.dir, 'listings.json')
+        # nothing may be listed
+        self.sh = svnlist.cache._sh
+        svnlist.cache._sh = None
+
+    def tearDown(self):
+        svnlist.cache.cache_file = self.cache_file
+        svnlist.cache._sh = self.sh
+        svnlist.cache._listings = None
+        shutil.rmtree(self.dir, True)
+
+    def plan(self, mode):
+        r = Rover(self.config, checkout_mode=mode
+                , checkout_dir=self.checkout_dir)
+        return dict([(step.path, step.action) for step in r.plan_steps()])
+
+    def test_preserve(self):
+        self.assertEquals({'acme/app': 'update', 'acme/new': 'checkout'
+                , 'acme/pinned': 'no-op', 'acme/sparse': 'checkout'
+                , 'acme/lib': 'switch'}, self.plan('preserve'))
+
+    def test_clean(self):
+        plan = self.plan('clean')
+        self.assertEquals('update', plan['acme/pinned'])
+        # a sync removes nothing beside the items
+        self.assertFalse('junk' in plan)
+
+    def test_paranoid(self):
+        plan = self.plan('paranoid')
+        self.assertEquals(('reclone', 'checkout')
+                , (plan['acme/app'], plan['acme/new']))
+
+    def test_switch_after_config_change(self):
+        state = CheckoutState.open(self.checkout_dir)
+        state.record('acme/app', 'acme/app, BRANCH, svn, http://svn/repo'
+                , 'svn', '99', 100.0, 2.0, 'ok', 'update', 4096, 1024)
+        state.close()
+        self.assertEquals('switch', self.plan('preserve')['acme/app'])
+
+    def test_excludes_without_cached_listings_stay_whole(self):
+        r = Rover(self.config, checkout_dir=self.checkout_dir)
+        r.plan_steps()
+        sparse = [item for item in r.config_items
+                if item.get_path() == 'acme/sparse'][0]
+        self.assertEquals(['acme/sparse/test'], sparse.get_excludes())
+        self.assertFalse(svnlist.cache.offline)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rover.backends import rcvs
+from rover.backends.rcvs import CVSFactory, CVSItem, CVSBatch
+from mock_shell import MockShell
+
+
+class CVSRootTest(unittest.TestCase):
+    def setUp(self):
+        self.old_root = os.environ.get('CVSROOT')
+        os.environ['CVSROOT'] = ':pserver:anon@env.example.com:/cvs'
+        self.sh = MockShell()
+
+    def tearDown(self):
+        if self.old_root is None:
+            del os.environ['CVSROOT']
+        else:
+            os.environ['CVSROOT'] = self.old_root
+
+    def test_root_column(self):
+        fact = CVSFactory()
+        item = fact.get_rover_items(('acme/app', 'HEAD', 'cvs'
+                , ':pserver:anon@cvs.example.com:/cvs'))[0]
+        self.assertEquals('cvs.example.com', item.get_host())
+        self.assertEquals('CVSItem<acme/app, HEAD, cvs,'
+                ' :pserver:anon@cvs.example.com:/cvs>', repr(item))
+
+        item = fact.get_rover_items(('acme/app', 'HEAD', 'cvs', ''))[0]
+        self.assertEquals(None, item.root)
+        self.assertEquals('env.example.com', item.get_host())
+        self.assertEquals('CVSItem<acme/app, HEAD, cvs>', repr(item))
+
+    def test_checkout_names_root(self):
+        item = CVSItem('acme/app', 'BRANCH', ':ext:cvs.example.com:/cvs')
+        item.checkout(self.sh, '/nonexistent', 'preserve', test_mode=True)
+        self.assertEquals('cvs -d :ext:cvs.example.com:/cvs checkout -P'
+                ' -r BRANCH acme/app', ' '.join(self.sh.history[0]))
+
+        CVSItem('acme/app', 'HEAD').checkout(self.sh, '/nonexistent'
+                , 'preserve', test_mode=True)
+        self.assertEquals('cvs checkout -P -A acme/app'
+                , ' '.join(self.sh.history[1]))
+
+
+class RunCVSTest(unittest.TestCase):
+    def test_failed_retry_raises(self):
+        sh = MockShell()
+        sh.seed_result(1, ['cvs checkout: conflict'])
+        item = CVSItem('acme/app', 'HEAD')
+        self.assertRaises(Exception, item.checkout, sh, '/nonexistent'
+                , 'preserve')
+        # tried once more before giving up
+        self.assertEquals(2, len(sh.history))
+
+
+class CVSBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.sh = MockShell()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_batch_items(self):
+        items = [CVSItem('acme/a', 'HEAD'), CVSItem('acme/b', 'HEAD')
+                , CVSItem('acme/c', 'HEAD', ':ext:other:/cvs')
+                , CVSItem('acme/d', 'HEAD'), CVSItem('acme/e', 'BRANCH')
+                , CVSItem('acme/f', 'HEAD', ':ext:other:/cvs')
+                , CVSItem('acme/g !acme/g/x', 'HEAD'), CVSItem('acme/h', 'HEAD')]
+        batched = rcvs.batch_items(items, 2)
+        self.assertEquals([['acme/a', 'acme/b'], ['acme/c', 'acme/f']
+                , ['acme/d', 'acme/h'], 'acme/e', 'acme/g']
+                , [getattr(item, 'members', None) and
+                    [member.module for member in item.members]
+                    or item.module for item in batched])
+        self.assertEquals(items, rcvs.batch_items(items, 1))
+
+    def test_nested_items_are_not_batched(self):
+        items = [CVSItem('acme', 'HEAD'), CVSItem('acme/a', 'HEAD')
+                , CVSItem('lib/b', 'HEAD'), CVSItem('lib/b/c', 'HEAD')]
+        self.assertEquals(items, rcvs.batch_items(items, 10))
+
+    def test_checkout_and_update(self):
+        os.makedirs(os.path.join(self.dir, 'acme', 'b', 'CVS'))
+        batch = CVSBatch([CVSItem('acme/a', 'HEAD'), CVSItem('acme/b', 'HEAD')
+                , CVSItem('acme/c', 'HEAD')])
+        batch.checkout(self.sh, self.dir, 'clean', verbose=False)
+        self.assertEquals(['cvs -Q update -d -C -P -A acme/b'
+                , 'cvs -Q checkout -P -A acme/a acme/c']
+                , [' '.join(cmd) for cmd in self.sh.history])
+        self.assertEquals('CVSItem<acme/a, HEAD, cvs>\n'
+                'CVSItem<acme/b, HEAD, cvs>\nCVSItem<acme/c, HEAD, cvs>'
+                , repr(batch))
+
+    def test_is_pristine(self):
+        batch = CVSBatch([CVSItem('acme/a', 'HEAD'), CVSItem('acme/b', 'HEAD')])
+        self.sh.seed_result(0, ['cvs update: Updating acme/a', 'M acme/b/x'])
+        self.assertFalse(batch.is_pristine(self.sh, self.dir))
+        self.assertEquals('cvs -n -q update acme/a acme/b', self.sh.history[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
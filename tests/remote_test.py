@@ -0,0 +1,59 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import unittest
+
+from rover.remote import remote_host
+
+
+class RemoteHostTestCase(unittest.TestCase):
+    def test_pserver_cvsroot(self):
+        self.assertEquals('cvs.example.com'
+                , remote_host(':pserver:anon@cvs.Example.com:2401/cvsroot'))
+
+    def test_ext_cvsroot(self):
+        self.assertEquals('cvs.example.com'
+                , remote_host(':ext:me@cvs.example.com:/cvsroot'))
+
+    def test_local_cvsroot(self):
+        self.assertEquals(None, remote_host(':local:/var/cvs'))
+        self.assertEquals(None, remote_host('/var/cvs'))
+
+    def test_svn_url(self):
+        self.assertEquals('svn.example.com'
+                , remote_host('https://me@svn.example.com:8443/repos/trunk'))
+        self.assertEquals(None, remote_host('file:///var/svn/repos'))
+
+    def test_git_connection_strings(self):
+        self.assertEquals('github.com'
+                , remote_host('git://github.com/wgen/rover.git'))
+        self.assertEquals('github.com'
+                , remote_host('git@github.com:wgen/foss/rover.git'))
+
+    def test_empty(self):
+        self.assertEquals(None, remote_host(None))
+        self.assertEquals(None, remote_host(''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,340 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import rover.shell
+from rover import Rover
+from rover.backends import gitwork
+from rover.backends.rcvs import CVSItem, prune_unlisted
+from rover.backends.rgitrepo import GitRepo
+from rover.backends.rsvn import SVNItem
+from mock_shell import MockShell
+
+
+def touch(*parts):
+    path = os.path.join(*parts)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    open(path, 'w').close()
+
+
+class GitResetTest(unittest.TestCase):
+    def setUp(self):
+        self.sh = rover.shell.Shell()
+        self.dir = tempfile.mkdtemp()
+        self.wc = os.path.join(self.dir, 'repo')
+        touch(self.wc, 'tracked')
+        self.sh.run_silent('git init -q && echo ignored > .gitignore'
+                ' && git add . && git -c user.name=t -c user.email=t@t'
+                ' commit -q -m one', cwd=self.wc)
+        rover.shell.echo = lambda *args: None
+
+    def tearDown(self):
+        reload(rover.shell)
+        shutil.rmtree(self.dir, True)
+
+    def test_reset_leaves_tree_pristine(self):
+        open(os.path.join(self.wc, 'tracked'), 'w').write('changed')
+        touch(self.wc, 'untracked', 'file')
+        touch(self.wc, 'ignored')
+        self.assertFalse(gitwork.is_pristine(self.sh, self.wc))
+
+        self.assertTrue(gitwork.reset_work_tree(self.sh, self.wc
+                , verbose=False))
+        self.assertEquals(['.git', '.gitignore', 'tracked']
+                , sorted(os.listdir(self.wc)))
+        self.assertEquals('', open(os.path.join(self.wc, 'tracked')).read())
+        self.assertTrue(gitwork.is_pristine(self.sh, self.wc))
+
+    def test_nested_items_are_kept(self):
+        touch(self.wc, 'lib', 'nested', 'CVS', 'Entries')
+        touch(self.wc, 'lib', 'junk')
+        keep = ['lib/nested']
+        self.assertFalse(gitwork.is_pristine(self.sh, self.wc, keep))
+        gitwork.reset_work_tree(self.sh, self.wc, keep, verbose=False)
+        self.assertEquals(['nested'], os.listdir(os.path.join(self.wc, 'lib')))
+        self.assertTrue(gitwork.is_pristine(self.sh, self.wc, keep))
+
+    def test_no_working_tree(self):
+        self.assertFalse(gitwork.reset_work_tree(self.sh
+                , os.path.join(self.dir, 'missing')))
+
+    def test_local_commits_are_dropped(self):
+        clone = os.path.join(self.dir, 'clone')
+        self.sh.run_silent('git clone -q repo clone', cwd=self.dir)
+        branch = self.sh.tee_silent('git symbolic-ref --short HEAD'
+                , cwd=clone)[1][0]
+        self.sh.run_silent('git -c user.name=t -c user.email=t@t commit -q'
+                ' --allow-empty -m local', cwd=clone)
+        # clean, but not what a fresh clone would check out
+        self.assertTrue(gitwork.is_pristine(self.sh, clone))
+        self.assertFalse(gitwork.is_pristine(self.sh, clone, (), branch))
+
+        gitwork.force_checkout(self.sh, clone, branch, verbose=False)
+        self.assertTrue(gitwork.is_pristine(self.sh, clone, (), branch))
+        self.assertEquals(self.sh.tee_silent('git rev-parse HEAD'
+                , cwd=self.wc)[1], self.sh.tee_silent('git rev-parse HEAD'
+                , cwd=clone)[1])
+
+
+class CVSResetTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.wc = os.path.join(self.dir, 'acme', 'app')
+        self.entries(self.wc, '/main.c/1.1///', 'D/src////')
+        self.entries(os.path.join(self.wc, 'src'), '/a.c/1.2///')
+        touch(self.wc, 'main.c')
+        touch(self.wc, 'src', 'a.c')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def entries(self, path, *lines):
+        touch(path, 'CVS', 'Entries')
+        open(os.path.join(path, 'CVS', 'Entries'), 'w').write(
+                '\n'.join(lines + ('D',)) + '\n')
+
+    def test_prunes_unlisted(self):
+        touch(self.wc, 'stray.o')
+        touch(self.wc, 'src', '.a.c.rover')
+        touch(self.wc, 'build', 'out')
+        prune_unlisted(self.wc)
+        self.assertEquals(['CVS', 'main.c', 'src'], sorted(os.listdir(self.wc)))
+        self.assertEquals(['CVS', 'a.c']
+                , sorted(os.listdir(os.path.join(self.wc, 'src'))))
+
+    def test_entries_log(self):
+        touch(self.wc, 'new.c')
+        open(os.path.join(self.wc, 'CVS', 'Entries.Log'), 'w').write(
+                'A /new.c/0///\nR /main.c/1.1///\n')
+        prune_unlisted(self.wc)
+        self.assertEquals(['CVS', 'new.c', 'src'], sorted(os.listdir(self.wc)))
+
+    def test_keeps_nested_items(self):
+        self.entries(os.path.join(self.wc, 'src', 'nested'), '/b.c/1.1///')
+        touch(self.wc, 'src', 'nested', 'b.c')
+        touch(self.wc, 'src', 'nested', 'mine')
+        touch(self.wc, 'gen', 'other', 'CVS', 'Entries')
+        touch(self.wc, 'gen', 'junk')
+        prune_unlisted(self.wc, ['src/nested', 'gen/other'])
+        self.assertTrue(os.path.exists(
+                os.path.join(self.wc, 'src', 'nested', 'mine')))
+        self.assertTrue(os.path.exists(os.path.join(self.wc, 'gen', 'junk')))
+
+    def test_reset_and_is_pristine(self):
+        item = CVSItem('acme/app', 'HEAD')
+        sh = MockShell()
+        touch(self.wc, 'stray.o')
+        self.assertTrue(item.reset(sh, self.dir))
+        self.assertFalse(os.path.exists(os.path.join(self.wc, 'stray.o')))
+        self.assertFalse(CVSItem('acme/lib', 'HEAD').reset(sh, self.dir))
+
+        sh.seed_result(0, ['cvs update: Updating acme/app'
+                , '? acme/app/src/nested', 'U acme/app/new.c'])
+        self.assertTrue(item.is_pristine(sh, self.dir, ['src/nested']))
+        self.assertFalse(item.is_pristine(sh, self.dir))
+        self.assertEquals('cvs -n -q update acme/app', sh.history[-1])
+
+
+class SVNResetTest(unittest.TestCase):
+    STATUS = ['<?xml version="1.0" encoding="UTF-8"?>', '<status>'
+            , '<target path=".">'
+            , '<entry path="build">', '<wc-status props="none"'
+            , 'item="unversioned">', '</wc-status>', '</entry>'
+            , '<entry path="lib/nested">', '<wc-status props="none"'
+            , 'item="unversioned">', '</wc-status>', '</entry>'
+            , '<entry path="x.pyc">', '<wc-status props="none"'
+            , 'item="ignored">', '</wc-status>', '</entry>'
+            , '<entry path="ext">', '<wc-status props="none"'
+            , 'item="external">', '</wc-status>', '</entry>'
+            , '</target>', '</status>']
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.wc = os.path.join(self.dir, 'acme', 'app')
+        touch(self.wc, '.svn', 'wc.db')
+        touch(self.wc, 'build', 'out')
+        touch(self.wc, 'lib', 'nested', 'file')
+        touch(self.wc, 'x.pyc')
+        self.item = SVNItem('acme/app', 'HEAD', 'http://example.com/svn')
+        self.sh = MockShell()
+        self.sh.seed_result(0, self.STATUS)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, True)
+
+    def test_reset_removes_unversioned(self):
+        self.assertTrue(self.item.reset(self.sh, self.dir, ['lib/nested']))
+        self.assertEquals(['.svn', 'lib'], sorted(os.listdir(self.wc)))
+        self.assertEquals('svn revert -R -q .', self.sh.history[0])
+
+    def test_is_pristine(self):
+        self.assertFalse(self.item.is_pristine(self.sh, self.dir))
+        self.assertTrue(self.item.is_pristine(self.sh, self.dir
+                , ['build', 'lib/nested', 'x.pyc']))
+
+
+class FakeItem(object):
+    def __init__(self, path, resets=True, pristine=True):
+        self.path = path
+        self.resets = resets
+        self.pristine = pristine
+        self.calls = []
+
+    def get_path(self):
+        return self.path
+
+    def get_working_path(self):
+        return self.path
+
+    def get_host(self):
+        return None
+
+    def set_clone_defaults(self, options):
+        pass
+
+    def reset(self, sh, checkout_dir, keep=(), verbose=True
+            , test_mode=False):
+        self.calls.append(('reset', keep))
+        return self.resets
+
+    def is_pristine(self, sh, checkout_dir, keep=()):
+        self.calls.append(('is_pristine', keep))
+        return self.pristine
+
+    def checkout(self, sh, checkout_dir, checkout_mode, verbose=True
+            , test_mode=False):
+        self.calls.append(('checkout', checkout_mode
+                , os.path.exists(os.path.join(checkout_dir, self.path))))
+        if not os.path.exists(os.path.join(checkout_dir, self.path)):
+            os.makedirs(os.path.join(checkout_dir, self.path))
+
+    def get_vcs(self):
+        return 'fake'
+
+    def get_resolved_revision(self, sh, checkout_dir):
+        return None
+
+    def get_locked_line(self, resolved, synced_at):
+        return (self.path, resolved or 'HEAD', 'fake')
+
+    def get_size(self, sh, checkout_dir):
+        return None
+
+    def plan_action(self, sh, checkout_dir, checkout_mode, recorded=None):
+        if os.path.exists(os.path.join(checkout_dir, self.path)):
+            return 'update'
+        return 'checkout'
+
+
+class ParanoidFastTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.rover = Rover('', checkout_mode='paranoid-fast'
+                , checkout_dir=self.dir)
+        rover.shell.echo = lambda *args: None
+
+    def tearDown(self):
+        reload(rover.shell)
+        shutil.rmtree(self.dir, True)
+
+    def checkout(self, *items):
+        for item in items:
+            if item.path != 'new':
+                os.makedirs(os.path.join(self.dir, item.path))
+        self.rover.config_items = list(items)
+        self.rover.checkout()
+
+    def test_resets_in_place(self):
+        outer, inner = FakeItem('acme'), FakeItem('acme/app/lib')
+        self.checkout(outer, inner)
+        self.assertEquals([('reset', ['app/lib'])
+                , ('checkout', 'paranoid-fast', True)
+                , ('is_pristine', ['app/lib'])], outer.calls)
+        self.assertEquals(('reset', []), inner.calls[0])
+
+    def test_falls_back_when_not_pristine(self):
+        item = FakeItem('acme', pristine=False)
+        self.checkout(item)
+        self.assertEquals(['reset', 'checkout', 'is_pristine', 'checkout']
+                , [call[0] for call in item.calls])
+        # the second checkout started from nothing
+        self.assertEquals(('checkout', 'paranoid-fast', False), item.calls[-1])
+
+    def test_falls_back_when_reset_fails(self):
+        item = FakeItem('acme', resets=False)
+        self.checkout(item)
+        self.assertEquals([('reset', []), ('checkout', 'paranoid-fast', False)]
+                , item.calls)
+
+    def test_new_items_are_checked_out(self):
+        item = FakeItem('new')
+        self.checkout(item)
+        self.assertEquals([('checkout', 'paranoid-fast', False)], item.calls)
+
+
+class GitParanoidFastTest(unittest.TestCase):
+    def setUp(self):
+        self.sh = rover.shell.Shell()
+        self.dir = tempfile.mkdtemp()
+        src = os.path.join(self.dir, 'srv', 'proj.git')
+        touch(src, 'tracked')
+        self.sh.run_silent('git init -q && git symbolic-ref HEAD'
+                ' refs/heads/master && git add . && git -c user.name=t'
+                ' -c user.email=t@t commit -q -m one', cwd=src)
+        self.checkout_dir = os.path.join(self.dir, 'co')
+        self.echoed = []
+        rover.shell.echo = lambda *args: self.echoed.append(args)
+
+    def tearDown(self):
+        reload(rover.shell)
+        shutil.rmtree(self.dir, True)
+
+    def checkout(self):
+        r = Rover('', checkout_mode='paranoid-fast'
+                , checkout_dir=self.checkout_dir)
+        r.config_items = [GitRepo('local'
+                , 'file://%s/' % os.path.join(self.dir, 'srv'), 'proj.git'
+                , 'master')]
+        r.checkout()
+
+    def test_existing_clone_is_reset(self):
+        self.checkout()
+        wc = os.path.join(self.checkout_dir, 'proj')
+        touch(wc, 'untracked', 'file')
+        open(os.path.join(wc, 'tracked'), 'w').write('changed')
+        del self.echoed[:]
+        self.checkout()
+        self.assertEquals(['.git', 'tracked'], sorted(os.listdir(wc)))
+        self.assertEquals('', open(os.path.join(wc, 'tracked')).read())
+        # reset in place rather than thrown away and cloned again
+        self.assertFalse([args for args in self.echoed
+                if args[0] == 'REMOVING:'])
+
+
+if __name__ == '__main__':
+    unittest.main()
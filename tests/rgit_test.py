@@ -85,6 +85,17 @@ class GitItemCheckoutTest(unittest.TestCase):
         history1 = self.sh.history[1]
         self.assertEquals(output1, history1)
 
+    def test_git_checkout_commit(self):
+        sha = '18e8a9c95f00b986c7c47c5c1e91417105c817e1'
+        item = rgit.GitItem('git://github.com/wgen/rover.git', sha
+                , rgit.GitCloneOptions(depth=1, single_branch=True))
+        item.checkout(self.sh, 'dest', '', verbose=True, test_mode=True)
+        self.assertEquals(['git clone', '-n', 'git://github.com/wgen/rover.git']
+                , self.sh.history[0])
+        self.assertEquals(['git checkout', '-f', sha], self.sh.history[1])
+        self.assertEquals(('git://github.com/wgen/rover.git', sha, 'git')
+                , item.get_locked_line(sha, None))
+
     def test_git_exclude(self):
         self.assertRaises(Exception, self.item.exclude, "rover/backends")
 
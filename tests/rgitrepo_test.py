@@ -100,10 +100,47 @@ class GitItemCheckoutTest(unittest.TestCase):
 
         print "history = %s" % str(self.sh.history)
 
-        expectedChdir = 'push_dir(dest/rover)'
         expectedCheckout = ['git', 'checkout', 'master']
         expectedPull = ['git', 'pull']
-        self.assertEquals(expectedChdir, self.sh.history[1])
-        self.assertEquals(expectedCheckout, self.sh.history[2])
-        self.assertEquals(expectedPull, self.sh.history[3])
+        self.assertEquals(expectedCheckout, self.sh.history[1])
+        self.assertEquals(expectedPull, self.sh.history[2])
+        self.assertEquals(3, len(self.sh.history))
+
+    def test_git_checkout_paranoid_fast(self):
+        self.sh.exists = lambda path: True
+        self.item.checkout(self.sh, 'dest', 'paranoid-fast', test_mode=True)
+
+        self.assertEquals(['git fetch'], self.sh.history[0])
+        self.assertEquals(['git checkout -f', '-B', 'master', 'origin/master']
+                , self.sh.history[-1])
+
+    def test_existing_commit_checkout_is_checked(self):
+        self.sh.exists = lambda path: True
+        self.item.treeish = '18e8a9c95f00b986c7c47c5c1e91417105c817e1'
+        self.sh.seed_result(128)
+        self.assertRaises(Exception, self.item.checkout, self.sh, 'dest', '')
+        self.assertEquals([['git', 'fetch']], self.sh.history)
+
+    def test_existing_commit_checkout_test_mode(self):
+        self.sh.exists = lambda path: True
+        self.item.treeish = '18e8a9c95f00b986c7c47c5c1e91417105c817e1'
+        modes = []
+        execute = self.sh.execute
+        def record(cmd, cwd=None, verbose=False, test_mode=False
+                , return_out=False):
+            modes.append(test_mode)
+            return execute(cmd, cwd, verbose, test_mode, return_out)
+        self.sh.execute = record
+        self.item.checkout(self.sh, 'dest', '', test_mode=True)
+        self.assertEquals([True, True], modes)
+
+    def test_git_checkout_commit(self):
+        sha = '18e8a9c95f00b986c7c47c5c1e91417105c817e1'
+        self.item.treeish = sha
+        self.item.checkout(self.sh, 'dest', '')
+        self.assertEquals([['git', 'clone', '-n'
+                , 'git://github.com/wgen/rover.git', 'dest/rover']
+                , ['git', 'checkout', sha]], self.sh.history[1:])
+        self.assertEquals(('rover.git', sha, 'wgen-github')
+                , self.item.get_locked_line(sha, None))
 
@@ -0,0 +1,299 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from rover import Rover, capabilities
+from rover.backends import rsvn
+from rover.backends.rsvn import SVNItem
+from rover.cleanwalk import find_removes
+from rover.scheduler import Scheduler
+from mock_shell import MockShell
+
+
+def touch(*parts):
+    path = os.path.join(*parts)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    open(path, 'w').close()
+
+
+class FakeSVNTestCase(unittest.TestCase):
+    """pretends svn 1.8 is installed, and makes a checkout directory"""
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.old_svn = capabilities.registry._tools.get('svn', False)
+        capabilities.registry._tools['svn'] = capabilities.Capabilities('svn'
+                , '/usr/bin/svn', '1.8.19')
+        self.sh = MockShell()
+
+    def tearDown(self):
+        if self.old_svn is False:
+            del capabilities.registry._tools['svn']
+        else:
+            capabilities.registry._tools['svn'] = self.old_svn
+        shutil.rmtree(self.dir, True)
+
+
+class SVNSparseTest(FakeSVNTestCase):
+    def setUp(self):
+        FakeSVNTestCase.setUp(self)
+        self.item = SVNItem('acme/module', 'HEAD', 'http://foo.com')
+        self.item.exclude('acme/module/rab/x')
+        self.item.exclude('acme/module/cli')
+        self.item.exclude('other/module')
+        self.item.set_sparse(True)
+
+    def _make_wc(self):
+        wc = os.path.join(self.dir, 'acme', 'module')
+        touch(wc, '.svn', 'wc.db')
+        touch(wc, 'pk', 'a.java')
+        touch(wc, 'cli', 'b.java')
+        touch(wc, 'rab', 'x', 'c.java')
+        touch(wc, 'rab', 'y', 'd.java')
+        touch(wc, 'rab', 'z.xml')
+        touch(wc, 'build.xml')
+        return wc
+
+    def test_expand_keeps_item_whole(self):
+        self.assertEquals([self.item], self.item.expand())
+        self.assertEquals(['acme/module/cli', 'acme/module/rab/x']
+                , self.item.get_excludes())
+
+    def test_old_svn_is_split(self):
+        capabilities.registry._tools['svn'] = capabilities.Capabilities('svn'
+                , '/usr/bin/svn', '1.5.9')
+        old_list_contents = rsvn.list_contents
+        rsvn.list_contents = lambda path, root, revision=None: {
+                'acme/module': ['pk/', 'cli/', 'rab/']
+                , 'acme/module/rab': ['x/', 'y/']}[path]
+        try:
+            modules = [item.get_path() for item in self.item.expand()]
+        finally:
+            rsvn.list_contents = old_list_contents
+        self.assertEquals(['acme/module/pk', 'acme/module/rab/y'], modules)
+
+    def test_fresh_checkout(self):
+        self.item.expand()
+        self.item.checkout(self.sh, self.dir, 'preserve', verbose=False)
+        self.assertEquals(['svn checkout -q --depth empty'
+                ' http://foo.com/acme/module acme/module'
+                , 'svn update -q --set-depth immediates acme/module']
+                , self.sh.history)
+
+    def test_update(self):
+        self._make_wc()
+        self.item.expand()
+        self.item.checkout(self.sh, self.dir, 'preserve')
+        # nothing is shrunk and fetched again; the new excludes are dropped
+        self.assertEquals(['svn update acme/module'
+                , 'svn update --set-depth exclude acme/module/cli'
+                ' acme/module/rab/x'], self.sh.history)
+
+    def test_update_follows_wc_db(self):
+        wc = self._make_wc()
+        shutil.rmtree(os.path.join(wc, 'rab', 'x'))
+        db = sqlite3.connect(os.path.join(wc, '.svn', 'wc.db'))
+        db.execute('CREATE TABLE nodes (local_relpath TEXT, op_depth INTEGER'
+                ', presence TEXT, kind TEXT, depth TEXT)')
+        for row in [('', 0, 'normal', 'dir', 'infinity')
+                , ('pk', 0, 'excluded', 'dir', None)
+                , ('rab', 0, 'normal', 'dir', 'immediates')
+                , ('rab/x', 0, 'excluded', 'dir', None)
+                , ('rab/new', 0, 'normal', 'dir', 'empty')]:
+            db.execute('INSERT INTO nodes VALUES (?, ?, ?, ?, ?)', row)
+        db.commit()
+        db.close()
+
+        self.item.expand()
+        self.item.checkout(self.sh, self.dir, 'preserve')
+        self.assertEquals(['svn update acme/module'
+                , 'svn update --set-depth infinity acme/module/pk'
+                ' acme/module/rab/new'
+                , 'svn update --set-depth exclude acme/module/cli']
+                , self.sh.history)
+
+    def test_other_checkout_in_exclude_is_left_alone(self):
+        wc = self._make_wc()
+        touch(wc, 'cli', 'CVS', 'Entries')
+        self.item.expand()
+        self.item.checkout(self.sh, self.dir, 'clean')
+        self.assertEquals('svn revert -R acme/module', self.sh.history[0])
+        self.assertFalse('svn update --set-depth exclude acme/module/cli'
+                in self.sh.history)
+
+    def test_requires(self):
+        self.item.expand()
+        self.assertTrue(self.item.requires('acme'))
+        self.assertTrue(self.item.requires('acme/module/rab'))
+        self.assertTrue(self.item.requires('acme/module/rab/.svn'))
+        self.assertTrue(self.item.requires('acme/module/client'))
+        self.assertFalse(self.item.requires('acme/module/cli'))
+        self.assertFalse(self.item.requires('acme/module/rab/x/deep'))
+        self.assertFalse(self.item.requires('acme/modules'))
+
+    def test_clean_keeps_sparse_parents(self):
+        wc = self._make_wc()
+        touch(wc, 'stray', 'e.java')
+        self.item.expand()
+        self.assertEquals(['acme/module/cli', 'acme/module/rab/x']
+                , find_removes(self.dir, [self.item]))
+
+
+class SVNCoalesceTest(FakeSVNTestCase):
+    STATUS = ['<?xml version="1.0"?>', '<status>', '<target path=".">'
+            , '<entry path="old">', '<wc-status props="none"'
+            , 'item="missing">', '</wc-status>', '</entry>'
+            , '</target>', '</status>']
+
+    def _items(self, *lines):
+        return [SVNItem(*line) for line in lines]
+
+    def test_siblings_are_grouped(self):
+        items = self._items(('lib/a', 'HEAD', 'http://foo.com')
+                , ('app', 'HEAD', 'http://foo.com')
+                , ('lib/b', 'HEAD', 'http://foo.com')
+                , ('vendor/c', '12', 'http://foo.com')
+                , ('vendor/d', 'HEAD', 'http://foo.com'))
+        coalesced = rsvn.coalesce(items, self.dir)
+        self.assertEquals(['lib', 'app', 'vendor/c', 'vendor/d']
+                , [item.get_path() for item in coalesced])
+        self.assertEquals(items[0:3:2], coalesced[0].members)
+        self.assertEquals(repr(items[0]) + '\n' + repr(items[2])
+                , repr(coalesced[0]))
+
+    def test_not_grouped_around_other_items(self):
+        lines = [('lib/a', 'HEAD', 'http://foo.com')
+                , ('lib/b', 'HEAD', 'http://foo.com')]
+        for other in [('lib/x/y', 'HEAD', 'http://bar.com')
+                , ('lib', 'HEAD', 'http://bar.com')]:
+            items = self._items(*(lines + [other]))
+            self.assertEquals(items, rsvn.coalesce(items, self.dir))
+
+    def test_existing_checkouts_are_not_grouped(self):
+        touch(self.dir, 'lib', 'a', '.svn', 'wc.db')
+        items = self._items(('lib/a', 'HEAD', 'http://foo.com')
+                , ('lib/b', 'HEAD', 'http://foo.com'))
+        self.assertEquals(items, rsvn.coalesce(items, self.dir))
+
+        touch(self.dir, 'lib', '.svn', 'wc.db')
+        self.assertEquals(['lib'], [item.get_path()
+                for item in rsvn.coalesce(items, self.dir)])
+
+    def test_old_svn_is_not_grouped(self):
+        capabilities.registry._tools['svn'] = capabilities.Capabilities('svn'
+                , '/usr/bin/svn', '1.4.6')
+        items = self._items(('lib/a', 'HEAD', 'http://foo.com')
+                , ('lib/b', 'HEAD', 'http://foo.com'))
+        self.assertEquals(items, rsvn.coalesce(items, self.dir))
+
+    def test_fresh_checkout(self):
+        group = rsvn.SVNGroup('lib', self._items(('lib/a', 'HEAD', 'u')
+                , ('lib/b', 'HEAD', 'u')))
+        group.checkout(self.sh, self.dir, 'preserve', verbose=False)
+        self.assertEquals(['svn checkout -q --depth empty u/lib lib'
+                , 'svn update -q --set-depth infinity lib/a lib/b']
+                , self.sh.history)
+
+    def test_update_drops_old_members(self):
+        touch(self.dir, 'lib', '.svn', 'wc.db')
+        self.sh.seed_result(0, self.STATUS)
+        group = rsvn.SVNGroup('lib', self._items(('lib/a', 'HEAD', 'u')
+                , ('lib/b', 'HEAD', 'u')))
+        group.checkout(self.sh, self.dir, 'preserve')
+        self.assertEquals(['svn update --set-depth infinity lib/a lib/b'
+                , 'svn status --no-ignore --xml'
+                , 'svn update --set-depth exclude lib/old']
+                , self.sh.history)
+        self.assertTrue(group.requires('lib/b/x'))
+        self.assertFalse(group.requires('lib/old'))
+
+
+class CheckoutShell(MockShell):
+    """lays out a working copy when `svn checkout' is run"""
+    def __init__(self, files):
+        MockShell.__init__(self)
+        self.files = files
+
+    def execute(self, cmd, cwd=None, verbose=False, test_mode=False
+            , return_out=False):
+        if cmd.startswith('svn checkout'):
+            for path in self.files:
+                touch(cwd, path)
+        return MockShell.execute(self, cmd, cwd, verbose, test_mode
+                , return_out)
+
+
+class SVNSplitTest(FakeSVNTestCase):
+    def setUp(self):
+        FakeSVNTestCase.setUp(self)
+        self.sh = CheckoutShell(['big/.svn/wc.db', 'big/a/.keep'
+                , 'big/b/.keep', 'big/c/.keep', 'big/build.xml'])
+        self.item = SVNItem('big', 'HEAD', 'http://foo.com')
+        self.item.set_split(2)
+
+    def test_fresh_checkout_is_split(self):
+        self.item.checkout(self.sh, self.dir, 'preserve', verbose=False)
+        self.assertEquals('svn checkout -q --depth immediates'
+                ' http://foo.com/big big', self.sh.history[0])
+        self.assertEquals(['svn update -q --set-depth infinity big/a'
+                , 'svn update -q --set-depth infinity big/b'
+                , 'svn update -q --set-depth infinity big/c']
+                , sorted(self.sh.history[1:4]))
+        self.assertEquals('svn update -q --set-depth infinity big'
+                , self.sh.history[4])
+        self.assertEquals(5, len(self.sh.history))
+
+    def test_existing_checkout_is_updated(self):
+        touch(self.dir, 'big', '.svn', 'wc.db')
+        self.item.checkout(self.sh, self.dir, 'preserve')
+        self.assertEquals(['svn update big'], self.sh.history)
+
+    def test_old_svn_is_not_split(self):
+        capabilities.registry._tools['svn'] = capabilities.Capabilities('svn'
+                , '/usr/bin/svn', '1.4.6')
+        self.item.checkout(self.sh, self.dir, 'preserve')
+        self.assertEquals(['svn checkout http://foo.com/big']
+                , self.sh.history)
+
+    def test_items_share_the_host_limit(self):
+        r = Rover('')
+        r.set_jobs(4)
+        r.set_svn_split(4)
+        items = [SVNItem('a', 'HEAD', 'http://one.com')
+                , SVNItem('b', 'HEAD', 'http://one.com')
+                , SVNItem('c', 'HEAD', 'http://two.com')]
+        r._set_splits(items, Scheduler(4, host_limit=4))
+        self.assertEquals([2, 2, 4], [item.split for item in items])
+        r._set_splits(items, Scheduler(4, host_limit=1))
+        self.assertEquals([1, 1, 1], [item.split for item in items])
+        r._set_splits(items, Scheduler(4))
+        self.assertEquals([4, 4, 4], [item.split for item in items])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import threading
+import time
+import unittest
+
+from rover.scheduler import Scheduler
+
+
+class SchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.events = []
+
+    def _task(self, name, delay=0):
+        def run(slot):
+            self.lock.acquire()
+            self.events.append(('start', name))
+            self.lock.release()
+            time.sleep(delay)
+            self.lock.acquire()
+            self.events.append(('end', name))
+            self.lock.release()
+        return run
+
+    def _position(self, event):
+        return self.events.index(event)
+
+    def test_serial_runs_in_order(self):
+        s = Scheduler(1)
+        for name in ['a', 'b', 'c']:
+            s.add(self._task(name), name)
+        s.run()
+
+        self.assertEquals([('start', 'a'), ('end', 'a'), ('start', 'b')
+                , ('end', 'b'), ('start', 'c'), ('end', 'c')], self.events)
+
+    def test_parents_finish_before_children_start(self):
+        s = Scheduler(4)
+        s.add(self._task('acme/project9', 0.05), 'acme/project9')
+        s.add(self._task('acme/app'), 'acme/app')
+        s.add(self._task('acme/project9/module', 0.05)
+                , 'acme/project9/module')
+        s.add(self._task('acme/project9/module/api')
+                , 'acme/project9/module/api')
+        s.run()
+
+        self.assertTrue(self._position(('end', 'acme/project9'))
+                < self._position(('start', 'acme/project9/module')))
+        self.assertTrue(self._position(('end', 'acme/project9/module'))
+                < self._position(('start', 'acme/project9/module/api')))
+
+    def test_unrelated_items_run_concurrently(self):
+        s = Scheduler(2)
+        s.add(self._task('acme/project9', 0.1), 'acme/project9')
+        s.add(self._task('acme/app', 0.1), 'acme/app')
+        s.run()
+
+        self.assertEquals([('start', 'acme/project9'), ('start', 'acme/app')]
+                , sorted(self.events[:2], reverse=True))
+
+    def test_same_path_keeps_config_order(self):
+        s = Scheduler(4)
+        s.add(self._task('first', 0.05), 'acme/project9')
+        s.add(self._task('second'), 'acme/project9')
+        s.run()
+
+        self.assertTrue(self._position(('end', 'first'))
+                < self._position(('start', 'second')))
+
+    def test_prefix_is_not_a_parent(self):
+        """acme/app does not nest acme/apple"""
+        s = Scheduler(2)
+        s.add(self._task('acme/app', 0.1), 'acme/app')
+        s.add(self._task('acme/apple', 0.1), 'acme/apple')
+        s.run()
+
+        self.assertEquals('start', self.events[1][0])
+
+    def test_error_is_raised_and_stops_scheduling(self):
+        def fail(slot):
+            raise Exception("checkout failed")
+
+        s = Scheduler(2)
+        s.add(fail, 'acme')
+        s.add(self._task('acme/app'), 'acme/app')
+        self.assertRaises(Exception, s.run)
+        self.assertEquals([], self.events)
+
+
+class SchedulerHostLimitTestCase(unittest.TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = {}
+        self.peak = {}
+
+    def _task(self, host, delay=0.02):
+        def run(slot):
+            self.lock.acquire()
+            self.running[host] = self.running.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.running[host])
+            self.lock.release()
+            time.sleep(delay)
+            self.lock.acquire()
+            self.running[host] -= 1
+            self.lock.release()
+        return run
+
+    def test_host_limit_caps_each_host(self):
+        s = Scheduler(8, host_limit=2)
+        for i in range(6):
+            s.add(self._task('cvs.example.com'), 'cvs/%d' % i
+                    , 'cvs.example.com')
+            s.add(self._task('svn.example.com'), 'svn/%d' % i
+                    , 'svn.example.com')
+        s.run()
+
+        self.assertEquals(2, self.peak['cvs.example.com'])
+        self.assertEquals(2, self.peak['svn.example.com'])
+
+    def test_per_host_override(self):
+        s = Scheduler(8, host_limit=3, host_limits={'cvs.example.com': 1})
+        for i in range(4):
+            s.add(self._task('cvs.example.com'), 'cvs/%d' % i
+                    , 'cvs.example.com')
+            s.add(self._task('svn.example.com'), 'svn/%d' % i
+                    , 'svn.example.com')
+        s.run()
+
+        self.assertEquals(1, self.peak['cvs.example.com'])
+        self.assertEquals(3, self.peak['svn.example.com'])
+
+    def test_local_items_are_not_limited(self):
+        s = Scheduler(4, host_limit=1)
+        for i in range(4):
+            s.add(self._task(None, 0.05), 'local/%d' % i)
+        s.run()
+
+        self.assertEquals(4, self.peak[None])
+
+
+if __name__ == '__main__':
+    unittest.main()
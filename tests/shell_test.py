@@ -25,6 +25,7 @@ import os
 import types
 import re
 import sys
+import time
 import unittest
 
 import rover.shell
@@ -129,6 +130,61 @@ class ShellTestCase(unittest.TestCase):
         self.assertEqual(pwd, os.path.abspath(os.getcwd()))
 
 
+    def test_run_silent_drains_output(self):
+        """
+        a command writing more than a pipe buffer's worth of output must
+        not block in run_silent
+        """
+        returncode = self.shell.run_silent('yes | head -n 200000')
+        self.assertEquals(returncode, 0)
+
+    def test_unterminated_last_line(self):
+        returncode, out = self.shell.tee_silent('printf "a\\nb"')
+        self.assertEquals(out, ['a', 'b'])
+
+
+class ReactorTestCase(unittest.TestCase):
+    def test_callbacks(self):
+        lines = []
+        codes = []
+        reactor = rover.shell.Reactor()
+        reactor.spawn('echo one; echo two; exit 3', on_line=lines.append
+                , on_exit=codes.append)
+        reactor.run()
+
+        self.assertEquals(['one', 'two'], lines)
+        self.assertEquals([3], codes)
+
+    def test_stderr_is_delivered(self):
+        lines = []
+        reactor = rover.shell.Reactor()
+        reactor.spawn('echo out; echo err >&2', on_line=lines.append)
+        reactor.run()
+
+        self.assertEquals(['err', 'out'], sorted(lines))
+
+    def test_multiplexes_many_processes(self):
+        """
+        processes run side by side on one thread, so five half-second
+        sleeps take about half a second, not two and a half
+        """
+        reactor = rover.shell.Reactor()
+        lines = {}
+        procs = []
+        for i in range(5):
+            lines[i] = []
+            procs.append(reactor.spawn('sleep 0.5; echo %d' % i
+                    , on_line=lines[i].append))
+
+        start = time.time()
+        reactor.run()
+        elapsed = time.time() - start
+
+        self.assertTrue(elapsed < 2.0)
+        for i in range(5):
+            self.assertEquals([str(i)], lines[i])
+            self.assertEquals(0, procs[i].returncode)
+
 
 if __name__ == '__main__':
     unittest.main()
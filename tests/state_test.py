@@ -0,0 +1,186 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from rover import Rover, state
+
+
+class CheckoutStateTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.state = state.CheckoutState.open(self.dir)
+
+    def tearDown(self):
+        self.state.close()
+        shutil.rmtree(self.dir, True)
+
+    def test_open_creates_state_dir(self):
+        self.assertTrue(os.path.isfile(
+                os.path.join(self.dir, '.rover', 'state.db')))
+
+    def test_record_and_get(self):
+        self.state.record('acme/app', 'CVSItem<acme/app, HEAD, cvs>', 'cvs'
+                , None, 100.0, 2.5)
+        self.assertEquals({'path': 'acme/app'
+                , 'config_line': 'CVSItem<acme/app, HEAD, cvs>'
+                , 'vcs': 'cvs', 'resolved': None, 'synced_at': 100.0
+                , 'duration': 2.5, 'status': 'ok', 'action': None
+                , 'bytes': None, 'received': None}
+                , self.state.get('acme/app'))
+        self.assertEquals(None, self.state.get('acme/other'))
+
+    def test_record_replaces(self):
+        self.state.record('rover', 'GitItem<x, master, git>', 'git', 'aaa')
+        self.state.record('rover', 'GitItem<x, master, git>', 'git', 'bbb'
+                , status='failed')
+        items = self.state.items()
+        self.assertEquals(1, len(items))
+        self.assertEquals('bbb', items[0]['resolved'])
+        self.assertEquals('failed', items[0]['status'])
+
+    def test_survives_reopening(self):
+        self.state.record('acme/app', 'line', 'svn', None, 100.0, 1.0)
+        self.state.close()
+        self.state = state.CheckoutState.open(self.dir)
+        self.assertEquals(1.0, self.state.get('acme/app')['duration'])
+
+    def test_forget_drops_children(self):
+        for path in ['acme', 'acme/app', 'acme_x', 'acme/app/lib', 'other']:
+            self.state.record(path, 'line', 'cvs', None)
+        self.state.forget('acme')
+        self.assertEquals(['acme_x', 'other']
+                , [item['path'] for item in self.state.items()])
+
+    def test_old_schema_is_rebuilt(self):
+        self.state.close()
+        db = sqlite3.connect(state.state_path(self.dir))
+        db.execute('DROP TABLE items')
+        db.execute('CREATE TABLE items (path TEXT)')
+        db.execute("INSERT INTO items VALUES ('acme')")
+        db.execute('PRAGMA user_version = 0')
+        db.commit()
+        db.close()
+
+        self.state = state.CheckoutState.open(self.dir)
+        self.assertEquals([], self.state.items())
+
+    def test_record_sizes(self):
+        self.state.record('rover', 'line', 'git', 'aaa', 100.0, 3.0, 'ok'
+                , 'checkout', 2048, 2048)
+        item = self.state.get('rover')
+        self.assertEquals(('checkout', 2048, 2048)
+                , (item['action'], item['bytes'], item['received']))
+
+    def test_version_1_keeps_history(self):
+        self.state.close()
+        db = sqlite3.connect(state.state_path(self.dir))
+        db.execute('DROP TABLE items')
+        db.execute('CREATE TABLE items (path TEXT PRIMARY KEY'
+                ', config_line TEXT, vcs TEXT, resolved TEXT'
+                ', synced_at REAL, duration REAL, status TEXT)')
+        db.execute("INSERT INTO items VALUES"
+                " ('acme', 'line', 'cvs', NULL, 100.0, 2.0, 'ok')")
+        db.execute('PRAGMA user_version = 1')
+        db.commit()
+        db.close()
+
+        self.state = state.CheckoutState.open(self.dir)
+        item = self.state.get('acme')
+        self.assertEquals(2.0, item['duration'])
+        self.assertEquals(None, item['action'])
+        self.state.record('acme', 'line', 'cvs', None, 200.0, 1.0, 'ok'
+                , 'update', 10, 0)
+        self.assertEquals('update', self.state.get('acme')['action'])
+
+    def test_shared_between_threads(self):
+        def record(n):
+            for i in range(20):
+                self.state.record('mod%d/%d' % (n, i), 'line', 'git', None)
+        threads = [threading.Thread(target=record, args=(n,))
+                for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(80, len(self.state.items()))
+
+
+class SizedItem(object):
+    def __init__(self, resolved, size):
+        self.resolved = resolved
+        self.size = size
+        self.measured = 0
+
+    def get_path(self):
+        return 'acme'
+
+    def get_vcs(self):
+        return 'git'
+
+    def get_resolved_revision(self, sh, checkout_dir):
+        return self.resolved
+
+    def get_locked_line(self, resolved, synced_at):
+        return ('acme', resolved or 'master', 'git')
+
+    def get_size(self, sh, checkout_dir):
+        self.measured += 1
+        return self.size
+
+
+class RecordSizeTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.rover = Rover('', checkout_dir=self.dir)
+        self.rover.state = state.CheckoutState.open(self.dir)
+        self.rover.state.record('acme', 'line', 'git', 'aaa', 100.0, 3.0
+                , 'ok', 'checkout', 2048, 2048)
+
+    def tearDown(self):
+        self.rover.state.close()
+        shutil.rmtree(self.dir, True)
+
+    def record(self, item):
+        self.rover._record(None, item, 200.0, 'ok')
+        row = self.rover.state.get('acme')
+        return row['bytes'], row['received']
+
+    def test_unchanged_item_is_not_measured(self):
+        item = SizedItem('aaa', 4096)
+        self.assertEquals((2048, 0), self.record(item))
+        self.assertEquals(0, item.measured)
+
+    def test_moved_item_is_measured(self):
+        item = SizedItem('bbb', 4096)
+        self.assertEquals((4096, 2048), self.record(item))
+        self.assertEquals(1, item.measured)
+
+
+if __name__ == '__main__':
+    unittest.main()
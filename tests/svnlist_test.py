@@ -0,0 +1,203 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from rover import capabilities
+from rover.backends import svnlist
+
+
+class FakeShell(object):
+    """answers `svn ls' from a dict of url => output lines"""
+    def __init__(self, listings):
+        self.listings = dict(listings)
+        self.history = []
+
+    def tee_silent(self, cmd, cwd=None):
+        self.history.append(cmd)
+        url = cmd.split()[-1]
+        if url not in self.listings:
+            return 1, ["svn: E200009: Could not list all targets"]
+        return 0, self.listings[url]
+
+
+LISTINGS = {
+    'http://svn/repo/acme': ['app/', 'lib/', 'README'],
+    'http://svn/repo/acme/app': ['src/', 'build.xml'],
+}
+
+TREE = ['app/', 'app/src/', 'app/src/Main.java', 'app/build.xml'
+        , 'lib/', 'README']
+
+
+class SVNListingCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.file = os.path.join(self.dir, 'svn-listings.json')
+        self.cache = self.new_cache()
+        self.old_svn = capabilities.registry._tools.get('svn', False)
+        self.use_svn('1.8.19')
+
+    def tearDown(self):
+        if self.old_svn is False:
+            del capabilities.registry._tools['svn']
+        else:
+            capabilities.registry._tools['svn'] = self.old_svn
+        shutil.rmtree(self.dir, True)
+
+    def use_svn(self, version):
+        capabilities.registry._tools['svn'] = capabilities.Capabilities('svn'
+                , '/usr/bin/svn', version)
+
+    def new_cache(self, ttl=60, listings=LISTINGS):
+        cache = svnlist.SVNListingCache(self.file, ttl)
+        cache._sh = FakeShell(listings)
+        return cache
+
+    def test_lists_each_directory_once(self):
+        for i in range(3):
+            self.assertEquals(['app/', 'lib/', 'README']
+                    , self.cache.list('http://svn/repo/', 'acme'))
+        self.assertEquals(['src/', 'build.xml']
+                , self.cache.list('http://svn/repo', '/acme/app/'))
+        self.assertEquals(['svn ls --depth immediates http://svn/repo/acme'
+                , 'svn ls --depth immediates http://svn/repo/acme/app']
+                , self.cache._sh.history)
+
+    def test_prefetch_fills_the_subtree(self):
+        self.cache._sh.listings['http://svn/repo/acme'] = TREE
+        self.cache.prefetch('http://svn/repo', 'acme')
+        self.assertEquals(['svn ls --depth infinity http://svn/repo/acme']
+                , self.cache._sh.history)
+        self.assertEquals(['app/', 'lib/', 'README']
+                , self.cache.list('http://svn/repo', 'acme'))
+        self.assertEquals(['src/', 'build.xml']
+                , self.cache.list('http://svn/repo', 'acme/app'))
+        self.assertEquals(['Main.java']
+                , self.cache.list('http://svn/repo', 'acme/app/src'))
+        self.assertEquals([], self.cache.list('http://svn/repo', 'acme/lib'))
+        self.assertEquals(1, len(self.cache._sh.history))
+
+    def test_shared_across_runs_until_ttl(self):
+        self.cache.list('http://svn/repo', 'acme')
+        self.cache.save()
+        cache = self.new_cache()
+        cache.list('http://svn/repo', 'acme')
+        self.assertEquals([], cache._sh.history)
+
+        # age the listing past the ttl
+        listings = json.load(open(self.file))
+        for entry in listings.values():
+            entry['time'] -= 120
+        json.dump(listings, open(self.file, 'w'))
+        cache = self.new_cache()
+        cache.list('http://svn/repo', 'acme')
+        self.assertEquals(1, len(cache._sh.history))
+
+    def test_numbered_revisions_never_expire(self):
+        self.cache.list('http://svn/repo', 'acme', '1234')
+        self.assertEquals('svn ls --depth immediates -r 1234'
+                ' http://svn/repo/acme', self.cache._sh.history[0])
+        self.cache.save()
+        listings = json.load(open(self.file))
+        for entry in listings.values():
+            entry['time'] -= 10 ** 6
+        json.dump(listings, open(self.file, 'w'))
+
+        cache = self.new_cache()
+        cache.list('http://svn/repo', 'acme', '1234')
+        cache.list('http://svn/repo', 'acme', 'HEAD')
+        self.assertEquals(['svn ls --depth immediates http://svn/repo/acme']
+                , cache._sh.history)
+
+    def test_zero_ttl_stays_in_memory(self):
+        cache = self.new_cache(ttl=0)
+        cache.list('http://svn/repo', 'acme')
+        cache.list('http://svn/repo', 'acme')
+        cache.save()
+        self.assertEquals(1, len(cache._sh.history))
+        self.assertFalse(os.path.exists(self.file))
+
+    def test_saved_once(self):
+        self.cache.list('http://svn/repo', 'acme')
+        self.cache.list('http://svn/repo', 'acme/app')
+        self.assertFalse(os.path.exists(self.file))
+        self.cache.save()
+        self.assertEquals(2, len(json.load(open(self.file))))
+
+    def test_prefetch_dir_skips_cached(self):
+        old_cache = svnlist.cache
+        svnlist.cache = self.cache
+        try:
+            self.cache._sh.listings['http://svn/repo/acme'] = TREE
+            svnlist.prefetch_dir('http://svn/repo', 'acme')
+            svnlist.prefetch_dir('http://svn/repo', 'acme')
+            self.cache.offline = True
+            svnlist.prefetch_dir('http://svn/repo', 'other')
+        finally:
+            svnlist.cache = old_cache
+        self.assertEquals(['svn ls --depth infinity http://svn/repo/acme']
+                , self.cache._sh.history)
+
+    def test_svn_without_depth(self):
+        self.use_svn('1.4.6')
+        old_cache = svnlist.cache
+        svnlist.cache = self.cache
+        try:
+            svnlist.prefetch_dir('http://svn/repo', 'acme')
+            self.assertEquals(['app/', 'lib/', 'README']
+                    , svnlist.list_dir('http://svn/repo', 'acme'))
+        finally:
+            svnlist.cache = old_cache
+        # listed a directory at a time, without --depth
+        self.assertEquals(['svn ls http://svn/repo/acme']
+                , self.cache._sh.history)
+
+    def test_failures_raise(self):
+        self.assertRaises(Exception, self.cache.list, 'http://svn/repo'
+                , 'missing')
+
+    def test_offline_trusts_stale_listings_and_lists_nothing(self):
+        self.cache.list('http://svn/repo', 'acme')
+        self.cache.save()
+        listings = json.load(open(self.file))
+        for entry in listings.values():
+            entry['time'] -= 10 ** 6
+        json.dump(listings, open(self.file, 'w'))
+
+        cache = self.new_cache()
+        cache.offline = True
+        self.assertEquals(['app/', 'lib/', 'README']
+                , cache.list('http://svn/repo', 'acme'))
+        self.assertRaises(svnlist.NotCached, cache.list, 'http://svn/repo'
+                , 'acme/app')
+        self.assertEquals([], cache._sh.history)
+
+
+if __name__ == '__main__':
+    unittest.main()
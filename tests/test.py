@@ -24,7 +24,9 @@
 import os
 import types
 import re
+import shutil
 import sys
+import tempfile
 from StringIO import StringIO
 import unittest
 
@@ -45,38 +47,19 @@ def _list_as_rover_items(items):
             out.extend(rover.backends.rsvn.SVNFactory().get_rover_items(line))
     return out
 
-def mock_os_walk_factory(dir):
+def _make_tree(root, struct):
     """
-    factory function that returns the correct mock of os.walk given
-    a particular directory structure
+    create a directory structure under root, where struct is
+    (name, (dir, dir, ...), (file, file, ...)) and either may be empty
     """
-    def mock_os_walk(main_dir, topdown=True, onerror=None):
-        def _walk(root, struct):
-            # struct is (name, (dir, dir, ...), (file, file, ...))
-            # where either may be empty
-
-            name, dirs, files = struct
-            dirnames = [x[0] for x in dirs]
-            _dirnames = list(dirnames)
-            r = os.path.join(root, name)
-            yield r, dirnames, files
-
-            # recreate the 'dirs' list with only the
-            # directories which remain in 'dirnames'
-            # once the user has had a chance to diddle
-            # the list
-            _dirs = []
-            for dirname in dirnames:
-                _dirs.append(dirs[_dirnames.index(dirname)])
-
-            for dir in _dirs:
-                for x in _walk(r, dir):
-                    yield x
-
-        for x in _walk(main_dir, dir):
-            yield x
-
-    return mock_os_walk
+    name, dirs, files = struct
+    path = os.path.join(root, name)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    for filename in files:
+        open(os.path.join(path, filename), 'w').close()
+    for dir in dirs:
+        _make_tree(path, dir)
 
 
 class RoverParserTestCase(unittest.TestCase):
@@ -157,6 +140,10 @@ class RoverCleanTestCases(unittest.TestCase):
 
     def setUp(self):
         self.rover = Rover('')
+        self.rover.checkout_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.rover.checkout_dir, True)
 
     def test_removes(self):
         """
@@ -175,7 +162,7 @@ class RoverCleanTestCases(unittest.TestCase):
                            ['CVS', [], []]],
                           []]
 
-        os.walk = mock_os_walk_factory(dirs)
+        _make_tree(self.rover.checkout_dir, dirs)
 
         self.rover.config_items = input
         self.rover.resolve()
@@ -184,6 +171,27 @@ class RoverCleanTestCases(unittest.TestCase):
 
         self.assertEquals(expected, output)
 
+    def test_keeps_state_dir(self):
+        """
+        rover's own state directory is never a candidate for removal
+        """
+        input = _list_as_rover_items([
+            ('acme/app','HEAD','cvs'),
+            ])
+        dirs = ['', [['.rover', [], []],
+                     ['acme', [['app', [['CVS', [], []]], []],
+                               ['CVS', [], []]],
+                              []]],
+                    []]
+
+        _make_tree(self.rover.checkout_dir, dirs)
+
+        self.rover.config_items = input
+        self.rover.resolve()
+        output = self.rover._clean()
+
+        self.assertEquals([], output)
+
     def test_removes_excludes(self):
         """
         tests that when a directory is excluded with a ! it is removed
@@ -201,7 +209,7 @@ class RoverCleanTestCases(unittest.TestCase):
                            ['CVS', [], []]],
                           []]
 
-        os.walk = mock_os_walk_factory(dirs)
+        _make_tree(self.rover.checkout_dir, dirs)
 
         self.rover.config_items = input
         self.rover.resolve()
@@ -229,7 +237,7 @@ class RoverCleanTestCases(unittest.TestCase):
                            ['CVS', [], []]],
                           []]
 
-        os.walk = mock_os_walk_factory(dirs)
+        _make_tree(self.rover.checkout_dir, dirs)
 
         self.rover.config_items = input
         self.rover.resolve()
@@ -254,7 +262,7 @@ class RoverCleanTestCases(unittest.TestCase):
                            ['CVS', [], []]],
                           []]
 
-        os.walk = mock_os_walk_factory(dirs)
+        _make_tree(self.rover.checkout_dir, dirs)
 
         self.rover.config_items = input
         self.rover.resolve()
@@ -620,13 +628,22 @@ class RoverSVNTestCase(unittest.TestCase):
     def setUp(self):
         self.old_list_contents = rover.backends.rsvn.list_contents
 
-        def new_list_contents(path, root):
+        self.listed = []
+        def new_list_contents(path, root, revision=None):
+            self.listed.append(path)
             return self.list_contents[path]
 
         rover.backends.rsvn.list_contents = new_list_contents
 
+        self.old_prefetch_contents = rover.backends.rsvn.prefetch_contents
+        self.prefetched = []
+        def new_prefetch_contents(path, root, revision=None):
+            self.prefetched.append(path)
+        rover.backends.rsvn.prefetch_contents = new_prefetch_contents
+
     def tearDown(self):
         rover.backends.rsvn.list_contents = self.old_list_contents
+        rover.backends.rsvn.prefetch_contents = self.old_prefetch_contents
     
     def test_svn_exclude_naive(self):
 
@@ -666,7 +683,53 @@ class RoverSVNTestCase(unittest.TestCase):
                     ('acme/project9/module/test', 'HEAD', 'svn', 'http://bar.com')])
        
         self.assertEquals(r.config_items, expected)
-        
+
+    def test_svn_excludes_expand_together(self):
+        """
+        several excludes under one directory give one set of items which
+        don't overlap, listing each directory once
+        """
+        self.list_contents = {}
+        self.list_contents['acme/module'] = ['pk/', 'cli/', 'rab/', 'api/']
+        self.list_contents['acme/module/rab'] = ['x/', 'y/', 'z.xml']
+        self.list_contents['acme/module/rab/y'] = ['deep/', 'other/']
+
+        item = _list_as_rover_items(
+                [('acme/module', 'HEAD', 'svn', 'http://foo.com')])[0]
+        for exclude in ['acme/module/cli', 'acme/module/rab/x'
+                , 'acme/module/rab/y/deep', 'acme/module/api']:
+            item.exclude(exclude)
+
+        expected = _list_as_rover_items(
+                   [('acme/module/pk', 'HEAD', 'svn', 'http://foo.com'),
+                    ('acme/module/rab/y/other', 'HEAD', 'svn', 'http://foo.com'),
+                    ('acme/module/rab/z.xml', 'HEAD', 'svn', 'http://foo.com')])
+
+        self.assertEquals(expected, item.expand())
+        self.assertEquals(['acme/module', 'acme/module/rab'
+                , 'acme/module/rab/y'], self.listed)
+        # rab/y/deep is two levels down, so rab was listed whole first
+        self.assertEquals(['acme/module/rab'], self.prefetched)
+
+    def test_svn_repr_lists_nothing(self):
+        self.list_contents = {}
+        item = _list_as_rover_items(
+                [('acme/module', 'HEAD', 'svn', 'http://foo.com')])[0]
+        item.exclude('acme/module/rab')
+        self.assertEquals('SVNItem<acme/module !acme/module/rab, HEAD, svn'
+                ', http://foo.com>', repr(item))
+        self.assertEquals([], self.listed)
+        self.assertEquals(['acme/module/rab'], item.get_excludes())
+
+    def test_svn_exclude_of_whole_module(self):
+        self.list_contents = {}
+        item = _list_as_rover_items(
+                [('acme/module', 'HEAD', 'svn', 'http://foo.com')])[0]
+        item.exclude('acme/module')
+        item.exclude('acme/module/rab')
+        self.assertEquals([], item.expand())
+        self.assertEquals([], self.listed)
+
 class RoverFilterTestCase(unittest.TestCase):
 
     def test_exclude_filter__bigger_filter(self):
@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from rover import trace
+from rover.scheduler import Scheduler
+from rover.shell import Shell
+
+
+class ContextTest(unittest.TestCase):
+    def tearDown(self):
+        trace.set_context()
+
+    def test_set_and_restore(self):
+        self.assertEquals((None, None), trace.get_context())
+        previous = trace.set_context('acme/app', 3)
+        self.assertEquals((None, None), previous)
+        self.assertEquals(('acme/app', 3), trace.get_context())
+        trace.set_context(*previous)
+        self.assertEquals((None, None), trace.get_context())
+
+    def test_scheduler_sets_context(self):
+        for jobs in (1, 2):
+            seen = {}
+            scheduler = Scheduler(jobs)
+            for path in ['a', 'b', 'a/c']:
+                scheduler.add(lambda slot, path=path:
+                        seen.__setitem__(path, trace.get_context()), path)
+            scheduler.run()
+            for path, (item, slot) in seen.items():
+                self.assertEquals(path, item)
+                self.assertTrue(0 <= slot < jobs)
+            self.assertEquals((None, None), trace.get_context())
+
+
+class CommandLogTest(unittest.TestCase):
+    def setUp(self):
+        self.saved = trace.log.records
+        trace.log.clear()
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        trace.log.records = self.saved
+        trace.set_context()
+        shutil.rmtree(self.dir, True)
+
+    def test_shell_commands_are_recorded(self):
+        trace.set_context('acme/app', 1)
+        Shell().tee_silent('echo hello; exit 3', cwd=self.dir)
+        Shell().run('true')
+        captured, terminal = trace.log.records
+        self.assertEquals(('echo hello; exit 3', self.dir, 3, 6, 'acme/app', 1)
+                , (captured.cmd, captured.cwd, captured.returncode
+                , captured.bytes, captured.item, captured.slot))
+        self.assertTrue(captured.start <= captured.end)
+        self.assertEquals((0, None), (terminal.returncode, terminal.bytes))
+
+    def test_chrome_trace(self):
+        trace.log.add('git fetch -q', '/co/a', 100.0, 102.0, 0, 10
+                , ('a', 0), 'Thread-1')
+        trace.log.add('git ls-remote x', None, 100.0, 101.0, 0, 5
+                , (None, None), 'MainThread')
+        trace.log.add('git ls-remote y', None, 100.5, 101.5, 1, 5
+                , (None, None), 'MainThread')
+        events = trace.log.chrome_trace()['traceEvents']
+        names = dict([(event['tid'], event['args']['name'])
+                for event in events if event['ph'] == 'M'])
+        slices = [(names[event['tid']], event['name'], event['ts']
+                , event['dur']) for event in events if event['ph'] == 'X']
+        self.assertEquals([('slot 0', 'a: git fetch', 0, 2000000)
+                , ('MainThread', 'git ls-remote', 0, 1000000)
+                , ('MainThread (2)', 'git ls-remote', 500000, 1000000)]
+                , slices)
+
+    def test_write_chrome_trace(self):
+        trace.log.add('svn update acme', '/co', 1.0, 1.5, 0, 0
+                , ('acme', 2), 'Thread-3')
+        filename = os.path.join(self.dir, 'out', 'trace.json')
+        trace.log.write_chrome_trace(filename)
+        event = json.load(open(filename))['traceEvents'][-1]
+        self.assertEquals({'cmd': 'svn update acme', 'cwd': '/co', 'exit': 0
+                , 'bytes': 0, 'item': 'acme', 'slot': 2}, event['args'])
+
+
+if __name__ == '__main__':
+    unittest.main()
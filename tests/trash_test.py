@@ -0,0 +1,85 @@
+#
+# Copyright (c) 2009 Wireless Generation, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rover import trash
+
+
+class TrashTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.trash = trash.Trash(self.dir, reapers=2)
+
+    def tearDown(self):
+        self.trash.close()
+        shutil.rmtree(self.dir, True)
+
+    def mkdirs(self, *paths):
+        for path in paths:
+            os.makedirs(os.path.join(self.dir, path))
+
+    def test_discard_removes_at_once(self):
+        self.mkdirs('acme/app/src', 'acme/lib')
+        self.trash.discard(os.path.join(self.dir, 'acme', 'app'))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'acme', 'app')))
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'acme', 'lib')))
+
+        self.trash.close()
+        self.assertFalse(os.path.exists(self.trash.path))
+
+    def test_same_name_twice(self):
+        self.mkdirs('a/app', 'b/app')
+        self.trash.discard(os.path.join(self.dir, 'a', 'app'))
+        self.trash.discard(os.path.join(self.dir, 'b', 'app'))
+        self.assertEquals([], os.listdir(os.path.join(self.dir, 'a')))
+        self.assertEquals([], os.listdir(os.path.join(self.dir, 'b')))
+
+    def test_reaps_leftovers(self):
+        self.mkdirs(os.path.join(trash.TRASH_DIR, 'app.x', 'trash', 'src'))
+        self.trash.reap_leftovers()
+        self.trash.close()
+        self.assertFalse(os.path.exists(self.trash.path))
+
+    def test_unmovable_is_deleted_in_place(self):
+        self.mkdirs('acme/app/src')
+        rename = os.rename
+        def fail(src, dst):
+            raise OSError(18, 'Invalid cross-device link')
+        os.rename = fail
+        try:
+            self.trash.discard(os.path.join(self.dir, 'acme', 'app'))
+        finally:
+            os.rename = rename
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'acme', 'app')))
+
+    def test_close_without_discards(self):
+        self.trash.close()
+        self.assertFalse(os.path.exists(self.trash.path))
+
+
+if __name__ == '__main__':
+    unittest.main()